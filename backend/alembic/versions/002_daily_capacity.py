@@ -0,0 +1,53 @@
+"""daily capacity ledger
+
+Revision ID: 002
+Revises: 001
+Create Date: 2025-02-01 00:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "002"
+down_revision: Union[str, None] = "001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "daily_capacity",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("district", sa.String(100), nullable=False),
+        sa.Column("used", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("date", "district"),
+    )
+
+    # Заполнить журнал по существующим заказам
+    op.execute(
+        """
+        INSERT INTO daily_capacity (date, district, used)
+        SELECT o.delivery_date, a.district, SUM(o.total_qty)
+        FROM orders o
+        JOIN addresses a ON a.id = o.address_id
+        WHERE o.delivery_date IS NOT NULL AND o.status != 'cancelled'
+        GROUP BY o.delivery_date, a.district
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO daily_capacity (date, district, used)
+        SELECT o.delivery_date, '*', SUM(o.total_qty)
+        FROM orders o
+        WHERE o.delivery_date IS NOT NULL AND o.status != 'cancelled'
+        GROUP BY o.delivery_date
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("daily_capacity")
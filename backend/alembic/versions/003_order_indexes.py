@@ -0,0 +1,72 @@
+"""order hot path indexes
+
+Revision ID: 003
+Revises: 002
+Create Date: 2025-02-15 00:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "003"
+down_revision: Union[str, None] = "002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_STATUSES_SQL = "status IN ('new', 'confirmed', 'rescheduled', 'in_delivery')"
+
+# (имя, таблица, колонки, доп. параметры)
+INDEXES = [
+    ("ix_orders_user_status_created", "orders", ["user_id", "status", "created_at"], {}),
+    ("ix_orders_user_created", "orders", ["user_id", "created_at", "id"], {}),
+    (
+        "ix_orders_user_active",
+        "orders",
+        ["user_id", "created_at"],
+        {"postgresql_where": sa.text(ACTIVE_STATUSES_SQL)},
+    ),
+    (
+        "ix_orders_new_created",
+        "orders",
+        ["created_at"],
+        {"postgresql_where": sa.text("status = 'new'")},
+    ),
+    (
+        "ix_orders_delivery_date",
+        "orders",
+        ["delivery_date"],
+        {
+            "postgresql_include": ["total_qty", "address_id"],
+            "postgresql_where": sa.text("status <> 'cancelled'"),
+        },
+    ),
+    ("ix_orders_address_id", "orders", ["address_id"], {}),
+    ("ix_order_logs_order_id", "order_logs", ["order_id"], {}),
+    ("ix_addresses_user_id", "addresses", ["user_id"], {}),
+    ("ix_user_roles_user_id", "user_roles", ["user_id"], {}),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY — без блокировки записи в orders на больших таблицах
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+                **kwargs,
+            )
+    op.execute("ANALYZE orders")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
@@ -0,0 +1,47 @@
+"""order updated_at
+
+Revision ID: 005
+Revises: 004
+Create Date: 2025-03-10 00:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "005"
+down_revision: Union[str, None] = "004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "orders",
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+    )
+    # Для существующих заказов — время последнего известного изменения
+    op.execute(
+        "UPDATE orders SET updated_at = "
+        "GREATEST(created_at, COALESCE(confirmed_at, created_at))"
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_orders_updated_at",
+            "orders",
+            ["updated_at"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_orders_updated_at", table_name="orders")
+    op.drop_column("orders", "updated_at")
@@ -12,15 +12,26 @@ from app.schemas.district import (
     HolidayOut,
     DeliveryDateResponse,
 )
-from app.services.delivery_date_service import calculate_nearest_delivery_date
+from app.services.delivery_date_service import (
+    calculate_nearest_delivery_date,
+    get_default_start_date,
+)
+from app.services.reference_cache import invalidate_reference_data
+from app.services.response_cache import DELIVERY_DATE, DISTRICTS, cached
 
 router = APIRouter()
 
 
 @router.get("/", response_model=list[DistrictLimitOut])
 async def list_districts(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(DistrictLimit).order_by(DistrictLimit.district))
-    return list(result.scalars().all())
+    async def load():
+        result = await db.execute(select(DistrictLimit).order_by(DistrictLimit.district))
+        return [
+            DistrictLimitOut.model_validate(d).model_dump(mode="json")
+            for d in result.scalars().all()
+        ]
+
+    return await cached(DISTRICTS, "all", load)
 
 
 @router.patch("/{district_id}", response_model=DistrictLimitOut)
@@ -37,7 +48,8 @@ async def update_district(
         district.max_per_day = data.max_per_day
     if data.is_active is not None:
         district.is_active = data.is_active
-    await db.flush()
+    await db.commit()
+    await invalidate_reference_data()
     return district
 
 
@@ -51,7 +63,8 @@ async def list_holidays(db: AsyncSession = Depends(get_db)):
 async def add_holiday(data: HolidayCreate, db: AsyncSession = Depends(get_db)):
     holiday = Holiday(date=data.date, description=data.description)
     db.add(holiday)
-    await db.flush()
+    await db.commit()
+    await invalidate_reference_data()
     return holiday
 
 
@@ -61,8 +74,17 @@ async def calc_delivery_date(
     qty: int = 1,
     db: AsyncSession = Depends(get_db),
 ):
+    # Только подсказка для клиента: create_order кэш не читает и резервирует
+    # лимит по журналу, так что устаревший ответ не приведёт к перебронированию
+    start_date = get_default_start_date()
+
+    async def load():
+        result = await calculate_nearest_delivery_date(db, district, qty, start_date)
+        return DeliveryDateResponse(district=district, **result).model_dump(mode="json")
+
     try:
-        result = await calculate_nearest_delivery_date(db, district, qty)
-        return DeliveryDateResponse(district=district, **result)
+        return await cached(
+            DELIVERY_DATE, f"{district}:{qty}:{start_date}", load, scope=district
+        )
     except ValueError as e:
         raise HTTPException(400, str(e))
@@ -1,14 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.schemas.order import OrderOut, OrderStatusUpdate
+from app.schemas.order import (
+    OrderOut,
+    OrderListOut,
+    OrderStatusUpdate,
+    OperatorFeedOut,
+    OrderContextOut,
+    BulkOrderAction,
+    BulkOrderActionOut,
+)
 from app.models.order import OrderStatus
 from app.services.order_service import (
     get_new_orders,
-    get_order_by_id,
+    get_operator_feed,
+    get_order_context,
     update_order_status,
     get_user_orders,
+    bulk_update_status,
 )
 
 router = APIRouter()
@@ -20,27 +32,78 @@ async def list_new_orders(db: AsyncSession = Depends(get_db)):
     return orders
 
 
-@router.post("/orders/{order_id}/confirm", response_model=OrderOut)
-async def confirm_order(
+@router.get("/orders/feed", response_model=OperatorFeedOut)
+async def orders_feed(
+    limit: int = Query(10, ge=1, le=50),
+    cursor: int | None = None,
+    district: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    items, remaining, next_cursor = await get_operator_feed(
+        db, limit=limit, cursor=cursor, district=district
+    )
+    return OperatorFeedOut(items=items, remaining=remaining, next_cursor=next_cursor)
+
+
+@router.post("/orders/bulk/{action}", response_model=BulkOrderActionOut)
+async def bulk_action(
+    action: Literal["confirm", "cancel", "deliver", "complete"],
+    data: BulkOrderAction,
+    db: AsyncSession = Depends(get_db),
+):
+    from app.services.user_service import get_operator_by_telegram_id
+
+    operator = await get_operator_by_telegram_id(db, data.operator_telegram_id)
+    if not operator:
+        raise HTTPException(403, "Массовые действия доступны только операторам")
+    results = await bulk_update_status(
+        db,
+        action,
+        order_ids=data.order_ids,
+        delivery_date=data.delivery_date,
+        district=data.district,
+        operator_id=operator.id,
+        comment=data.comment,
+        dry_run=data.dry_run,
+    )
+    updated = 0 if data.dry_run else sum(r["ok"] for r in results)
+    return BulkOrderActionOut(updated=updated, results=results)
+
+
+@router.get("/orders/{order_id}/context", response_model=OrderContextOut)
+async def order_context(
     order_id: int,
-    operator_telegram_id: int = 0,
+    history_limit: int = Query(5, ge=1, le=20),
     db: AsyncSession = Depends(get_db),
 ):
-    order = await get_order_by_id(db, order_id)
+    context = await get_order_context(db, order_id, history_limit=history_limit)
+    if not context:
+        raise HTTPException(404, "Заказ не найден")
+    return context
+
+
+async def _change_status(db: AsyncSession, order_id: int, new_status: OrderStatus, **kwargs):
+    try:
+        order = await update_order_status(db, order_id, new_status, **kwargs)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     if not order:
         raise HTTPException(404, "Заказ не найден")
-    if order.status != OrderStatus.new:
-        raise HTTPException(400, "Можно подтвердить только новый заказ")
+    return order
 
+
+@router.post("/orders/{order_id}/confirm", response_model=OrderOut)
+async def confirm_order(
+    order_id: int,
+    operator_telegram_id: int = 0,
+    db: AsyncSession = Depends(get_db),
+):
     from app.services.user_service import get_user_by_telegram_id
 
     operator = await get_user_by_telegram_id(db, operator_telegram_id)
     op_id = operator.id if operator else None
 
-    updated = await update_order_status(
-        db, order, OrderStatus.confirmed, operator_id=op_id
-    )
-    return updated
+    return await _change_status(db, order_id, OrderStatus.confirmed, operator_id=op_id)
 
 
 @router.post("/orders/{order_id}/cancel", response_model=OrderOut)
@@ -49,17 +112,8 @@ async def cancel_order(
     data: OrderStatusUpdate | None = None,
     db: AsyncSession = Depends(get_db),
 ):
-    order = await get_order_by_id(db, order_id)
-    if not order:
-        raise HTTPException(404, "Заказ не найден")
-    if order.status in (OrderStatus.completed, OrderStatus.cancelled):
-        raise HTTPException(400, "Невозможно отменить этот заказ")
-
     comment = data.comment if data else None
-    updated = await update_order_status(
-        db, order, OrderStatus.cancelled, comment=comment
-    )
-    return updated
+    return await _change_status(db, order_id, OrderStatus.cancelled, comment=comment)
 
 
 @router.post("/orders/{order_id}/reschedule", response_model=OrderOut)
@@ -68,43 +122,37 @@ async def reschedule_order(
     data: OrderStatusUpdate,
     db: AsyncSession = Depends(get_db),
 ):
-    order = await get_order_by_id(db, order_id)
-    if not order:
-        raise HTTPException(404, "Заказ не найден")
     if not data.delivery_date:
         raise HTTPException(400, "Укажите новую дату доставки")
 
-    updated = await update_order_status(
+    return await _change_status(
         db,
-        order,
+        order_id,
         OrderStatus.rescheduled,
         delivery_date=data.delivery_date,
         comment=data.comment,
     )
-    return updated
 
 
 @router.post("/orders/{order_id}/deliver", response_model=OrderOut)
 async def start_delivery(order_id: int, db: AsyncSession = Depends(get_db)):
-    order = await get_order_by_id(db, order_id)
-    if not order:
-        raise HTTPException(404, "Заказ не найден")
-    updated = await update_order_status(db, order, OrderStatus.in_delivery)
-    return updated
+    return await _change_status(db, order_id, OrderStatus.in_delivery)
 
 
 @router.post("/orders/{order_id}/complete", response_model=OrderOut)
 async def complete_order(order_id: int, db: AsyncSession = Depends(get_db)):
-    order = await get_order_by_id(db, order_id)
-    if not order:
-        raise HTTPException(404, "Заказ не найден")
-    updated = await update_order_status(db, order, OrderStatus.completed)
-    return updated
+    return await _change_status(db, order_id, OrderStatus.completed)
 
 
-@router.get("/client/{user_id}/history", response_model=list[OrderOut])
+@router.get("/client/{user_id}/history", response_model=OrderListOut)
 async def client_history(
-    user_id: int, limit: int = 5, db: AsyncSession = Depends(get_db)
+    user_id: int,
+    limit: int = Query(5, ge=1, le=100),
+    cursor: int | None = None,
+    with_total: bool = False,
+    db: AsyncSession = Depends(get_db),
 ):
-    orders, _ = await get_user_orders(db, user_id, limit=limit)
-    return orders
+    orders, total, next_cursor = await get_user_orders(
+        db, user_id, limit=limit, cursor=cursor, with_total=with_total
+    )
+    return OrderListOut(orders=orders, total=total, next_cursor=next_cursor)
@@ -37,13 +37,17 @@ async def list_orders(
     telegram_id: int,
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: int | None = Query(None, description="next_cursor предыдущей страницы"),
+    with_total: bool = True,
     db: AsyncSession = Depends(get_db),
 ):
     user = await get_user_by_telegram_id(db, telegram_id)
     if not user:
         raise HTTPException(404, "Пользователь не найден")
-    orders, total = await get_user_orders(db, user.id, limit, offset)
-    return OrderListOut(orders=orders, total=total)
+    orders, total, next_cursor = await get_user_orders(
+        db, user.id, limit, offset, cursor=cursor, with_total=with_total
+    )
+    return OrderListOut(orders=orders, total=total, next_cursor=next_cursor)
 
 
 @router.get("/user/{telegram_id}/active", response_model=OrderOut | None)
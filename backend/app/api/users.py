@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.schemas.user import UserCreate, UserUpdate, UserOut
+from app.schemas.user import UserCreate, UserUpdate, UserProfileOut
 from app.services.user_service import (
     get_user_by_telegram_id,
     create_user,
@@ -12,28 +12,28 @@ from app.services.user_service import (
 router = APIRouter()
 
 
-@router.post("/", response_model=UserOut, status_code=201)
+@router.post("/", response_model=UserProfileOut, status_code=201)
 async def register_user(data: UserCreate, db: AsyncSession = Depends(get_db)):
     existing = await get_user_by_telegram_id(db, data.telegram_id)
     if existing:
         raise HTTPException(400, "Пользователь уже зарегистрирован")
-    user = await create_user(db, data.telegram_id, data.name, data.phone)
-    return user
+    await create_user(db, data.telegram_id, data.name, data.phone)
+    return await get_user_by_telegram_id(db, data.telegram_id, with_roles=True)
 
 
-@router.get("/tg/{telegram_id}", response_model=UserOut)
+@router.get("/tg/{telegram_id}", response_model=UserProfileOut)
 async def get_user(telegram_id: int, db: AsyncSession = Depends(get_db)):
-    user = await get_user_by_telegram_id(db, telegram_id)
+    user = await get_user_by_telegram_id(db, telegram_id, with_roles=True)
     if not user:
         raise HTTPException(404, "Пользователь не найден")
     return user
 
 
-@router.patch("/tg/{telegram_id}", response_model=UserOut)
+@router.patch("/tg/{telegram_id}", response_model=UserProfileOut)
 async def patch_user(
     telegram_id: int, data: UserUpdate, db: AsyncSession = Depends(get_db)
 ):
-    user = await get_user_by_telegram_id(db, telegram_id)
+    user = await get_user_by_telegram_id(db, telegram_id, with_roles=True)
     if not user:
         raise HTTPException(404, "Пользователь не найден")
     updated = await update_user(db, user, **data.model_dump(exclude_unset=True))
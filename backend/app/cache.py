@@ -0,0 +1,49 @@
+"""Общий асинхронный клиент Redis для backend (и синхронный для задач Celery)."""
+
+import logging
+
+import redis
+from redis.asyncio import Redis
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_redis: Redis | None = None
+_sync_redis: redis.Redis | None = None
+
+
+def get_redis() -> Redis | None:
+    """Клиент Redis или None, если кэш отключён настройкой REDIS_CACHE_ENABLED."""
+    global _redis
+    if not settings.REDIS_CACHE_ENABLED:
+        return None
+    if _redis is None:
+        _redis = Redis.from_url(
+            settings.redis_url,
+            socket_timeout=1,
+            socket_connect_timeout=1,
+        )
+    return _redis
+
+
+def get_sync_redis() -> redis.Redis | None:
+    """Синхронный клиент для блокирующего кода (gspread и т.п.) или None."""
+    global _sync_redis
+    if not settings.REDIS_CACHE_ENABLED:
+        return None
+    if _sync_redis is None:
+        _sync_redis = redis.Redis.from_url(
+            settings.redis_url,
+            socket_timeout=1,
+            socket_connect_timeout=1,
+        )
+    return _sync_redis
+
+
+async def close_redis() -> None:
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
@@ -13,14 +13,25 @@ class Settings(BaseSettings):
     # Redis
     REDIS_HOST: str = "redis"
     REDIS_PORT: int = 6379
+    REDIS_CACHE_ENABLED: bool = True
 
     # Telegram
     BOT_TOKEN: str = ""
     ADMIN_CHAT_ID: int = 0
+    TELEGRAM_API_URL: str = "https://api.telegram.org"
+    TELEGRAM_CONCURRENCY: int = 20  # одновременных запросов к Bot API
+    TELEGRAM_GLOBAL_RATE: float = 25.0  # сообщений в секунду на бота
+    TELEGRAM_PER_CHAT_RATE: float = 1.0  # сообщений в секунду в один чат
+    TELEGRAM_MAX_RETRIES: int = 3
 
     # Google Sheets
     GOOGLE_SHEETS_CREDENTIALS: str = ""
     GOOGLE_SHEET_ID: str = ""
+    SHEETS_SYNC_INTERVAL: float = 10.0  # окно накопления изменений, сек
+    SHEETS_SYNC_BATCH: int = 500  # заказов за одну запись
+    SHEETS_BACKOFF_BASE: int = 30  # пауза после исчерпания квоты, сек
+    SHEETS_BACKOFF_MAX: int = 600
+    SHEETS_EXPORT_CHUNK: int = 1000  # строк на запрос при полной выгрузке
 
     # Приложение
     APP_HOST: str = "0.0.0.0"
@@ -34,8 +45,18 @@ class Settings(BaseSettings):
     # Бизнес-логика
     ORDER_CUTOFF_HOUR: int = 17  # после 17:00 — только на завтра
     ORDER_AUTO_CANCEL_HOURS: int = 24
+    AUTO_CANCEL_BATCH_SIZE: int = 500  # заказов на одну транзакцию автоотмены
     ORDER_REMINDER_HOURS: int = 2
+    ORDER_REMINDER_DIGEST: bool = True  # одна сводка оператору вместо сообщения на заказ
+    ORDER_REMINDER_REPEAT_HOURS: int = 2  # повтор сводки без новых заказов
     DUPLICATE_ORDER_MINUTES: int = 10
+    ORDER_NOTIFY_CHECK_INTERVAL: float = 30.0  # сверка пропущенных уведомлений, сек
+    ORDER_NOTIFY_CATCHUP_MINUTES: int = 60  # за какой срок досылать пропущенные
+
+    # Кэш справочников (лимиты районов, праздники)
+    REFERENCE_CACHE_TTL: int = 300  # полная перезагрузка, сек
+    REFERENCE_CACHE_CHECK_INTERVAL: float = 5.0  # проверка версии в Redis, сек
+    RESPONSE_CACHE_TTL: int = 30  # кэш ответов районов и расчёта даты, сек
 
     @property
     def database_url(self) -> str:
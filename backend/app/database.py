@@ -28,10 +28,15 @@ class Base(DeclarativeBase):
 
 
 async def get_db() -> AsyncSession:
+    from app.services.response_cache import invalidate_dirty
+    from app.services.sheets_queue import enqueue_dirty
+
     async with async_session() as session:
         try:
             yield session
             await session.commit()
+            await invalidate_dirty(session)
+            await enqueue_dirty(session)
         except Exception:
             await session.rollback()
             raise
@@ -14,6 +14,7 @@ from app.models.address import Address
 from app.models.order import Order, OrderStatus
 from app.models.district import DistrictLimit
 from app.models.holiday import Holiday
+from app.services.capacity_service import reconcile_capacity
 
 
 async def seed_database():
@@ -159,6 +160,10 @@ async def seed_database():
             ),
         ]
         db.add_all(orders)
+        await db.flush()
+
+        # Журнал занятости по созданным заказам
+        await reconcile_capacity(db)
         await db.commit()
 
         print("Тестовые данные успешно загружены!")
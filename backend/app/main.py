@@ -5,6 +5,7 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import get_settings
 from app.database import engine, Base
+from app.cache import close_redis
 from app.api.router import api_router
 
 
@@ -23,6 +24,7 @@ async def lifespan(app: FastAPI):
     yield
 
     # Shutdown
+    await close_redis()
     await engine.dispose()
 
 
@@ -3,6 +3,7 @@ from app.models.address import Address
 from app.models.order import Order, OrderLog, OrderStatus
 from app.models.district import DistrictLimit
 from app.models.holiday import Holiday
+from app.models.capacity import DailyCapacity
 
 __all__ = [
     "User",
@@ -13,4 +14,5 @@ __all__ = [
     "OrderStatus",
     "DistrictLimit",
     "Holiday",
+    "DailyCapacity",
 ]
@@ -10,7 +10,9 @@ class Address(Base):
     __tablename__ = "addresses"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), index=True
+    )
     city: Mapped[str] = mapped_column(String(100), nullable=False)
     district: Mapped[str] = mapped_column(String(100), nullable=False)
     street: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -20,5 +22,7 @@ class Address(Base):
         DateTime(timezone=True), server_default=func.now()
     )
 
-    user = relationship("User", back_populates="addresses")
-    orders = relationship("Order", back_populates="address", lazy="selectin")
+    user = relationship("User", back_populates="addresses", lazy="raise")
+    orders = relationship(
+        "Order", back_populates="address", lazy="raise", passive_deletes=True
+    )
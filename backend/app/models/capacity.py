@@ -0,0 +1,18 @@
+from datetime import date
+
+from sqlalchemy import Date, String, Integer, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class DailyCapacity(Base):
+    """Занятые бутыли на дату по району (district="*" — итог по всем районам)."""
+
+    __tablename__ = "daily_capacity"
+    __table_args__ = (UniqueConstraint("date", "district"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    date: Mapped[date] = mapped_column(Date, nullable=False)
+    district: Mapped[str] = mapped_column(String(100), nullable=False)
+    used: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
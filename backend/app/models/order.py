@@ -8,8 +8,10 @@ from sqlalchemy import (
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Text,
     func,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -28,8 +30,67 @@ class OrderStatus(str, enum.Enum):
     paid = "paid"
 
 
+_CANCELLABLE = frozenset(
+    {
+        OrderStatus.new,
+        OrderStatus.confirmed,
+        OrderStatus.rescheduled,
+        OrderStatus.in_delivery,
+        OrderStatus.payment_pending,
+    }
+)
+
+# Допустимые переходы: новый статус → из каких статусов в него можно попасть.
+# Проверяются в самом UPDATE (WHERE status IN ...), см. order_service.
+ORDER_TRANSITIONS: dict[OrderStatus, frozenset[OrderStatus]] = {
+    OrderStatus.confirmed: frozenset({OrderStatus.new}),
+    OrderStatus.rescheduled: frozenset(
+        {
+            OrderStatus.new,
+            OrderStatus.confirmed,
+            OrderStatus.rescheduled,
+            OrderStatus.in_delivery,
+        }
+    ),
+    OrderStatus.in_delivery: frozenset({OrderStatus.confirmed, OrderStatus.rescheduled}),
+    OrderStatus.completed: frozenset({OrderStatus.in_delivery}),
+    OrderStatus.cancelled: _CANCELLABLE,
+}
+
+
+ACTIVE_STATUSES_SQL = "status IN ('new', 'confirmed', 'rescheduled', 'in_delivery')"
+
+
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # История клиента, проверка дублей, последний выполненный заказ
+        Index("ix_orders_user_status_created", "user_id", "status", "created_at"),
+        Index("ix_orders_user_created", "user_id", "created_at", "id"),
+        # Активный заказ клиента
+        Index(
+            "ix_orders_user_active",
+            "user_id",
+            "created_at",
+            postgresql_where=text(ACTIVE_STATUSES_SQL),
+        ),
+        # Новые и зависшие заказы
+        Index(
+            "ix_orders_new_created",
+            "created_at",
+            postgresql_where=text("status = 'new'"),
+        ),
+        # Суммы бутылей по дням
+        Index(
+            "ix_orders_delivery_date",
+            "delivery_date",
+            postgresql_include=["total_qty", "address_id"],
+            postgresql_where=text("status <> 'cancelled'"),
+        ),
+        Index("ix_orders_address_id", "address_id"),
+        # Инкрементальная выгрузка в Google Sheets
+        Index("ix_orders_updated_at", "updated_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
@@ -50,21 +111,34 @@ class Order(Base):
     confirmed_at: Mapped[datetime | None] = mapped_column(
         DateTime(timezone=True), nullable=True
     )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+    # Когда заказ последний раз попал в напоминание операторам
+    reminded_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
     operator_id: Mapped[int | None] = mapped_column(
         ForeignKey("users.id", ondelete="SET NULL"), nullable=True
     )
 
-    user = relationship("User", back_populates="orders", foreign_keys=[user_id])
-    address = relationship("Address", back_populates="orders")
-    operator = relationship("User", foreign_keys=[operator_id])
-    logs = relationship("OrderLog", back_populates="order", lazy="selectin")
+    user = relationship(
+        "User", back_populates="orders", foreign_keys=[user_id], lazy="raise"
+    )
+    address = relationship("Address", back_populates="orders", lazy="raise")
+    operator = relationship("User", foreign_keys=[operator_id], lazy="raise")
+    logs = relationship(
+        "OrderLog", back_populates="order", lazy="raise", passive_deletes=True
+    )
 
 
 class OrderLog(Base):
     __tablename__ = "order_logs"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"))
+    order_id: Mapped[int] = mapped_column(
+        ForeignKey("orders.id", ondelete="CASCADE"), index=True
+    )
     action: Mapped[str] = mapped_column(String(50), nullable=False)
     old_status: Mapped[str | None] = mapped_column(String(50), nullable=True)
     new_status: Mapped[str | None] = mapped_column(String(50), nullable=True)
@@ -76,4 +150,4 @@ class OrderLog(Base):
         DateTime(timezone=True), server_default=func.now()
     )
 
-    order = relationship("Order", back_populates="logs")
+    order = relationship("Order", back_populates="logs", lazy="raise")
@@ -26,21 +26,29 @@ class User(Base):
         DateTime(timezone=True), server_default=func.now()
     )
 
-    addresses = relationship("Address", back_populates="user", lazy="selectin")
+    # Связи не загружаются неявно: нужные данные подгружаются опциями запроса
+    addresses = relationship(
+        "Address", back_populates="user", lazy="raise", passive_deletes=True
+    )
     orders = relationship(
         "Order",
         back_populates="user",
-        lazy="selectin",
+        lazy="raise",
+        passive_deletes=True,
         foreign_keys="[Order.user_id]",
     )
-    roles = relationship("UserRole", back_populates="user", lazy="selectin")
+    roles = relationship(
+        "UserRole", back_populates="user", lazy="raise", passive_deletes=True
+    )
 
 
 class UserRole(Base):
     __tablename__ = "user_roles"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), index=True
+    )
     role: Mapped[RoleEnum] = mapped_column(Enum(RoleEnum), nullable=False)
 
-    user = relationship("User", back_populates="roles")
+    user = relationship("User", back_populates="roles", lazy="raise")
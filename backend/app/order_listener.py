@@ -0,0 +1,39 @@
+"""
+Процесс-слушатель новых заказов: LISTEN new_order -> карточка заказа операторам.
+
+Запуск: python -m app.order_listener
+"""
+
+import asyncio
+import logging
+
+from app.cache import close_redis
+from app.config import get_settings
+from app.database import async_session, engine
+from app.services.order_events import NewOrderDispatcher, NewOrderListener
+from app.services.telegram_service import close_sender, get_sender
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    settings = get_settings()
+    listener = NewOrderListener(
+        settings.database_url_sync,
+        NewOrderDispatcher(async_session, get_sender()),
+    )
+    logger.info("Слушатель новых заказов запущен")
+    try:
+        await listener.run()
+    finally:
+        await close_sender()
+        await close_redis()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
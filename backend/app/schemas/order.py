@@ -1,6 +1,9 @@
 from datetime import datetime, date
 from pydantic import BaseModel, Field, model_validator
 
+from app.schemas.address import AddressOut
+from app.schemas.user import UserOut
+
 
 class OrderCreate(BaseModel):
     address_id: int
@@ -27,6 +30,35 @@ class OrderStatusUpdate(BaseModel):
     delivery_date: date | None = None
 
 
+class BulkOrderAction(BaseModel):
+    """Массовое действие: список заказов или фильтр по дате доставки и району."""
+
+    order_ids: list[int] | None = Field(default=None, max_length=1000)
+    delivery_date: date | None = None
+    district: str | None = None
+    comment: str | None = None
+    operator_telegram_id: int
+    dry_run: bool = False
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if self.order_ids is None and self.delivery_date is None:
+            raise ValueError("Укажите order_ids или delivery_date")
+        return self
+
+
+class BulkOrderResult(BaseModel):
+    id: int
+    ok: bool
+    status: str | None = None
+    error: str | None = None
+
+
+class BulkOrderActionOut(BaseModel):
+    updated: int
+    results: list[BulkOrderResult]
+
+
 class OrderOut(BaseModel):
     id: int
     user_id: int
@@ -46,4 +78,51 @@ class OrderOut(BaseModel):
 
 class OrderListOut(BaseModel):
     orders: list[OrderOut]
-    total: int
+    total: int | None = None
+    next_cursor: int | None = None
+
+
+class OperatorFeedItem(BaseModel):
+    id: int
+    created_at: datetime
+    delivery_date: date | None
+    jv_qty: int
+    lv_qty: int
+    total_qty: int
+    comment: str | None
+    client_name: str
+    client_phone: str | None
+    client_telegram_id: int
+    address: str | None
+    district: str | None
+
+
+class OperatorFeedOut(BaseModel):
+    items: list[OperatorFeedItem]
+    remaining: int
+    next_cursor: int | None = None
+
+
+class ClientOrderSummary(BaseModel):
+    id: int
+    delivery_date: date | None
+    total_qty: int
+    status: str
+    created_at: datetime
+
+
+class ClientStats(BaseModel):
+    total_orders: int
+    completed_orders: int
+    cancelled_orders: int
+    total_bottles: int  # по выполненным заказам
+    first_order_at: datetime | None
+    last_completed_at: datetime | None
+
+
+class OrderContextOut(BaseModel):
+    order: OrderOut
+    client: UserOut
+    address: AddressOut | None
+    recent_orders: list[ClientOrderSummary]
+    stats: ClientStats
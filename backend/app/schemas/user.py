@@ -1,5 +1,5 @@
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 
 class UserCreate(BaseModel):
@@ -23,6 +23,17 @@ class UserOut(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class UserProfileOut(UserOut):
+    """Профиль для бота: с ролями, чтобы проверять доступ к операторским действиям."""
+
+    roles: list[str] = []
+
+    @field_validator("roles", mode="before")
+    @classmethod
+    def role_names(cls, value):
+        return [getattr(r, "role", r) for r in value or []]
+
+
 class UserRoleOut(BaseModel):
     id: int
     user_id: int
@@ -2,6 +2,9 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.address import Address
+from app.models.order import Order
+from app.services.capacity_service import shift_district_usage
+from app.services.sheets_export import ADDRESS_SHEET_FIELDS, touch_orders
 
 
 async def get_addresses_by_user(db: AsyncSession, user_id: int) -> list[Address]:
@@ -35,14 +38,27 @@ async def create_address(db: AsyncSession, user_id: int, **kwargs) -> Address:
 
 
 async def update_address(db: AsyncSession, address: Address, **kwargs) -> Address:
+    new_district = kwargs.get("district")
+    if new_district is not None and new_district != address.district:
+        await shift_district_usage(db, address.id, address.district, new_district)
+
+    changed = set()
     for key, value in kwargs.items():
         if value is not None and hasattr(address, key):
+            if getattr(address, key) != value:
+                changed.add(key)
             setattr(address, key, value)
+    if changed.intersection(ADDRESS_SHEET_FIELDS):
+        await touch_orders(db, Order.address_id == address.id)
     await db.flush()
     return address
 
 
 async def delete_address(db: AsyncSession, address: Address) -> None:
+    # Заказы адреса остаются без района — освобождаем лимит района
+    await shift_district_usage(db, address.id, address.district, None)
+    # address_id обнулит внешний ключ, updated_at сам не сдвинется
+    await touch_orders(db, Order.address_id == address.id)
     await db.delete(address)
     await db.flush()
 
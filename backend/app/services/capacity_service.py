@@ -0,0 +1,306 @@
+"""
+Журнал занятости доставки (daily_capacity).
+
+Для каждой даты хранится число занятых бутылей по району и итоговая строка
+с district="*". Журнал меняется в той же транзакции, что и заказ, поэтому
+расчёт даты читает готовые суммы вместо агрегации по orders.
+
+Сверка с orders: python -m app.services.capacity_service
+"""
+
+import asyncio
+import logging
+from datetime import date
+
+from sqlalchemy import select, func, update, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.address import Address
+from app.models.capacity import DailyCapacity
+from app.models.order import Order, OrderStatus
+from app.services.response_cache import mark_capacity_changed
+
+logger = logging.getLogger(__name__)
+
+ALL_DISTRICTS = "*"
+
+CANCELLED_STATUSES = {OrderStatus.cancelled}
+
+# (дата доставки, район, бутыли) — вклад заказа в журнал
+Usage = tuple[date, str | None, int]
+
+
+def _insert(db: AsyncSession):
+    """INSERT с поддержкой ON CONFLICT для текущего диалекта."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(DailyCapacity)
+
+
+def _districts(rows: list[dict]) -> set[str]:
+    """Районы строк журнала — для сброса их кэша дат (итоговая строка не в счёт)."""
+    return {row["district"] for row in rows if row["district"] != ALL_DISTRICTS}
+
+
+async def _increment(db: AsyncSession, rows: list[dict]) -> None:
+    """Прибавить used к строкам журнала, создавая недостающие."""
+    if not rows:
+        return
+    mark_capacity_changed(db, _districts(rows))
+    stmt = _insert(db).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["date", "district"],
+        set_={"used": DailyCapacity.used + stmt.excluded.used},
+    )
+    await db.execute(stmt)
+
+
+async def try_reserve(
+    db: AsyncSession,
+    target_date: date,
+    district: str | None,
+    qty: int,
+    district_limit: int,
+    total_limit: int,
+) -> bool:
+    """
+    Атомарно занять qty бутылей на дату, если хватает обоих лимитов.
+
+    Строки журнала меняются условным UPDATE ... WHERE used + qty <= limit,
+    поэтому конкурирующие транзакции не могут превысить лимит: вторая ждёт
+    блокировку строки и перепроверяет условие по свежему значению.
+    Строка остаётся заблокированной до конца транзакции, даже если лимит
+    не прошёл. Поэтому все изменения журнала в транзакции идут по
+    возрастанию даты, итоговая строка раньше районной (см. move_usage,
+    release_usages, reserve_nearest_delivery_date) — иначе возможна
+    взаимная блокировка с заказом, ищущим дату дальше.
+    """
+    rows = [{"date": target_date, "district": ALL_DISTRICTS, "used": 0}]
+    if district:
+        rows.append({"date": target_date, "district": district, "used": 0})
+    await db.execute(
+        _insert(db).values(rows).on_conflict_do_nothing(
+            index_elements=["date", "district"]
+        )
+    )
+
+    if not await _increment_within(db, target_date, ALL_DISTRICTS, qty, total_limit):
+        return False
+    if district and not await _increment_within(
+        db, target_date, district, qty, district_limit
+    ):
+        # Район переполнен — вернуть итог (строка уже заблокирована нами)
+        await _increment(
+            db, [{"date": target_date, "district": ALL_DISTRICTS, "used": -qty}]
+        )
+        return False
+    return True
+
+
+async def _increment_within(
+    db: AsyncSession, target_date: date, district: str, qty: int, limit: int
+) -> bool:
+    mark_capacity_changed(db, _districts([{"district": district}]))
+    result = await db.execute(
+        update(DailyCapacity)
+        .where(
+            DailyCapacity.date == target_date,
+            DailyCapacity.district == district,
+            DailyCapacity.used + qty <= limit,
+        )
+        .values(used=DailyCapacity.used + qty)
+        .returning(DailyCapacity.used)
+    )
+    return result.scalar_one_or_none() is not None
+
+
+def order_usage(order: Order, district: str | None) -> Usage | None:
+    """Вклад заказа в журнал или None, если заказ лимит не занимает."""
+    if order.delivery_date is None or order.status in CANCELLED_STATUSES:
+        return None
+    return order.delivery_date, district, order.total_qty
+
+
+async def add_usage(
+    db: AsyncSession, target_date: date, district: str | None, qty: int
+) -> None:
+    """Занять (qty > 0) или освободить (qty < 0) бутыли на дату."""
+    rows = [{"date": target_date, "district": ALL_DISTRICTS, "used": qty}]
+    if district:
+        rows.append({"date": target_date, "district": district, "used": qty})
+    await _increment(db, rows)
+
+
+async def move_usage(
+    db: AsyncSession, before: Usage | None, after: Usage | None
+) -> None:
+    """Перенести вклад заказа из состояния before в состояние after."""
+    if before == after:
+        return
+    changes = []
+    if before is not None:
+        target_date, district, qty = before
+        changes.append((target_date, district, -qty))
+    if after is not None:
+        changes.append(after)
+    # Строки журнала — по возрастанию даты, как в try_reserve
+    for target_date, district, qty in sorted(changes, key=lambda c: c[0]):
+        await add_usage(db, target_date, district, qty)
+
+
+async def release_usages(db: AsyncSession, usages: list[Usage]) -> None:
+    """Освободить занятость многих заказов одним запросом (суммы по дате и району)."""
+    totals: dict[tuple[date, str], int] = {}
+    for target_date, district, qty in usages:
+        total_key = (target_date, ALL_DISTRICTS)
+        totals[total_key] = totals.get(total_key, 0) + qty
+        if district:
+            totals[(target_date, district)] = totals.get((target_date, district), 0) + qty
+    # Итоговые строки раньше районных — тот же порядок блокировок, что в try_reserve
+    keys = sorted(totals, key=lambda k: (k[0], k[1] != ALL_DISTRICTS, k[1]))
+    await _increment(
+        db, [{"date": d, "district": dist, "used": -totals[(d, dist)]} for d, dist in keys]
+    )
+
+
+async def shift_district_usage(
+    db: AsyncSession, address_id: int, old_district: str, new_district: str | None
+) -> None:
+    """
+    Перенести занятость заказов адреса между районами (итог не меняется).
+    new_district=None — адрес удаляется, заказы остаются без района.
+    """
+    result = await db.execute(
+        select(Order.delivery_date, func.sum(Order.total_qty))
+        .where(
+            Order.address_id == address_id,
+            Order.delivery_date.is_not(None),
+            Order.status.notin_(CANCELLED_STATUSES),
+        )
+        .group_by(Order.delivery_date)
+    )
+    rows = []
+    for target_date, qty in result.all():
+        rows.append({"date": target_date, "district": old_district, "used": -qty})
+        if new_district:
+            rows.append({"date": target_date, "district": new_district, "used": qty})
+    rows.sort(key=lambda r: (r["date"], r["district"]))
+    await _increment(db, rows)
+
+
+async def get_capacity_usage(
+    db: AsyncSession, district: str, start_date: date, end_date: date
+) -> dict[date, tuple[int, int]]:
+    """
+    Занятость по дням в полуинтервале [start_date, end_date) из журнала.
+
+    Возвращает {дата: (бутылей по району, бутылей всего)}; дни без заказов
+    в словарь не попадают.
+    """
+    result = await db.execute(
+        select(DailyCapacity.date, DailyCapacity.district, DailyCapacity.used).where(
+            DailyCapacity.date >= start_date,
+            DailyCapacity.date < end_date,
+            DailyCapacity.district.in_([district, ALL_DISTRICTS]),
+        )
+    )
+    usage: dict[date, tuple[int, int]] = {}
+    for target_date, row_district, used in result.all():
+        district_used, total_used = usage.get(target_date, (0, 0))
+        if row_district == ALL_DISTRICTS:
+            total_used = used
+        else:
+            district_used = used
+        usage[target_date] = (district_used, total_used)
+    return usage
+
+
+async def _actual_usage(db: AsyncSession) -> dict[tuple[date, str], int]:
+    """Занятость, пересчитанная по таблице orders."""
+    result = await db.execute(
+        select(Order.delivery_date, Address.district, func.sum(Order.total_qty))
+        .outerjoin(Address, Order.address_id == Address.id)
+        .where(
+            Order.delivery_date.is_not(None),
+            Order.status.notin_(CANCELLED_STATUSES),
+        )
+        .group_by(Order.delivery_date, Address.district)
+    )
+    actual: dict[tuple[date, str], int] = {}
+    for target_date, district, qty in result.all():
+        total_key = (target_date, ALL_DISTRICTS)
+        actual[total_key] = actual.get(total_key, 0) + qty
+        if district:
+            actual[(target_date, district)] = qty
+    return actual
+
+
+async def reconcile_capacity(db: AsyncSession) -> list[dict]:
+    """
+    Пересобрать журнал по orders.
+
+    Исправляет только расходящиеся строки (UPSERT used = по заказам) и
+    возвращает их список: [{"date", "district", "ledger", "actual"}, ...].
+    Запускается явно (make reconcile-capacity), а не при старте приложения.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # Заказы, изменившие журнал, успевают закоммититься до чтения orders,
+        # новые ждут конца сверки; второй одновременный запуск тоже ждёт
+        await db.execute(text("LOCK TABLE daily_capacity IN EXCLUSIVE MODE"))
+    actual = await _actual_usage(db)
+    result = await db.execute(
+        select(DailyCapacity.date, DailyCapacity.district, DailyCapacity.used)
+    )
+    ledger = {(row[0], row[1]): row[2] for row in result.all()}
+
+    drift = []
+    for key in sorted(set(actual) | set(ledger)):
+        expected = actual.get(key, 0)
+        recorded = ledger.get(key)
+        if recorded == expected or (recorded is None and expected == 0):
+            continue
+        drift.append(
+            {"date": key[0], "district": key[1], "ledger": recorded or 0, "actual": expected}
+        )
+
+    if drift:
+        mark_capacity_changed(db, _districts(drift))
+        stmt = _insert(db).values(
+            [{"date": i["date"], "district": i["district"], "used": i["actual"]} for i in drift]
+        )
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["date", "district"], set_={"used": stmt.excluded.used}
+            )
+        )
+
+    for item in drift:
+        logger.warning(
+            "Расхождение журнала %s / %s: было %s, по заказам %s",
+            item["date"], item["district"], item["ledger"], item["actual"],
+        )
+    return drift
+
+
+async def _reconcile_main():
+    from app.database import async_session
+
+    async with async_session() as db:
+        drift = await reconcile_capacity(db)
+        await db.commit()
+
+    if not drift:
+        print("Журнал занятости совпадает с заказами")
+        return
+    print(f"Исправлено строк журнала: {len(drift)}")
+    for item in drift:
+        print(
+            f"  {item['date']} {item['district']}: "
+            f"{item['ledger']} -> {item['actual']}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(_reconcile_main())
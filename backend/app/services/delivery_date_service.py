@@ -13,37 +13,28 @@ from datetime import date, datetime, timedelta
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.order import Order, OrderStatus
-from app.models.district import DistrictLimit
-from app.models.holiday import Holiday
+from app.models.order import Order
+from app.models.address import Address
+from app.services.capacity_service import (
+    CANCELLED_STATUSES,
+    Usage,
+    get_capacity_usage,
+    release_usages,
+    try_reserve,
+)
+from app.services.reference_cache import get_reference_data
 from app.config import get_settings
 
 settings = get_settings()
 
 TOTAL_DAILY_LIMIT = 331
-
-CANCELLED_STATUSES = {OrderStatus.cancelled}
+SEARCH_WINDOW_DAYS = 60
 
 
 async def get_district_limit(db: AsyncSession, district: str) -> int:
-    """Получить дневной лимит для района."""
-    result = await db.execute(
-        select(DistrictLimit.max_per_day).where(
-            DistrictLimit.district == district,
-            DistrictLimit.is_active.is_(True),
-        )
-    )
-    limit = result.scalar_one_or_none()
-    if limit is None:
-        # Район «Прочие»
-        result = await db.execute(
-            select(DistrictLimit.max_per_day).where(
-                DistrictLimit.district == "Прочие",
-                DistrictLimit.is_active.is_(True),
-            )
-        )
-        limit = result.scalar_one_or_none()
-    return limit or 91
+    """Получить дневной лимит для района (с откатом на «Прочие»)."""
+    reference = await get_reference_data(db)
+    return reference.district_limit(district)
 
 
 async def get_orders_count_for_date(
@@ -55,8 +46,6 @@ async def get_orders_count_for_date(
         Order.status.notin_(CANCELLED_STATUSES),
     )
     if district:
-        from app.models.address import Address
-
         query = query.join(Address, Order.address_id == Address.id).where(
             Address.district == district
         )
@@ -66,10 +55,8 @@ async def get_orders_count_for_date(
 
 async def is_holiday(db: AsyncSession, target_date: date) -> bool:
     """Проверить, является ли дата праздником."""
-    result = await db.execute(
-        select(Holiday.id).where(Holiday.date == target_date)
-    )
-    return result.scalar_one_or_none() is not None
+    reference = await get_reference_data(db)
+    return target_date in reference.holidays
 
 
 def is_weekend(target_date: date) -> bool:
@@ -77,6 +64,48 @@ def is_weekend(target_date: date) -> bool:
     return target_date.weekday() in (5, 6)
 
 
+async def get_holidays_between(
+    db: AsyncSession, start_date: date, end_date: date
+) -> set[date]:
+    """Праздники в полуинтервале [start_date, end_date)."""
+    reference = await get_reference_data(db)
+    return {d for d in reference.holidays if start_date <= d < end_date}
+
+
+def pick_delivery_date(
+    start_date: date,
+    qty: int,
+    district_limit: int,
+    usage: dict[date, tuple[int, int]],
+    holidays: set[date],
+) -> dict | None:
+    """Выбрать первую подходящую дату окна по заранее собранной занятости."""
+    current_date = start_date
+    for _ in range(SEARCH_WINDOW_DAYS):
+        if not is_weekend(current_date) and current_date not in holidays:
+            district_used, total_used = usage.get(current_date, (0, 0))
+            district_available = district_limit - district_used
+            total_available = TOTAL_DAILY_LIMIT - total_used
+
+            if district_available >= qty and total_available >= qty:
+                return {
+                    "delivery_date": current_date,
+                    "district_remaining": district_available - qty,
+                    "total_remaining": total_available - qty,
+                }
+
+        current_date += timedelta(days=1)
+    return None
+
+
+def get_default_start_date() -> date:
+    """Первая допустимая дата с учётом времени отсечки."""
+    now = datetime.now()
+    if now.hour < settings.ORDER_CUTOFF_HOUR:
+        return now.date()
+    return now.date() + timedelta(days=1)
+
+
 async def calculate_nearest_delivery_date(
     db: AsyncSession,
     district: str,
@@ -86,45 +115,69 @@ async def calculate_nearest_delivery_date(
     """
     Рассчитать ближайшую доступную дату доставки.
 
+    Занятость на всё окно читается одним запросом к журналу daily_capacity,
+    лимиты и праздники берутся из кэша справочников, дата выбирается в памяти.
+
     Возвращает dict:
         delivery_date: date
         district_remaining: int
         total_remaining: int
     """
-    now = datetime.now()
-
     if start_date is None:
-        if now.hour < settings.ORDER_CUTOFF_HOUR:
-            start_date = now.date()
-        else:
-            start_date = now.date() + timedelta(days=1)
+        start_date = get_default_start_date()
 
+    end_date = start_date + timedelta(days=SEARCH_WINDOW_DAYS)
     district_limit = await get_district_limit(db, district)
-    current_date = start_date
+    holidays = await get_holidays_between(db, start_date, end_date)
+    usage = await get_capacity_usage(db, district, start_date, end_date)
 
-    # Ищем максимум 60 дней вперёд
-    for _ in range(60):
-        if is_weekend(current_date):
-            current_date += timedelta(days=1)
-            continue
+    result = pick_delivery_date(start_date, qty, district_limit, usage, holidays)
+    if result is None:
+        raise ValueError("Не удалось найти доступную дату доставки в ближайшие 60 дней")
+    return result
 
-        if await is_holiday(db, current_date):
-            current_date += timedelta(days=1)
-            continue
 
-        district_used = await get_orders_count_for_date(db, current_date, district)
-        total_used = await get_orders_count_for_date(db, current_date)
+async def reserve_nearest_delivery_date(
+    db: AsyncSession,
+    district: str | None,
+    qty: int,
+    start_date: date | None = None,
+    release: Usage | None = None,
+) -> dict:
+    """
+    Рассчитать ближайшую дату и атомарно занять на неё лимит.
 
-        district_available = district_limit - district_used
-        total_available = TOTAL_DAILY_LIMIT - total_used
+    Если между расчётом и резервированием дату успел занять конкурирующий
+    заказ, поиск продолжается со следующего дня в пределах того же окна.
 
-        if district_available >= qty and total_available >= qty:
-            return {
-                "delivery_date": current_date,
-                "district_remaining": district_available - qty,
-                "total_remaining": total_available - qty,
-            }
+    release — прежний вклад редактируемого заказа. Он освобождается, когда
+    поиск доходит до его даты (или после резервирования более ранней), —
+    строки журнала блокируются по возрастанию даты, как у create_order.
+    """
+    if start_date is None:
+        start_date = get_default_start_date()
+    window_end = start_date + timedelta(days=SEARCH_WINDOW_DAYS)
 
-        current_date += timedelta(days=1)
+    district_limit = await get_district_limit(db, district)
+    current_date = start_date
+    while current_date < window_end:
+        date_info = await calculate_nearest_delivery_date(
+            db, district, qty, start_date=current_date
+        )
+        delivery_date = date_info["delivery_date"]
+        if release is not None and delivery_date >= release[0]:
+            # Дальше прежней даты: освободить её и пересчитать без своего вклада
+            await release_usages(db, [release])
+            release = None
+            continue
+        if delivery_date >= window_end:
+            break
+        if await try_reserve(
+            db, delivery_date, district, qty, district_limit, TOTAL_DAILY_LIMIT
+        ):
+            if release is not None:
+                await release_usages(db, [release])
+            return date_info
+        current_date = delivery_date + timedelta(days=1)
 
     raise ValueError("Не удалось найти доступную дату доставки в ближайшие 60 дней")
@@ -0,0 +1,249 @@
+"""
+Мгновенные уведомления операторов о новых заказах.
+
+create_order выполняет pg_notify('new_order', id) в своей транзакции:
+PostgreSQL доставит событие только после commit и не доставит при откате.
+Процесс-слушатель (python -m app.order_listener) держит отдельное
+соединение с LISTEN, собирает события в короткие пачки и рассылает
+карточки заказов операторам по возрастанию номера заказа.
+
+Повторы исключаются меткой orders:notified:{id} в Redis (SET NX), поэтому
+несколько слушателей и повторная сверка не присылают заказ дважды.
+Уведомления, пропущенные пока слушатель был отключён, досылаются сверкой:
+при старте и раз в ORDER_NOTIFY_CHECK_INTERVAL секунд.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.cache import get_redis
+from app.config import get_settings
+from app.models.address import Address
+from app.models.order import Order, OrderStatus
+from app.models.user import User
+from app.services.telegram_service import OutgoingMessage
+from app.services.user_service import get_operators
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+NEW_ORDER_CHANNEL = "new_order"
+NOTIFIED_KEY = "orders:notified:{}"
+NOTIFIED_TTL = 2 * 24 * 3600
+
+# Сколько ждать следующие события, прежде чем разослать пачку
+BATCH_WINDOW = 0.05
+BATCH_MAX = 100
+
+_memory_notified: dict[int, float] = {}
+
+
+async def publish_new_order(db: AsyncSession, order_id: int) -> None:
+    """Событие о новом заказе; уйдёт слушателю после commit (только PostgreSQL)."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    await db.execute(select(func.pg_notify(NEW_ORDER_CHANNEL, str(order_id))))
+
+
+def new_order_keyboard(order_id: int) -> dict:
+    return {
+        "inline_keyboard": [
+            [
+                {"text": "✅ Подтвердить", "callback_data": f"op_confirm_{order_id}"},
+                {"text": "❌ Отменить", "callback_data": f"op_cancel_{order_id}"},
+            ],
+            [
+                {"text": "📅 Перенести дату", "callback_data": f"op_reschedule_{order_id}"},
+            ],
+            [
+                {"text": "📞 Связаться с клиентом", "callback_data": f"op_contact_{order_id}"},
+            ],
+        ]
+    }
+
+
+def format_new_order(order: Order, user: User, address: Address | None) -> str:
+    client_type = "Постоянный" if user.phone else "Новый"
+    lines = [
+        f"🆕 <b>Новый заказ №{order.id}</b>",
+        "",
+        f"👤 {user.name} ({client_type})",
+        f"📱 {user.phone or '—'}",
+    ]
+    if address:
+        lines.append(f"📍 {address.district}, {address.street}, {address.house}")
+    lines.extend([
+        f"💧 ЖВ: {order.jv_qty} | ЛВ: {order.lv_qty} | Всего: {order.total_qty}",
+        f"📅 Предложенная дата: {order.delivery_date or '—'}",
+    ])
+    if order.comment:
+        lines.append(f"💬 {order.comment}")
+    return "\n".join(lines)
+
+
+async def _claim(order_id: int) -> bool:
+    """Занять право уведомить о заказе; False — уже уведомлено."""
+    redis = get_redis()
+    if redis is None:
+        now = time.monotonic()
+        if _memory_notified.get(order_id, 0) > now:
+            return False
+        _memory_notified[order_id] = now + NOTIFIED_TTL
+        return True
+    try:
+        return bool(await redis.set(NOTIFIED_KEY.format(order_id), 1, nx=True, ex=NOTIFIED_TTL))
+    except Exception as e:
+        # Лучше возможный повтор, чем потерянный заказ
+        logger.warning(f"Redis недоступен, заказ {order_id} без проверки повтора: {e}")
+        return True
+
+
+async def _release(order_id: int) -> None:
+    redis = get_redis()
+    if redis is None:
+        _memory_notified.pop(order_id, None)
+        return
+    try:
+        await redis.delete(NOTIFIED_KEY.format(order_id))
+    except Exception:
+        pass
+
+
+class NewOrderDispatcher:
+    """Рассылка карточек новых заказов операторам."""
+
+    def __init__(self, session_maker: async_sessionmaker, sender):
+        self.session_maker = session_maker
+        self.sender = sender
+
+    async def dispatch(self, order_ids) -> list[int]:
+        """
+        Уведомить о заказах (повторы и уже обработанные пропускаются).
+        Возвращает номера заказов, которые дошли хотя бы одному оператору.
+        """
+        ids = sorted(set(order_ids))
+        if not ids:
+            return []
+        async with self.session_maker() as db:
+            result = await db.execute(
+                select(Order, User, Address)
+                .join(User, Order.user_id == User.id)
+                .outerjoin(Address, Order.address_id == Address.id)
+                .where(Order.id.in_(ids), Order.status == OrderStatus.new)
+                .order_by(Order.id)
+            )
+            rows = result.all()
+            if not rows:
+                return []
+            operators = await get_operators(db)
+
+        delivered = []
+        # По одному заказу за раз: у оператора заказы идут по порядку номеров
+        for order, user, address in rows:
+            if not await _claim(order.id):
+                continue
+            text = format_new_order(order, user, address)
+            keyboard = new_order_keyboard(order.id)
+            results = await self.sender.fan_out(
+                [OutgoingMessage(op.telegram_id, text, keyboard) for op in operators]
+            )
+            if any(r.ok for r in results):
+                delivered.append(order.id)
+            else:
+                # Не дошло никому — пусть подхватит следующая сверка
+                await _release(order.id)
+                logger.warning(f"Заказ №{order.id}: уведомление не доставлено операторам")
+        return delivered
+
+    async def catch_up(self, now: datetime | None = None) -> list[int]:
+        """Дослать уведомления о новых заказах за последние ORDER_NOTIFY_CATCHUP_MINUTES."""
+        now = now or datetime.now()
+        since = now - timedelta(minutes=settings.ORDER_NOTIFY_CATCHUP_MINUTES)
+        async with self.session_maker() as db:
+            result = await db.execute(
+                select(Order.id).where(
+                    Order.status == OrderStatus.new, Order.created_at >= since
+                )
+            )
+            ids = list(result.scalars().all())
+        return await self.dispatch(ids)
+
+
+class NewOrderListener:
+    """LISTEN new_order на отдельном соединении asyncpg с переподключением."""
+
+    def __init__(self, dsn: str, dispatcher: NewOrderDispatcher):
+        self.dsn = dsn
+        self.dispatcher = dispatcher
+        self.queue: asyncio.Queue[int] = asyncio.Queue()
+        self.ready = asyncio.Event()
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            self.queue.put_nowait(int(payload))
+        except ValueError:
+            logger.warning(f"Некорректное событие {channel}: {payload!r}")
+
+    async def _next_batch(self, timeout: float) -> list[int]:
+        """Пачка событий: первое ждём до timeout, следующие — BATCH_WINDOW."""
+        try:
+            batch = [await asyncio.wait_for(self.queue.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+        deadline = time.monotonic() + BATCH_WINDOW
+        while len(batch) < BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _listen_once(self) -> None:
+        import asyncpg
+
+        connection = await asyncpg.connect(self.dsn)
+        try:
+            await connection.add_listener(NEW_ORDER_CHANNEL, self._on_notify)
+            # События, пришедшие до LISTEN, подберёт сверка
+            await self.dispatcher.catch_up()
+            self.ready.set()
+            last_check = time.monotonic()
+            while not connection.is_closed():
+                batch = await self._next_batch(settings.ORDER_NOTIFY_CHECK_INTERVAL)
+                if batch:
+                    await self.dispatcher.dispatch(batch)
+                if time.monotonic() - last_check >= settings.ORDER_NOTIFY_CHECK_INTERVAL:
+                    await self.dispatcher.catch_up()
+                    last_check = time.monotonic()
+            logger.warning("Соединение LISTEN закрыто сервером")
+        finally:
+            self.ready.clear()
+            if not connection.is_closed():
+                await connection.close()
+
+    async def run(self) -> None:
+        delay = 1.0
+        while True:
+            started = time.monotonic()
+            try:
+                await self._listen_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Слушатель новых заказов: {e}")
+            if time.monotonic() - started > 60:
+                delay = 1.0
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+def reset_memory_notified() -> None:
+    _memory_notified.clear()
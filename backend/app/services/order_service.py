@@ -1,12 +1,21 @@
 from datetime import datetime, timedelta
 
-from sqlalchemy import select, func
+from sqlalchemy import select, func, or_, and_, update, insert, case
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.models.order import Order, OrderLog, OrderStatus
+from app.models.order import ORDER_TRANSITIONS, Order, OrderLog, OrderStatus
 from app.models.address import Address
-from app.services.delivery_date_service import calculate_nearest_delivery_date
+from app.models.user import User
+from app.services.delivery_date_service import reserve_nearest_delivery_date
+from app.services.capacity_service import (
+    CANCELLED_STATUSES,
+    move_usage,
+    order_usage,
+    release_usages,
+)
+from app.services.sheets_queue import mark_sheet_dirty
+from app.services.order_events import publish_new_order
 from app.config import get_settings
 
 settings = get_settings()
@@ -43,8 +52,8 @@ async def create_order(
     if not addr:
         raise ValueError("Адрес не найден")
 
-    # Рассчитать дату
-    date_info = await calculate_nearest_delivery_date(
+    # Рассчитать дату и занять лимит
+    date_info = await reserve_nearest_delivery_date(
         db, addr.district, total_qty
     )
 
@@ -69,42 +78,81 @@ async def create_order(
     )
     db.add(log)
     await db.flush()
+    mark_sheet_dirty(db, order.id)
+    await publish_new_order(db, order.id)
 
     return order
 
 
-async def get_order_by_id(db: AsyncSession, order_id: int) -> Order | None:
+async def _get_order_district(db: AsyncSession, order: Order) -> str | None:
+    """Район адреса заказа (без загрузки самого адреса)."""
+    if order.address_id is None:
+        return None
     result = await db.execute(
-        select(Order)
-        .options(selectinload(Order.address), selectinload(Order.user))
-        .where(Order.id == order_id)
+        select(Address.district).where(Address.id == order.address_id)
     )
     return result.scalar_one_or_none()
 
 
-async def get_user_orders(
-    db: AsyncSession, user_id: int, limit: int = 20, offset: int = 0
-) -> tuple[list[Order], int]:
-    # Подсчёт
-    count_q = select(func.count(Order.id)).where(Order.user_id == user_id)
-    total = (await db.execute(count_q)).scalar_one()
+async def get_order_by_id(
+    db: AsyncSession, order_id: int, with_relations: bool = False
+) -> Order | None:
+    query = select(Order).where(Order.id == order_id)
+    if with_relations:
+        query = query.options(selectinload(Order.address), selectinload(Order.user))
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
 
-    # Заказы
-    result = await db.execute(
+
+async def get_user_orders(
+    db: AsyncSession,
+    user_id: int,
+    limit: int = 20,
+    offset: int = 0,
+    cursor: int | None = None,
+    with_total: bool = True,
+) -> tuple[list[Order], int | None, int | None]:
+    """
+    История заказов клиента, от новых к старым.
+
+    cursor — id последнего заказа предыдущей страницы: следующая страница
+    выбирается по (created_at, id) без OFFSET. Возвращает
+    (заказы, всего или None, курсор следующей страницы или None).
+    """
+    total = None
+    if with_total:
+        count_q = select(func.count(Order.id)).where(Order.user_id == user_id)
+        total = (await db.execute(count_q)).scalar_one()
+
+    query = (
         select(Order)
-        .options(selectinload(Order.address))
         .where(Order.user_id == user_id)
-        .order_by(Order.created_at.desc())
-        .limit(limit)
-        .offset(offset)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit + 1)
     )
-    return list(result.scalars().all()), total
+    if cursor is not None:
+        anchor = select(Order.created_at).where(Order.id == cursor).scalar_subquery()
+        query = query.where(
+            or_(
+                Order.created_at < anchor,
+                and_(Order.created_at == anchor, Order.id < cursor),
+            )
+        )
+    elif offset:
+        query = query.offset(offset)
+
+    result = await db.execute(query)
+    orders = list(result.scalars().all())
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = orders[-1].id
+    return orders, total, next_cursor
 
 
 async def get_active_order(db: AsyncSession, user_id: int) -> Order | None:
     result = await db.execute(
         select(Order)
-        .options(selectinload(Order.address))
         .where(
             Order.user_id == user_id,
             Order.status.in_([
@@ -123,7 +171,6 @@ async def get_active_order(db: AsyncSession, user_id: int) -> Order | None:
 async def get_last_completed_order(db: AsyncSession, user_id: int) -> Order | None:
     result = await db.execute(
         select(Order)
-        .options(selectinload(Order.address))
         .where(
             Order.user_id == user_id,
             Order.status == OrderStatus.completed,
@@ -134,23 +181,79 @@ async def get_last_completed_order(db: AsyncSession, user_id: int) -> Order | No
     return result.scalar_one_or_none()
 
 
+def transition_error(old_status: OrderStatus, new_status: OrderStatus) -> str:
+    return f"Недопустимый переход: {old_status.value} → {new_status.value}"
+
+
 async def update_order_status(
     db: AsyncSession,
-    order: Order,
+    order_id: int,
     new_status: OrderStatus,
     operator_id: int | None = None,
     comment: str | None = None,
     delivery_date=None,
-) -> Order:
-    old_status = order.status
-    order.status = new_status
-
+) -> Order | None:
+    """
+    Перевести заказ в new_status по ORDER_TRANSITIONS без предварительной
+    загрузки: условный UPDATE ... WHERE status IN (допустимые) RETURNING.
+
+    Из одновременных изменений одного заказа проходит первое, остальные
+    видят уже новый статус. None — заказа нет, ValueError — переход
+    из текущего статуса недопустим.
+    """
+    allowed = ORDER_TRANSITIONS[new_status]
+    values = {"status": new_status}
     if new_status == OrderStatus.confirmed:
-        order.confirmed_at = datetime.now()
+        values["confirmed_at"] = datetime.now()
     if delivery_date:
-        order.delivery_date = delivery_date
+        values["delivery_date"] = delivery_date
     if operator_id:
-        order.operator_id = operator_id
+        values["operator_id"] = operator_id
+
+    # Прежние статус, дата и район нужны для журнала и занятости
+    old = (
+        select(Order.id, Order.status, Order.delivery_date, Address.district)
+        .outerjoin(Address, Order.address_id == Address.id)
+        .where(Order.id == order_id, Order.status.in_(allowed))
+        .with_for_update(of=Order)
+    )
+    stmt = update(Order).values(**values).execution_options(
+        synchronize_session=False, populate_existing=True
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        # Один оператор: подзапрос блокирует строку и после ожидания
+        # перечитывает её, RETURNING отдаёт новую строку и прежние значения
+        old = old.subquery("old")
+        result = await db.execute(
+            stmt.where(Order.id == old.c.id).returning(
+                Order, old.c.status, old.c.delivery_date, old.c.district
+            )
+        )
+        row = result.one_or_none()
+    else:
+        # SQLite не видит в RETURNING таблицы из FROM; записи у него
+        # и так последовательны
+        row = None
+        previous = (await db.execute(old)).one_or_none()
+        if previous is not None:
+            result = await db.execute(
+                stmt.where(Order.id == order_id, Order.status.in_(allowed)).returning(Order)
+            )
+            order = result.scalar_one_or_none()
+            if order is not None:
+                row = (order, *previous[1:])
+
+    if row is None:
+        current = await db.scalar(select(Order.status).where(Order.id == order_id))
+        if current is None:
+            return None
+        raise ValueError(transition_error(current, new_status))
+
+    order, old_status, old_date, district = row
+    before = None
+    if old_date is not None and old_status not in CANCELLED_STATUSES:
+        before = (old_date, district, order.total_qty)
+    await move_usage(db, before, order_usage(order, district))
 
     log = OrderLog(
         order_id=order.id,
@@ -162,6 +265,7 @@ async def update_order_status(
     )
     db.add(log)
     await db.flush()
+    mark_sheet_dirty(db, order.id)
     return order
 
 
@@ -175,6 +279,9 @@ async def update_order(
     if order.status != OrderStatus.new:
         raise ValueError("Редактировать можно только заказ в статусе «Новый»")
 
+    district = await _get_order_district(db, order)
+    before = order_usage(order, district)
+
     if jv_qty is not None:
         order.jv_qty = jv_qty
     if lv_qty is not None:
@@ -187,11 +294,9 @@ async def update_order(
     if comment is not None:
         order.comment = comment
 
-    # Пересчёт даты
-    address = await db.execute(select(Address).where(Address.id == order.address_id))
-    addr = address.scalar_one()
-    date_info = await calculate_nearest_delivery_date(
-        db, addr.district, order.total_qty
+    # Пересчёт даты (без учёта текущего вклада самого заказа)
+    date_info = await reserve_nearest_delivery_date(
+        db, district, order.total_qty, release=before
     )
     order.delivery_date = date_info["delivery_date"]
 
@@ -202,29 +307,375 @@ async def update_order(
     )
     db.add(log)
     await db.flush()
+    mark_sheet_dirty(db, order.id)
     return order
 
 
+# Массовые действия оператора; допустимые исходные статусы — ORDER_TRANSITIONS
+BULK_ACTIONS: dict[str, OrderStatus] = {
+    "confirm": OrderStatus.confirmed,
+    "cancel": OrderStatus.cancelled,
+    "deliver": OrderStatus.in_delivery,
+    "complete": OrderStatus.completed,
+}
+BULK_MAX_ORDERS = 1000
+
+
+async def bulk_update_status(
+    db: AsyncSession,
+    action: str,
+    order_ids: list[int] | None = None,
+    delivery_date=None,
+    district: str | None = None,
+    operator_id: int | None = None,
+    comment: str | None = None,
+    dry_run: bool = False,
+) -> list[dict]:
+    """
+    Перевести много заказов в новый статус: по списку id или по фильтру
+    (дата доставки и район — только заказы в допустимых статусах).
+
+    Один SELECT ... FOR UPDATE с районами, один условный UPDATE, одна
+    вставка журнала и, для отмены, одно освобождение лимитов. Результат —
+    по каждому заказу: {"id", "ok", "status", "error"}; недопустимый переход
+    одного заказа не мешает остальным. dry_run — только проверить.
+    """
+    new_status = BULK_ACTIONS[action]
+    allowed = ORDER_TRANSITIONS[new_status]
+
+    query = (
+        select(
+            Order.id,
+            Order.status,
+            Order.delivery_date,
+            Order.total_qty,
+            Address.district,
+        )
+        .outerjoin(Address, Order.address_id == Address.id)
+        .order_by(Order.id)
+        .with_for_update(of=Order)
+    )
+    if order_ids is not None:
+        order_ids = list(dict.fromkeys(order_ids))[:BULK_MAX_ORDERS]
+        query = query.where(Order.id.in_(order_ids))
+    else:
+        query = query.where(Order.status.in_(allowed)).limit(BULK_MAX_ORDERS)
+        if delivery_date is not None:
+            query = query.where(Order.delivery_date == delivery_date)
+        if district:
+            query = query.where(Address.district == district)
+    rows = {row.id: row for row in (await db.execute(query)).all()}
+    if order_ids is None:
+        order_ids = list(rows)
+
+    eligible = [oid for oid, row in rows.items() if row.status in allowed]
+    updated: set[int] = set()
+    if eligible and not dry_run:
+        values = {"status": new_status}
+        if new_status == OrderStatus.confirmed:
+            values["confirmed_at"] = datetime.now()
+        if operator_id:
+            values["operator_id"] = operator_id
+        # Статус перепроверяется в самом UPDATE
+        result = await db.execute(
+            update(Order)
+            .where(Order.id.in_(eligible), Order.status.in_(allowed))
+            .values(**values)
+            .returning(Order.id)
+        )
+        updated = set(result.scalars().all())
+
+    if updated:
+        await db.execute(
+            insert(OrderLog),
+            [
+                {
+                    "order_id": oid,
+                    "action": "status_change",
+                    "old_status": rows[oid].status.value,
+                    "new_status": new_status.value,
+                    "operator_id": operator_id,
+                    "comment": comment,
+                }
+                for oid in sorted(updated)
+            ],
+        )
+        if new_status == OrderStatus.cancelled:
+            await release_usages(
+                db,
+                [
+                    (rows[oid].delivery_date, rows[oid].district, rows[oid].total_qty)
+                    for oid in sorted(updated)
+                    if rows[oid].delivery_date is not None
+                ],
+            )
+        for oid in updated:
+            mark_sheet_dirty(db, oid)
+
+    results = []
+    for oid in order_ids:
+        row = rows.get(oid)
+        if row is None:
+            results.append({"id": oid, "ok": False, "status": None, "error": "Заказ не найден"})
+        elif oid in updated or (dry_run and oid in eligible):
+            results.append({"id": oid, "ok": True, "status": new_status.value, "error": None})
+        else:
+            results.append(
+                {
+                    "id": oid,
+                    "ok": False,
+                    "status": row.status.value,
+                    "error": transition_error(row.status, new_status),
+                }
+            )
+    return results
+
+
 async def get_new_orders(db: AsyncSession) -> list[Order]:
     result = await db.execute(
         select(Order)
-        .options(
-            selectinload(Order.address),
-            selectinload(Order.user),
-        )
         .where(Order.status == OrderStatus.new)
         .order_by(Order.created_at.asc())
     )
     return list(result.scalars().all())
 
 
+async def get_operator_feed(
+    db: AsyncSession,
+    limit: int = 10,
+    cursor: int | None = None,
+    district: str | None = None,
+) -> tuple[list[dict], int, int | None]:
+    """
+    Лента новых заказов для оператора, от старых к новым.
+
+    Один запрос: заказ, клиент и адрес сразу плоской строкой, а число
+    оставшихся заказов (начиная с этой страницы) — оконной функцией.
+    cursor — id последнего заказа предыдущей страницы.
+    Возвращает (строки, осталось, курсор следующей страницы или None).
+    """
+    query = (
+        select(
+            Order.id,
+            Order.created_at,
+            Order.delivery_date,
+            Order.jv_qty,
+            Order.lv_qty,
+            Order.total_qty,
+            Order.comment,
+            User.name.label("client_name"),
+            User.phone.label("client_phone"),
+            User.telegram_id.label("client_telegram_id"),
+            Address.city,
+            Address.district,
+            Address.street,
+            Address.house,
+            func.count().over().label("remaining"),
+        )
+        .join(User, Order.user_id == User.id)
+        .outerjoin(Address, Order.address_id == Address.id)
+        .where(Order.status == OrderStatus.new)
+        .order_by(Order.created_at, Order.id)
+        .limit(limit + 1)
+    )
+    if district:
+        query = query.where(Address.district == district)
+    if cursor is not None:
+        anchor = select(Order.created_at).where(Order.id == cursor).scalar_subquery()
+        query = query.where(
+            or_(
+                Order.created_at > anchor,
+                and_(Order.created_at == anchor, Order.id > cursor),
+            )
+        )
+
+    rows = (await db.execute(query)).mappings().all()
+    remaining = rows[0]["remaining"] if rows else 0
+    items = []
+    for row in rows[:limit]:
+        item = dict(row)
+        del item["remaining"]
+        parts = [item.pop(k) for k in ("city", "district", "street", "house")]
+        item["district"] = parts[1]
+        item["address"] = ", ".join(parts) if parts[1] else None
+        items.append(item)
+    next_cursor = items[-1]["id"] if len(rows) > limit else None
+    return items, remaining, next_cursor
+
+
+async def get_order_context(
+    db: AsyncSession, order_id: int, history_limit: int = 5
+) -> dict | None:
+    """
+    Всё, что нужно оператору для связи с клиентом, одним запросом.
+
+    CTE history нумерует заказы клиента и считает по ним итоги оконными
+    функциями; к заказу присоединяются клиент, адрес и первые history_limit
+    строк истории. Возвращает {"order", "client", "address",
+    "recent_orders", "stats"} или None, если заказа нет.
+    """
+    client_id = select(Order.user_id).where(Order.id == order_id).scalar_subquery()
+    client_orders = {"partition_by": Order.user_id}
+    completed = Order.status == OrderStatus.completed
+    history = (
+        select(
+            Order.user_id,
+            Order.id,
+            Order.delivery_date,
+            Order.total_qty,
+            Order.status,
+            Order.created_at,
+            func.row_number()
+            .over(order_by=(Order.created_at.desc(), Order.id.desc()), **client_orders)
+            .label("rn"),
+            func.count().over(**client_orders).label("total_orders"),
+            func.sum(case((completed, 1), else_=0))
+            .over(**client_orders)
+            .label("completed_orders"),
+            func.sum(case((Order.status == OrderStatus.cancelled, 1), else_=0))
+            .over(**client_orders)
+            .label("cancelled_orders"),
+            func.sum(case((completed, Order.total_qty), else_=0))
+            .over(**client_orders)
+            .label("total_bottles"),
+            func.min(Order.created_at).over(**client_orders).label("first_order_at"),
+            func.max(case((completed, Order.created_at)))
+            .over(**client_orders)
+            .label("last_completed_at"),
+        )
+        .where(Order.user_id == client_id)
+        .cte("history")
+    )
+
+    query = (
+        select(Order, User, Address, history)
+        .join(User, Order.user_id == User.id)
+        .outerjoin(Address, Order.address_id == Address.id)
+        .join(
+            history,
+            and_(history.c.user_id == Order.user_id, history.c.rn <= history_limit),
+        )
+        .where(Order.id == order_id)
+        .order_by(history.c.rn)
+    )
+    rows = (await db.execute(query)).all()
+    if not rows:
+        return None
+
+    order, user, address = rows[0][:3]
+    first = rows[0]._mapping
+    return {
+        "order": order,
+        "client": user,
+        "address": address,
+        "recent_orders": [
+            {
+                "id": row._mapping[history.c.id],
+                "delivery_date": row._mapping[history.c.delivery_date],
+                "total_qty": row._mapping[history.c.total_qty],
+                "status": row._mapping[history.c.status].value,
+                "created_at": row._mapping[history.c.created_at],
+            }
+            for row in rows
+        ],
+        "stats": {
+            name: first[history.c[name]]
+            for name in (
+                "total_orders",
+                "completed_orders",
+                "cancelled_orders",
+                "total_bottles",
+                "first_order_at",
+                "last_completed_at",
+            )
+        },
+    }
+
+
 async def get_stale_orders(db: AsyncSession, hours: int) -> list[Order]:
     """Заказы в статусе new старше N часов."""
     threshold = datetime.now() - timedelta(hours=hours)
     result = await db.execute(
-        select(Order).where(
+        select(Order)
+        .options(selectinload(Order.user), selectinload(Order.address))
+        .where(
             Order.status == OrderStatus.new,
             Order.created_at <= threshold,
         )
     )
     return list(result.scalars().all())
+
+
+async def cancel_stale_orders(
+    db: AsyncSession, hours: int, comment: str, limit: int = 500
+) -> list[dict]:
+    """
+    Отменить до limit зависших заказов (new старше N часов) набором запросов.
+
+    Один UPDATE ... RETURNING вместо загрузки и изменения заказов по одному,
+    одна вставка журнала и одно освобождение лимитов. Статус перепроверяется
+    в самом UPDATE, поэтому заказ, подтверждённый оператором параллельно,
+    не отменится. Возвращает [{"id", "telegram_id"}, ...] отменённых заказов.
+    """
+    threshold = datetime.now() - timedelta(hours=hours)
+    stale = (
+        select(Order.id)
+        .where(Order.status == OrderStatus.new, Order.created_at <= threshold)
+        .order_by(Order.created_at)
+        .limit(limit)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(Order)
+        .where(Order.id.in_(stale), Order.status == OrderStatus.new)
+        .values(status=OrderStatus.cancelled)
+        .returning(
+            Order.id,
+            Order.user_id,
+            Order.address_id,
+            Order.delivery_date,
+            Order.total_qty,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    if not rows:
+        return []
+
+    await db.execute(
+        insert(OrderLog),
+        [
+            {
+                "order_id": row.id,
+                "action": "status_change",
+                "old_status": OrderStatus.new.value,
+                "new_status": OrderStatus.cancelled.value,
+                "comment": comment,
+            }
+            for row in rows
+        ],
+    )
+
+    address_ids = {row.address_id for row in rows if row.address_id}
+    districts = {}
+    if address_ids:
+        result = await db.execute(
+            select(Address.id, Address.district).where(Address.id.in_(address_ids))
+        )
+        districts = dict(result.all())
+    await release_usages(
+        db,
+        [
+            (row.delivery_date, districts.get(row.address_id), row.total_qty)
+            for row in rows
+            if row.delivery_date is not None
+        ],
+    )
+
+    result = await db.execute(
+        select(User.id, User.telegram_id).where(
+            User.id.in_({row.user_id for row in rows})
+        )
+    )
+    telegram_ids = dict(result.all())
+    return [{"id": row.id, "telegram_id": telegram_ids.get(row.user_id)} for row in rows]
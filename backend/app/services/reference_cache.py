@@ -0,0 +1,115 @@
+"""
+Кэш справочников в памяти процесса: лимиты районов и праздники.
+
+Справочники меняются несколько раз в год, поэтому расчёт даты читает их
+из памяти. Версия хранится в Redis: изменение через API увеличивает её,
+и остальные воркеры перечитывают данные не позже чем через
+REFERENCE_CACHE_CHECK_INTERVAL секунд. Без Redis кэш живёт REFERENCE_CACHE_TTL.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import date
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import get_redis
+from app.config import get_settings
+from app.models.district import DistrictLimit
+from app.models.holiday import Holiday
+from app.services.response_cache import DELIVERY_DATE, DISTRICTS, invalidate
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+VERSION_KEY = "reference:version"
+
+DEFAULT_DISTRICT = "Прочие"
+DEFAULT_DISTRICT_LIMIT = 91
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    district_limits: dict[str, int]  # только активные районы
+    holidays: frozenset[date]
+    version: int | None
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    def district_limit(self, district: str | None) -> int:
+        """Лимит района с откатом на «Прочие»."""
+        limit = self.district_limits.get(district)
+        if limit is None:
+            limit = self.district_limits.get(DEFAULT_DISTRICT)
+        return limit or DEFAULT_DISTRICT_LIMIT
+
+
+_cache: ReferenceData | None = None
+_checked_at: float = 0.0
+
+
+async def _remote_version() -> int | None:
+    redis = get_redis()
+    if redis is None:
+        return None
+    try:
+        value = await redis.get(VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Redis недоступен, версия справочников не проверена: {e}")
+        return None
+    return int(value) if value is not None else 0
+
+
+async def _load(db: AsyncSession, version: int | None) -> ReferenceData:
+    limits = await db.execute(
+        select(DistrictLimit.district, DistrictLimit.max_per_day).where(
+            DistrictLimit.is_active.is_(True)
+        )
+    )
+    holidays = await db.execute(select(Holiday.date))
+    return ReferenceData(
+        district_limits=dict(limits.all()),
+        holidays=frozenset(holidays.scalars().all()),
+        version=version,
+    )
+
+
+async def get_reference_data(db: AsyncSession) -> ReferenceData:
+    """Справочники из кэша; при устаревании — перечитать из БД."""
+    global _cache, _checked_at
+    now = time.monotonic()
+
+    if _cache is not None and now - _cache.loaded_at < settings.REFERENCE_CACHE_TTL:
+        if now - _checked_at < settings.REFERENCE_CACHE_CHECK_INTERVAL:
+            return _cache
+        version = await _remote_version()
+        _checked_at = now
+        if version is None or version == _cache.version:
+            return _cache
+    else:
+        version = await _remote_version()
+        _checked_at = now
+
+    _cache = await _load(db, version)
+    return _cache
+
+
+async def invalidate_reference_data() -> None:
+    """Сбросить кэш во всех воркерах. Вызывать после commit изменений."""
+    reset_reference_cache()
+    await invalidate(DISTRICTS, DELIVERY_DATE)
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.incr(VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Не удалось обновить версию справочников в Redis: {e}")
+
+
+def reset_reference_cache() -> None:
+    """Сбросить кэш только в текущем процессе."""
+    global _cache, _checked_at
+    _cache = None
+    _checked_at = 0.0
@@ -0,0 +1,133 @@
+"""
+Сводка зависших заказов для операторов.
+
+Вместо сообщения на каждый заказ каждому оператору — одна сводка на
+оператора, сгруппированная по району и возрасту заказа. Время последнего
+напоминания хранится в orders.reminded_at: сводка уходит, только если
+появились новые зависшие заказы или с прошлой сводки прошёл интервал повтора.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models.order import Order, OrderStatus
+
+NO_DISTRICT = "Без адреса"
+
+# Группы по возрасту заказа: (нижняя граница в часах, подпись)
+AGE_BUCKETS = [(12, "более 12 ч"), (6, "6–12 ч"), (0, "до 6 ч")]
+
+# Telegram ограничивает длину сообщения и размер клавиатуры
+MAX_DIGEST_ORDERS = 40
+MAX_BUTTON_ORDERS = 10
+
+
+@dataclass
+class Digest:
+    text: str
+    keyboard: dict | None
+    order_ids: list[int]
+
+
+async def get_orders_to_remind(
+    db: AsyncSession, hours: int, repeat_hours: int, now: datetime | None = None
+) -> tuple[list[Order], set[int]]:
+    """
+    Зависшие заказы для сводки.
+
+    Возвращает (все зависшие заказы, id ещё не напомненных). Пустой список —
+    сводку отправлять не нужно: новых заказов нет и время повтора не пришло.
+    """
+    now = now or datetime.now()
+    threshold = now - timedelta(hours=hours)
+    due = await db.execute(
+        select(Order.id).where(
+            Order.status == OrderStatus.new,
+            Order.created_at <= threshold,
+            or_(
+                Order.reminded_at.is_(None),
+                Order.reminded_at <= now - timedelta(hours=repeat_hours),
+            ),
+        ).limit(1)
+    )
+    if due.scalar_one_or_none() is None:
+        return [], set()
+
+    result = await db.execute(
+        select(Order)
+        .options(selectinload(Order.address))
+        .where(Order.status == OrderStatus.new, Order.created_at <= threshold)
+        .order_by(Order.created_at)
+    )
+    orders = list(result.scalars().all())
+    fresh = {o.id for o in orders if o.reminded_at is None}
+    return orders, fresh
+
+
+async def mark_reminded(
+    db: AsyncSession, order_ids: list[int], now: datetime | None = None
+) -> None:
+    if not order_ids:
+        return
+    await db.execute(
+        update(Order)
+        .where(Order.id.in_(order_ids))
+        # Служебная отметка — не считать заказ изменённым для выгрузки
+        .values(reminded_at=now or datetime.now(), updated_at=Order.updated_at)
+    )
+
+
+def _age_bucket(age: timedelta) -> str:
+    hours = age.total_seconds() / 3600
+    for lower, label in AGE_BUCKETS:
+        if hours >= lower:
+            return label
+    return AGE_BUCKETS[-1][1]
+
+
+def build_digest(
+    orders: list[Order], fresh_ids: set[int], now: datetime | None = None
+) -> Digest:
+    """Текст сводки и клавиатура с действиями по самым старым заказам."""
+    now = now or datetime.now()
+    groups: dict[str, dict[str, list[Order]]] = {}
+    for order in orders[:MAX_DIGEST_ORDERS]:
+        district = order.address.district if order.address else NO_DISTRICT
+        created = order.created_at
+        if created.tzinfo is not None:
+            created = created.astimezone().replace(tzinfo=None)
+        bucket = _age_bucket(now - created)
+        groups.setdefault(district, {}).setdefault(bucket, []).append(order)
+
+    lines = [f"⏰ <b>Ожидают подтверждения: {len(orders)}</b>"]
+    if fresh_ids:
+        lines.append(f"Новых с прошлой сводки: {len(fresh_ids)}")
+    bucket_order = [label for _, label in AGE_BUCKETS]
+    for district in sorted(groups):
+        lines.append(f"\n📍 <b>{district}</b>")
+        for label in bucket_order:
+            for order in groups[district].get(label, []):
+                mark = "🆕 " if order.id in fresh_ids else ""
+                date_str = (
+                    order.delivery_date.strftime("%d.%m") if order.delivery_date else "—"
+                )
+                lines.append(
+                    f"{mark}№{order.id} · {order.total_qty} бут. · "
+                    f"доставка {date_str} · {label}"
+                )
+    if len(orders) > MAX_DIGEST_ORDERS:
+        lines.append(f"\n… и ещё {len(orders) - MAX_DIGEST_ORDERS}")
+
+    rows = [
+        [
+            {"text": f"✅ №{o.id}", "callback_data": f"op_confirm_{o.id}"},
+            {"text": f"❌ №{o.id}", "callback_data": f"op_cancel_{o.id}"},
+        ]
+        for o in orders[:MAX_BUTTON_ORDERS]
+    ]
+    keyboard = {"inline_keyboard": rows} if rows else None
+    return Digest("\n".join(lines), keyboard, [o.id for o in orders])
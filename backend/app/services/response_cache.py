@@ -0,0 +1,213 @@
+"""
+Кэш ответов API в Redis для часто запрашиваемых справочных ручек.
+
+Ключ: cache:{пространство}:{версия}:{ключ запроса}. Сброс пространства —
+INCR его версии: старые ключи больше не читаются и истекают по TTL.
+Внутри пространства ключи можно разбить на области (scope): версия ключа
+тогда складывается из версии пространства и версии области, и сбросить
+можно одну область, не трогая остальные.
+Версии меняются по событиям:
+- districts — изменение районов;
+- delivery_date — изменение районов и праздников (всё пространство);
+  изменение журнала занятости (создание, отмена, перенос заказа) сбрасывает
+  только области затронутых районов: районы отмечаются в сессии и
+  сбрасываются после commit. Итоговая строка журнала общая для всех
+  районов, но из-за неё ответы других районов не сбрасываются — их
+  устаревший остаток по итогу живёт не дольше TTL.
+
+TTL короткий (RESPONSE_CACHE_TTL) — страховка от пропущенного события.
+Кэш только подсказывает дату: create_order всегда резервирует лимит
+условным UPDATE по журналу и кэш не читает, поэтому перебронирования
+из-за устаревшего ответа не бывает.
+
+Защита от «лавины» при промахе: в процессе одинаковые запросы ждут один
+расчёт, между процессами — короткая блокировка в Redis (SET NX), пока
+другой воркер кладёт значение. Без Redis кэш живёт в памяти процесса.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Iterable
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import get_redis
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+DISTRICTS = "districts"
+DELIVERY_DATE = "delivery_date"
+
+VERSION_KEY = "cache:{}:v"
+VALUE_KEY = "cache:{}:{}:{}"
+LOCK_SUFFIX = ":lock"
+SESSION_KEY = "response_cache_dirty"
+
+LOCK_TTL_MS = 3000
+LOCK_WAIT = 1.0
+LOCK_POLL = 0.02
+MEMORY_MAX_KEYS = 10000
+
+_memory_values: dict[str, tuple[float, str]] = {}
+_memory_versions: dict[str, int] = {}
+_in_flight: dict[str, asyncio.Future] = {}
+
+
+def scoped(namespace: str, scope: str) -> str:
+    """Имя области пространства — для invalidate."""
+    return f"{namespace}:{scope}"
+
+
+async def _version(namespace: str, scope: str | None = None) -> str:
+    names = [namespace] if scope is None else [namespace, scoped(namespace, scope)]
+    redis = get_redis()
+    if redis is None:
+        values = [_memory_versions.get(name, 0) for name in names]
+    else:
+        values = await redis.mget([VERSION_KEY.format(name) for name in names])
+    return ".".join(str(int(value or 0)) for value in values)
+
+
+async def _get(key: str) -> Any | None:
+    redis = get_redis()
+    if redis is None:
+        entry = _memory_values.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return json.loads(entry[1])
+    value = await redis.get(key)
+    return json.loads(value) if value is not None else None
+
+
+async def _set(key: str, value: Any, ttl: int) -> None:
+    data = json.dumps(value, ensure_ascii=False, default=str)
+    redis = get_redis()
+    if redis is None:
+        now = time.monotonic()
+        if len(_memory_values) >= MEMORY_MAX_KEYS:
+            for stale in [k for k, (expires, _) in _memory_values.items() if expires < now]:
+                del _memory_values[stale]
+        _memory_values[key] = (now + ttl, data)
+    else:
+        await redis.set(key, data, ex=ttl)
+
+
+async def _load_shared(key: str, loader, ttl: int) -> Any:
+    """Промах: считает один воркер, остальные ждут его значение до LOCK_WAIT."""
+    redis = get_redis()
+    if redis is None:
+        value = await loader()
+        await _set(key, value, ttl)
+        return value
+
+    lock = key + LOCK_SUFFIX
+    try:
+        acquired = await redis.set(lock, 1, nx=True, px=LOCK_TTL_MS)
+        if not acquired:
+            deadline = time.monotonic() + LOCK_WAIT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL)
+                value = await _get(key)
+                if value is not None:
+                    return value
+    except RedisError as e:
+        logger.warning(f"Кэш ответов недоступен: {e}")
+        return await loader()
+    if not acquired:
+        # Не дождались — считаем сами, как без кэша
+        return await loader()
+
+    try:
+        value = await loader()
+        with suppress(RedisError):
+            await _set(key, value, ttl)
+        return value
+    finally:
+        with suppress(RedisError):
+            await redis.delete(lock)
+
+
+async def cached(
+    namespace: str,
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ttl: int | None = None,
+    scope: str | None = None,
+) -> Any:
+    """
+    Ответ из кэша или loader() (значение должно сериализоваться в JSON).
+    Исключения loader не кэшируются и передаются вызывающему.
+    scope — область пространства, которую можно сбросить отдельно.
+    """
+    ttl = ttl or settings.RESPONSE_CACHE_TTL
+    try:
+        full_key = VALUE_KEY.format(namespace, await _version(namespace, scope), key)
+        value = await _get(full_key)
+    except RedisError as e:
+        logger.warning(f"Кэш ответов недоступен: {e}")
+        return await loader()
+    if value is not None:
+        return value
+
+    # Одинаковые запросы процесса ждут один расчёт
+    pending = _in_flight.get(full_key)
+    if pending is not None:
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise
+            # Отменили того, кто считал, а не нас — считаем заново
+            return await cached(namespace, key, loader, ttl, scope)
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[full_key] = future
+    try:
+        value = await _load_shared(full_key, loader, ttl)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # ожидающих может не быть — не считать ошибку потерянной
+        raise
+    else:
+        future.set_result(value)
+        return value
+    finally:
+        _in_flight.pop(full_key, None)
+
+
+async def invalidate(*namespaces: str) -> None:
+    """Сбросить пространства во всех воркерах. Вызывать после commit."""
+    redis = get_redis()
+    for namespace in namespaces:
+        if redis is None:
+            _memory_versions[namespace] = _memory_versions.get(namespace, 0) + 1
+            continue
+        try:
+            await redis.incr(VERSION_KEY.format(namespace))
+        except RedisError as e:
+            logger.warning(f"Не удалось сбросить кэш ответов {namespace}: {e}")
+
+
+def mark_capacity_changed(db: AsyncSession, districts: Iterable[str]) -> None:
+    """Занятость районов изменилась; их кэш дат сбросится после commit (invalidate_dirty)."""
+    db.info.setdefault(SESSION_KEY, set()).update(districts)
+
+
+async def invalidate_dirty(db: AsyncSession) -> None:
+    districts = db.info.pop(SESSION_KEY, None)
+    if districts:
+        await invalidate(*(scoped(DELIVERY_DATE, d) for d in sorted(districts)))
+
+
+def reset_memory_cache() -> None:
+    _memory_values.clear()
+    _memory_versions.clear()
+    _in_flight.clear()
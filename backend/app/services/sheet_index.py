@@ -0,0 +1,135 @@
+"""
+Индекс «номер заказа → номер строки» листа Google Sheets.
+
+Хранится в Redis-хэше sheets:rows:{sheet_id} (без Redis — в памяти процесса).
+Строится один раз чтением первого столбца (col_values(1)) и дополняется при
+добавлении строк, поэтому обновление заказа — одна запись в известный
+диапазон вместо поиска по всему листу. Если строки переставили вручную,
+индекс пересобирается через repair_row_index.
+"""
+
+import logging
+import re
+
+from app.cache import get_sync_redis
+
+logger = logging.getLogger(__name__)
+
+BUILT_FIELD = "__built"
+
+# "'Лист1'!A15:M15" -> 15
+UPDATED_ROW = re.compile(r"![A-Z]+(\d+)")
+
+_memory: dict[str, dict[str, str]] = {}
+
+
+class SheetRowIndex:
+    def __init__(self, sheet_id: str):
+        self.key = f"sheets:rows:{sheet_id}"
+        self.redis = get_sync_redis()
+
+    def get_all(self) -> dict[str, str]:
+        if self.redis is None:
+            return _memory.get(self.key, {})
+        return {
+            k.decode(): v.decode() for k, v in self.redis.hgetall(self.key).items()
+        }
+
+    def _replace(self, mapping: dict[str, str]) -> None:
+        if self.redis is None:
+            _memory[self.key] = dict(mapping)
+            return
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(self.key)
+        pipe.hset(self.key, mapping=mapping)
+        pipe.execute()
+
+    def is_built(self) -> bool:
+        if self.redis is None:
+            return BUILT_FIELD in _memory.get(self.key, {})
+        return bool(self.redis.hexists(self.key, BUILT_FIELD))
+
+    def get(self, order_id) -> int | None:
+        if self.redis is None:
+            row = _memory.get(self.key, {}).get(str(order_id))
+        else:
+            row = self.redis.hget(self.key, str(order_id))
+        return int(row) if row else None
+
+    def set_many(self, rows: dict) -> None:
+        if not rows:
+            return
+        mapping = {str(k): str(v) for k, v in rows.items()}
+        if self.redis is None:
+            _memory.setdefault(self.key, {}).update(mapping)
+        else:
+            self.redis.hset(self.key, mapping=mapping)
+
+    def set_from_append(self, order_ids: list, response: dict | None) -> None:
+        """
+        Запомнить строки по ответу append_row/append_rows (строки идут подряд
+        в порядке order_ids); без номера в ответе — сбросить индекс.
+        """
+        updated = ((response or {}).get("updates") or {}).get("updatedRange", "")
+        match = UPDATED_ROW.search(updated)
+        if match:
+            first = int(match.group(1))
+            self.set_many({oid: first + i for i, oid in enumerate(order_ids)})
+        else:
+            self.clear()
+
+    def clear(self) -> None:
+        if self.redis is None:
+            _memory.pop(self.key, None)
+        else:
+            self.redis.delete(self.key)
+
+    def build(self, worksheet) -> dict[str, str]:
+        """Построить индекс по первому столбцу листа (один запрос)."""
+        mapping = _rows_by_id(worksheet.col_values(1))
+        self._replace({**mapping, BUILT_FIELD: "1"})
+        return mapping
+
+    def ensure(self, worksheet) -> None:
+        if not self.is_built():
+            self.build(worksheet)
+
+
+def _rows_by_id(column: list) -> dict[str, str]:
+    """{id заказа: строка} по значениям первого столбца (строка 1 — заголовки)."""
+    mapping: dict[str, str] = {}
+    for row, value in enumerate(column[1:], start=2):
+        value = str(value).strip()
+        if not value:
+            continue
+        if value in mapping:
+            logger.warning(
+                f"Заказ {value} встречается в листе дважды: строки {mapping[value]} и {row}"
+            )
+            continue
+        mapping[value] = str(row)
+    return mapping
+
+
+def repair_row_index(index: SheetRowIndex, worksheet) -> dict:
+    """
+    Сверить индекс с листом и пересобрать его.
+
+    Возвращает {"moved", "missing", "stale"}: у скольких заказов строка
+    сменилась, сколько заказов не было в индексе и сколько записей индекса
+    указывают на заказы, которых в листе больше нет.
+    """
+    stored = {k: v for k, v in index.get_all().items() if k != BUILT_FIELD}
+    actual = index.build(worksheet)
+    report = {
+        "moved": sum(1 for k, v in actual.items() if k in stored and stored[k] != v),
+        "missing": sum(1 for k in actual if k not in stored),
+        "stale": sum(1 for k in stored if k not in actual),
+    }
+    if report["moved"] or report["stale"]:
+        logger.warning(f"Индекс строк листа исправлен: {report}")
+    return report
+
+
+def reset_memory_index() -> None:
+    _memory.clear()
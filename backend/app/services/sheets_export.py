@@ -0,0 +1,205 @@
+"""
+Полная и инкрементальная выгрузка заказов в Google Sheets.
+
+Заказы читаются потоком (server-side cursor, yield_per) вместе с клиентом,
+адресом и оператором и пишутся в лист крупными блоками, так что память не
+растёт с размером таблицы.
+
+- full: перезаписать лист целиком по порядку id и пересобрать индекс строк.
+- incremental: записать заказы, изменённые после сохранённой отметки
+  (orders.updated_at), — догоняет то, что не ушло, пока Sheets был недоступен.
+  Правки клиента и адреса, попадающие в строку листа, сдвигают updated_at
+  их заказов (touch_orders), иначе инкрементальная выгрузка их не увидит.
+
+Обе выгрузки идут под export_lock: одновременно с другой выгрузкой не
+запускаются, а очередь синхронизации на это время приостанавливается.
+
+Запуск вручную: python -m app.services.sheets_export [full|incremental]
+"""
+
+import asyncio
+import logging
+import sys
+from datetime import datetime, timedelta
+from typing import AsyncIterator
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.cache import get_redis
+from app.config import get_settings
+from app.models.address import Address
+from app.models.order import Order
+from app.models.user import User
+from app.services.sheet_index import BUILT_FIELD, SheetRowIndex
+from app.services.sheets_queue import export_lock
+from app.services.sheets_service import (
+    get_worksheet,
+    order_row,
+    prepare_order_data,
+    sync_orders_batch,
+)
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+WATERMARK_KEY = "sheets:export:watermark"
+# Запас на транзакции, которые закоммитились позже, чем начались
+WATERMARK_OVERLAP = timedelta(minutes=1)
+LAST_COLUMN = "M"
+
+_memory_watermark: dict[str, str] = {}
+
+
+async def get_watermark() -> datetime | None:
+    redis = get_redis()
+    if redis is None:
+        value = _memory_watermark.get(WATERMARK_KEY)
+    else:
+        value = await redis.get(WATERMARK_KEY)
+        value = value.decode() if value else None
+    return datetime.fromisoformat(value) if value else None
+
+
+async def set_watermark(value: datetime) -> None:
+    redis = get_redis()
+    if redis is None:
+        _memory_watermark[WATERMARK_KEY] = value.isoformat()
+    else:
+        await redis.set(WATERMARK_KEY, value.isoformat())
+
+
+# Поля клиента и адреса, которые попадают в строку заказа в листе
+USER_SHEET_FIELDS = ("name", "phone")
+ADDRESS_SHEET_FIELDS = ("city", "district", "street", "house")
+
+
+async def touch_orders(db: AsyncSession, *criteria) -> None:
+    """Сдвинуть updated_at заказов, чтобы их забрала инкрементальная выгрузка."""
+    await db.execute(update(Order).where(*criteria).values(updated_at=func.now()))
+
+
+def _export_query():
+    operator = aliased(User)
+    return (
+        select(Order, User, Address, operator)
+        .join(User, Order.user_id == User.id)
+        .outerjoin(Address, Order.address_id == Address.id)
+        .outerjoin(operator, Order.operator_id == operator.id)
+    )
+
+
+async def _stream_chunks(
+    db: AsyncSession, stmt, chunk: int
+) -> AsyncIterator[list[tuple[datetime, dict]]]:
+    """
+    Блоки [(updated_at, данные заказа)] по chunk строк.
+
+    Наружу отдаются только словари: на ORM-объекты блока ссылок не остаётся,
+    и сессия (identity map хранит их по слабым ссылкам) их не удерживает.
+    """
+    result = await db.stream(stmt.execution_options(yield_per=chunk))
+    async for partition in result.partitions():
+        yield [
+            (order.updated_at, prepare_order_data(order, user, address, operator))
+            for order, user, address, operator in partition
+        ]
+
+
+def _write_block(worksheet, start: int, rows: list[list]) -> None:
+    end = start + len(rows) - 1
+    if worksheet.row_count < end:
+        worksheet.add_rows(end - worksheet.row_count)
+    worksheet.update(f"A{start}:{LAST_COLUMN}{end}", rows)
+
+
+def _clear_below(worksheet, first_row: int) -> None:
+    if worksheet.row_count >= first_row:
+        worksheet.batch_clear([f"A{first_row}:{LAST_COLUMN}{worksheet.row_count}"])
+
+
+async def export_full(db: AsyncSession, chunk: int | None = None) -> int:
+    """Перезаписать лист всеми заказами. Возвращает число строк."""
+    chunk = chunk or settings.SHEETS_EXPORT_CHUNK
+    worksheet = await asyncio.to_thread(get_worksheet)
+    if worksheet is None:
+        return 0
+
+    index = SheetRowIndex(settings.GOOGLE_SHEET_ID)
+    written = 0
+    watermark = None
+    with export_lock():
+        index.clear()
+        stmt = _export_query().order_by(Order.id)
+        async for rows in _stream_chunks(db, stmt, chunk):
+            start = written + 2  # строка 1 — заголовки
+            await asyncio.to_thread(
+                _write_block, worksheet, start, [order_row(d) for _, d in rows]
+            )
+            index.set_many({d["id"]: start + i for i, (_, d) in enumerate(rows)})
+            written += len(rows)
+            latest = max(updated for updated, _ in rows)
+            watermark = max(watermark, latest) if watermark else latest
+
+        # Строки, оставшиеся от прежнего содержимого листа
+        await asyncio.to_thread(_clear_below, worksheet, written + 2)
+        index.set_many({BUILT_FIELD: 1})
+        if watermark:
+            await set_watermark(watermark)
+
+    logger.info(f"Полная выгрузка в Google Sheets: {written} заказов")
+    return written
+
+
+async def export_incremental(db: AsyncSession, chunk: int | None = None) -> int:
+    """
+    Записать заказы, изменённые после отметки; без отметки — полная выгрузка.
+
+    Отметка сдвигается только после записи блока, поэтому при ошибке
+    Sheets следующий запуск продолжит с места остановки. Выгрузки не идут
+    одновременно: и полная, и инкрементальная держат export_lock.
+    """
+    chunk = chunk or settings.SHEETS_EXPORT_CHUNK
+    watermark = await get_watermark()
+    if watermark is None:
+        return await export_full(db, chunk)
+    if await asyncio.to_thread(get_worksheet) is None:
+        return 0
+
+    stmt = (
+        _export_query()
+        .where(Order.updated_at > watermark - WATERMARK_OVERLAP)
+        .order_by(Order.updated_at, Order.id)
+    )
+    written = 0
+    with export_lock():
+        async for rows in _stream_chunks(db, stmt, chunk):
+            # SheetsSyncError прерывает выгрузку до сдвига отметки
+            written += await asyncio.to_thread(sync_orders_batch, [d for _, d in rows])
+            await set_watermark(max(watermark, rows[-1][0]))
+    if written:
+        logger.info(f"Инкрементальная выгрузка в Google Sheets: {written} заказов")
+    return written
+
+
+async def _export_main(mode: str):
+    from app.database import async_session
+
+    async with async_session() as db:
+        if mode == "full":
+            written = await export_full(db)
+        else:
+            written = await export_incremental(db)
+    print(f"Выгружено заказов: {written}")
+
+
+def reset_memory_watermark() -> None:
+    _memory_watermark.clear()
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "incremental"
+    if mode not in ("full", "incremental"):
+        sys.exit("Использование: python -m app.services.sheets_export [full|incremental]")
+    asyncio.run(_export_main(mode))
@@ -0,0 +1,184 @@
+"""
+Очередь синхронизации заказов с Google Sheets.
+
+Изменённые заказы помечаются в сессии (mark_sheet_dirty) и после commit
+попадают в Redis-множество sheets:dirty; повторные изменения одного заказа
+схлопываются. Задача Celery раз в SHEETS_SYNC_INTERVAL секунд забирает пачку
+id и пишет её в лист двумя запросами (batch_update + append_rows). При
+исчерпании квоты или недоступном листе незаписанные id остаются в очереди,
+а запись приостанавливается с экспоненциальной паузой.
+
+Без Redis очередь живёт в памяти процесса (разработка и тесты).
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import get_redis, get_sync_redis
+from app.config import get_settings
+from app.services.sheets_service import SheetsSyncError, get_worksheet, sync_orders_batch
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+DIRTY_KEY = "sheets:dirty"
+BACKOFF_KEY = "sheets:backoff"
+BACKOFF_LEVEL_KEY = "sheets:backoff:level"
+EXPORT_LOCK_KEY = "sheets:export:lock"
+SESSION_KEY = "sheets_dirty"
+
+_memory_dirty: set[int] = set()
+_memory_backoff = {"level": 0, "until": 0.0, "export": False}
+
+
+def mark_sheet_dirty(db: AsyncSession, order_id: int) -> None:
+    """Отметить заказ для синхронизации; в очередь он попадёт после commit."""
+    db.info.setdefault(SESSION_KEY, set()).add(order_id)
+
+
+async def enqueue_dirty(db: AsyncSession) -> None:
+    """Переложить отмеченные в сессии заказы в очередь (вызывать после commit)."""
+    ids = db.info.pop(SESSION_KEY, None)
+    if ids:
+        await enqueue(ids)
+
+
+async def enqueue(order_ids: Iterable[int]) -> None:
+    ids = list(order_ids)
+    if not ids:
+        return
+    redis = get_redis()
+    if redis is None:
+        _memory_dirty.update(ids)
+        return
+    try:
+        await redis.sadd(DIRTY_KEY, *ids)
+    except Exception as e:
+        # Пропущенное попадёт в лист при следующей полной выгрузке
+        logger.warning(f"Не удалось поставить заказы {ids} в очередь Sheets: {e}")
+
+
+def _take(limit: int) -> list[int]:
+    redis = get_sync_redis()
+    if redis is None:
+        ids = sorted(_memory_dirty)[:limit]
+        _memory_dirty.difference_update(ids)
+        return ids
+    return sorted(int(v) for v in redis.spop(DIRTY_KEY, limit) or [])
+
+
+def _requeue(ids: list[int]) -> None:
+    if not ids:
+        return
+    redis = get_sync_redis()
+    if redis is None:
+        _memory_dirty.update(ids)
+    else:
+        redis.sadd(DIRTY_KEY, *ids)
+
+
+def _paused() -> bool:
+    redis = get_sync_redis()
+    if redis is None:
+        return _memory_backoff["export"] or time.monotonic() < _memory_backoff["until"]
+    return bool(redis.exists(BACKOFF_KEY, EXPORT_LOCK_KEY))
+
+
+@contextmanager
+def export_lock(ttl: int = 3600):
+    """Приостановить очередь на время полной перезаписи листа."""
+    redis = get_sync_redis()
+    if redis is None:
+        if _memory_backoff["export"]:
+            raise RuntimeError("Выгрузка в Google Sheets уже идёт")
+        _memory_backoff["export"] = True
+    elif not redis.set(EXPORT_LOCK_KEY, 1, nx=True, ex=ttl):
+        raise RuntimeError("Выгрузка в Google Sheets уже идёт")
+    try:
+        yield
+    finally:
+        if redis is None:
+            _memory_backoff["export"] = False
+        else:
+            redis.delete(EXPORT_LOCK_KEY)
+
+
+def _start_backoff() -> int:
+    """Приостановить запись; пауза удваивается с каждой неудачей подряд."""
+    redis = get_sync_redis()
+    if redis is None:
+        _memory_backoff["level"] += 1
+        level = _memory_backoff["level"]
+    else:
+        level = redis.incr(BACKOFF_LEVEL_KEY)
+        redis.expire(BACKOFF_LEVEL_KEY, 3600)
+    pause = min(
+        settings.SHEETS_BACKOFF_BASE * 2 ** (level - 1), settings.SHEETS_BACKOFF_MAX
+    )
+    if redis is None:
+        _memory_backoff["until"] = time.monotonic() + pause
+    else:
+        redis.set(BACKOFF_KEY, level, ex=pause)
+    return pause
+
+
+def _reset_backoff() -> None:
+    redis = get_sync_redis()
+    if redis is None:
+        _memory_backoff.update(level=0, until=0.0)
+    else:
+        redis.delete(BACKOFF_LEVEL_KEY)
+
+
+def drain(load: Callable[[list[int]], list[dict]], limit: int | None = None) -> dict:
+    """
+    Записать в лист одну пачку из очереди.
+
+    load(ids) возвращает данные заказов (prepare_order_data); удалённые
+    заказы просто пропускаются. Возвращает {"written", "requeued", "pause"}.
+    """
+    report = {"written": 0, "requeued": 0, "pause": 0}
+    if _paused():
+        return report
+    try:
+        worksheet = get_worksheet()
+    except Exception as e:  # квота, сеть, доступ при открытии листа
+        worksheet, reason = None, e
+    else:
+        reason = "не настроен"
+    if worksheet is None:
+        # Лист недоступен — очередь не трогаем, повторим после паузы
+        report["pause"] = _start_backoff()
+        logger.warning(f"Лист Google Sheets недоступен ({reason}), пауза {report['pause']} с")
+        return report
+    ids = _take(limit or settings.SHEETS_SYNC_BATCH)
+    if not ids:
+        return report
+
+    try:
+        orders_data = load(ids)
+        report["written"] = sync_orders_batch(orders_data)
+    except SheetsSyncError as e:
+        _requeue(e.pending)
+        written = len(orders_data) - len(e.pending)
+        report.update(written=written, requeued=len(e.pending), pause=_start_backoff())
+        reason = "квота Sheets исчерпана" if e.quota else f"ошибка Sheets: {e}"
+        logger.warning(
+            f"{reason}; записано {written}, в очереди осталось {len(e.pending)}, "
+            f"пауза {report['pause']} с"
+        )
+        return report
+    except Exception:
+        _requeue(ids)
+        raise
+    _reset_backoff()
+    return report
+
+
+def reset_memory_queue() -> None:
+    _memory_dirty.clear()
+    _memory_backoff.update(level=0, until=0.0, export=False)
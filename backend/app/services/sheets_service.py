@@ -1,16 +1,23 @@
 """
 Синхронизация заказов в Google Sheets.
 Используется gspread с сервисным аккаунтом.
+
+Клиент и лист открываются один раз на процесс воркера и переиспользуются:
+gspread держит авторизованную сессию и сам обновляет токен сервисного
+аккаунта по истечении срока. Заголовки проверяются при первом открытии листа.
 """
 
 import json
 import logging
+import os
+import threading
 from datetime import datetime
 
 import gspread
 from google.oauth2.service_account import Credentials
 
 from app.config import get_settings
+from app.services.sheet_index import SheetRowIndex, repair_row_index
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +43,18 @@ HEADERS = [
 ]
 
 
+_lock = threading.Lock()
+_client: gspread.Client | None = None
+_worksheet: gspread.Worksheet | None = None
+_pid: int | None = None
+
+
 def get_sheets_client():
+    """Клиент gspread текущего процесса (создаётся при первом обращении)."""
+    global _client, _pid
+    if _client is not None and _pid == os.getpid():
+        return _client
+
     settings = get_settings()
     if not settings.GOOGLE_SHEETS_CREDENTIALS:
         logger.warning("Google Sheets credentials не настроены")
@@ -45,10 +63,115 @@ def get_sheets_client():
     try:
         creds_dict = json.loads(settings.GOOGLE_SHEETS_CREDENTIALS)
         creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
-        return gspread.authorize(creds)
+        client = gspread.authorize(creds)
     except Exception as e:
         logger.error(f"Ошибка подключения к Google Sheets: {e}")
         return None
+    # После fork сессия родителя не используется: у потомка свой pid
+    _client, _pid = client, os.getpid()
+    return client
+
+
+def get_worksheet():
+    """Лист заказов текущего процесса; заголовки проверяются один раз."""
+    global _worksheet
+    with _lock:
+        if _worksheet is not None and _pid == os.getpid():
+            return _worksheet
+
+        settings = get_settings()
+        if not settings.GOOGLE_SHEET_ID:
+            logger.warning("Google Sheet ID не настроен")
+            return None
+
+        client = get_sheets_client()
+        if not client:
+            return None
+
+        worksheet = client.open_by_key(settings.GOOGLE_SHEET_ID).sheet1
+        if not worksheet.row_values(1):
+            worksheet.append_row(HEADERS)
+        _worksheet = worksheet
+        return worksheet
+
+
+def reset_sheets_client() -> None:
+    """Сбросить клиент и лист — следующий вызов откроет их заново."""
+    global _client, _worksheet, _pid
+    with _lock:
+        _client = _worksheet = _pid = None
+
+
+class SheetsSyncError(Exception):
+    """Пачка записана не полностью; pending — id заказов, которые не записаны."""
+
+    def __init__(self, message: str, pending: list[int], quota: bool = False):
+        super().__init__(message)
+        self.pending = pending
+        self.quota = quota
+
+
+def order_row(order_data: dict) -> list:
+    """Строка листа по данным заказа (порядок столбцов — HEADERS)."""
+    return [
+        order_data.get("id", ""),
+        order_data.get("client_type", ""),
+        order_data.get("name", ""),
+        order_data.get("phone", ""),
+        order_data.get("address", ""),
+        order_data.get("district", ""),
+        order_data.get("jv_qty", 0),
+        order_data.get("lv_qty", 0),
+        order_data.get("total_qty", 0),
+        str(order_data.get("delivery_date", "")),
+        order_data.get("status", ""),
+        str(order_data.get("created_at", "")),
+        order_data.get("operator", ""),
+    ]
+
+
+def sync_orders_batch(orders_data: list[dict]) -> int:
+    """
+    Записать пачку заказов двумя запросами: batch_update для строк,
+    которые уже есть в листе, и append_rows для новых.
+
+    При ошибке API или недоступном листе бросает SheetsSyncError со списком
+    незаписанных заказов (если batch_update прошёл, а append_rows нет —
+    только новые).
+    """
+    if not orders_data:
+        return 0
+    ids = [d["id"] for d in orders_data]
+    worksheet = get_worksheet()
+    if worksheet is None:
+        raise SheetsSyncError("Лист Google Sheets недоступен", ids)
+
+    index = SheetRowIndex(get_settings().GOOGLE_SHEET_ID)
+    updates, appends = [], []
+    pending = ids
+    try:
+        index.ensure(worksheet)
+        for data in orders_data:
+            row_number = index.get(data["id"])
+            if row_number:
+                updates.append(
+                    {"range": f"A{row_number}:M{row_number}", "values": [order_row(data)]}
+                )
+            else:
+                appends.append(data)
+
+        if updates:
+            worksheet.batch_update(updates)
+        pending = [d["id"] for d in appends]
+        if appends:
+            response = worksheet.append_rows([order_row(d) for d in appends])
+            index.set_from_append(pending, response)
+        return len(orders_data)
+
+    except gspread.exceptions.APIError as e:
+        if e.code in (401, 403, 404):
+            reset_sheets_client()
+        raise SheetsSyncError(str(e), pending, quota=e.code == 429) from e
 
 
 def sync_order_to_sheet(order_data: dict) -> bool:
@@ -56,60 +179,45 @@ def sync_order_to_sheet(order_data: dict) -> bool:
     Синхронизировать заказ в Google Sheets.
     order_data — словарь с данными заказа.
     """
-    settings = get_settings()
-    if not settings.GOOGLE_SHEET_ID:
-        logger.warning("Google Sheet ID не настроен")
-        return False
-
-    client = get_sheets_client()
-    if not client:
-        return False
-
     try:
-        sheet = client.open_by_key(settings.GOOGLE_SHEET_ID)
-        worksheet = sheet.sheet1
-
-        # Проверить заголовки
-        existing = worksheet.row_values(1)
-        if not existing:
-            worksheet.append_row(HEADERS)
+        worksheet = get_worksheet()
+        if worksheet is None:
+            return False
 
-        # Найти строку с этим ID или добавить новую
+        # Найти строку с этим ID по индексу или добавить новую
         order_id = str(order_data.get("id", ""))
-        cell = None
-        try:
-            cell = worksheet.find(order_id, in_column=1)
-        except gspread.exceptions.CellNotFound:
-            pass
-
-        row = [
-            order_data.get("id", ""),
-            order_data.get("client_type", ""),
-            order_data.get("name", ""),
-            order_data.get("phone", ""),
-            order_data.get("address", ""),
-            order_data.get("district", ""),
-            order_data.get("jv_qty", 0),
-            order_data.get("lv_qty", 0),
-            order_data.get("total_qty", 0),
-            str(order_data.get("delivery_date", "")),
-            order_data.get("status", ""),
-            str(order_data.get("created_at", "")),
-            order_data.get("operator", ""),
-        ]
-
-        if cell:
-            worksheet.update(f"A{cell.row}:M{cell.row}", [row])
+        index = SheetRowIndex(get_settings().GOOGLE_SHEET_ID)
+        index.ensure(worksheet)
+        row_number = index.get(order_id)
+
+        row = order_row(order_data)
+
+        if row_number:
+            worksheet.update(f"A{row_number}:M{row_number}", [row])
         else:
-            worksheet.append_row(row)
+            index.set_from_append([order_id], worksheet.append_row(row))
 
         return True
 
+    except gspread.exceptions.APIError as e:
+        # Лист удалён, доступ отозван и т.п. — в следующий раз открыть заново
+        if e.response.status_code in (401, 403, 404):
+            reset_sheets_client()
+        logger.error(f"Ошибка синхронизации с Google Sheets: {e}")
+        return False
     except Exception as e:
         logger.error(f"Ошибка синхронизации с Google Sheets: {e}")
         return False
 
 
+def repair_sheet_index() -> dict | None:
+    """Пересобрать индекс строк по листу (после ручных перестановок строк)."""
+    worksheet = get_worksheet()
+    if worksheet is None:
+        return None
+    return repair_row_index(SheetRowIndex(get_settings().GOOGLE_SHEET_ID), worksheet)
+
+
 def prepare_order_data(order, user=None, address=None, operator=None) -> dict:
     """Подготовить данные заказа для Google Sheets."""
     is_new = "Новый" if user and not user.phone else "Постоянный"
@@ -0,0 +1,303 @@
+"""
+Отправка сообщений через Telegram Bot API из backend и воркеров.
+
+Один пул HTTP-соединений на процесс, ограничение параллельности,
+лимиты скорости (общий и на чат) по token bucket и обработка 429
+с retry_after. Рассылка возвращает отчёт о доставке по каждому получателю.
+
+Лимит Telegram — на бота целиком, поэтому общий token bucket и пауза после
+429 хранятся в Redis и действуют на все процессы (воркеры Celery, слушатель
+заказов). Без Redis лимит считается в процессе: N процессов вместе могут
+отправлять до N × TELEGRAM_GLOBAL_RATE сообщений в секунду. Лимит на чат
+всегда локальный.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, asdict
+
+import httpx
+from redis.exceptions import RedisError
+
+from app.cache import get_redis
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Ошибки сети и 5xx повторяем; прочие 4xx (бот заблокирован и т.п.) — нет
+RETRY_STATUSES = {500, 502, 503, 504}
+
+GLOBAL_BUCKET_KEY = "telegram:send:bucket"
+GLOBAL_PAUSE_KEY = "telegram:send:pause"
+
+# KEYS: ведро, пауза; ARGV: скорость (токенов/с), ёмкость
+# Возвращает 0 — токен получен, иначе сколько миллисекунд подождать
+GLOBAL_BUCKET_SCRIPT = """
+local pause = redis.call('PTTL', KEYS[2])
+if pause > 0 then
+    return pause
+end
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate / 1000)
+
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше capacity подряд."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                # Пауза могла начаться, пока ждали токен
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0:
+                    self._refill()
+                    if self.tokens >= 1:
+                        break
+                    wait = (1 - self.tokens) / self.rate
+                await asyncio.sleep(wait)
+            self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать токены seconds секунд (например, после 429)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity and not self._lock.locked()
+
+
+class SharedTokenBucket:
+    """
+    Общий для всех процессов token bucket в Redis. Без Redis или при его
+    ошибке — TokenBucket процесса.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.local = TokenBucket(rate, capacity)
+        self._scripts: dict[int, object] = {}
+
+    def _script(self, redis):
+        script = self._scripts.get(id(redis))
+        if script is None:
+            script = self._scripts[id(redis)] = redis.register_script(GLOBAL_BUCKET_SCRIPT)
+        return script
+
+    async def acquire(self) -> None:
+        redis = get_redis()
+        if redis is None:
+            return await self.local.acquire()
+        script = self._script(redis)
+        while True:
+            try:
+                wait = int(
+                    await script(
+                        keys=[GLOBAL_BUCKET_KEY, GLOBAL_PAUSE_KEY],
+                        args=[self.rate, self.capacity],
+                    )
+                )
+            except RedisError as e:
+                logger.warning(f"Общий лимит Telegram без Redis: {e}")
+                return await self.local.acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait / 1000)
+
+    async def pause(self, seconds: float) -> None:
+        """Остановить отправку всех процессов на seconds секунд."""
+        self.local.pause(seconds)
+        redis = get_redis()
+        if redis is None:
+            return
+        ms = int(seconds * 1000)
+        try:
+            # Более длинную паузу другого процесса не укорачиваем
+            if await redis.pttl(GLOBAL_PAUSE_KEY) < ms:
+                await redis.set(GLOBAL_PAUSE_KEY, 1, px=ms)
+        except RedisError as e:
+            logger.warning(f"Не удалось сохранить паузу Telegram в Redis: {e}")
+
+
+@dataclass
+class DeliveryResult:
+    chat_id: int
+    ok: bool
+    attempts: int
+    status_code: int | None = None
+    error: str | None = None
+    message_id: int | None = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class OutgoingMessage:
+    chat_id: int
+    text: str
+    reply_markup: dict | None = None
+
+
+class TelegramSender:
+    def __init__(
+        self,
+        token: str = settings.BOT_TOKEN,
+        base_url: str = settings.TELEGRAM_API_URL,
+        concurrency: int = settings.TELEGRAM_CONCURRENCY,
+        global_rate: float = settings.TELEGRAM_GLOBAL_RATE,
+        per_chat_rate: float = settings.TELEGRAM_PER_CHAT_RATE,
+        max_retries: int = settings.TELEGRAM_MAX_RETRIES,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.token = token
+        self.per_chat_rate = per_chat_rate
+        self.max_retries = max_retries
+        self._client = httpx.AsyncClient(
+            base_url=f"{base_url}/bot{token}",
+            timeout=httpx.Timeout(10.0, connect=3.0),
+            limits=httpx.Limits(
+                max_connections=concurrency, max_keepalive_connections=concurrency
+            ),
+            transport=transport,
+        )
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._global_bucket = SharedTokenBucket(global_rate, global_rate)
+        self._chat_buckets: dict[int, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10_000:
+                # Не копим состояние по всем чатам: простаивающие корзины полны
+                self._chat_buckets = {
+                    k: b for k, b in self._chat_buckets.items() if not b.idle
+                }
+            bucket = TokenBucket(self.per_chat_rate, 1)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def send_message(
+        self, chat_id: int, text: str, reply_markup: dict | None = None
+    ) -> DeliveryResult:
+        """Отправить одно сообщение с учётом лимитов и повторов."""
+        if not self.token:
+            logger.warning("BOT_TOKEN не настроен, пропуск отправки")
+            return DeliveryResult(chat_id, False, 0, error="BOT_TOKEN не настроен")
+
+        payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+        if reply_markup:
+            payload["reply_markup"] = json.dumps(reply_markup)
+
+        result = DeliveryResult(chat_id, False, 0)
+        chat_bucket = self._chat_bucket(chat_id)
+        while result.attempts <= self.max_retries:
+            await chat_bucket.acquire()
+            await self._global_bucket.acquire()
+            # Слот занят только на время запроса, не на паузу перед повтором
+            async with self._semaphore:
+                result.attempts += 1
+                delay = await self._attempt(payload, result)
+            if delay is None:
+                break
+            if result.status_code == 429:
+                # Лимит — на бота: ждёт вся рассылка, этот запрос — в ведре
+                await self._global_bucket.pause(delay)
+            else:
+                await asyncio.sleep(delay)
+
+        if not result.ok:
+            logger.error(f"Не доставлено в чат {chat_id}: {result.error}")
+        return result
+
+    async def _attempt(self, payload: dict, result: DeliveryResult) -> float | None:
+        """Одна попытка. Возвращает паузу перед повтором или None — без повтора."""
+        try:
+            resp = await self._client.post("/sendMessage", json=payload)
+        except httpx.HTTPError as e:
+            result.error = str(e) or type(e).__name__
+            return min(2 ** result.attempts, 30) * random.uniform(0.5, 1.0)
+
+        result.status_code = resp.status_code
+        try:
+            data = resp.json()
+        except ValueError:
+            data = {}
+
+        if resp.status_code == 200 and data.get("ok"):
+            result.ok = True
+            result.error = None
+            result.message_id = data.get("result", {}).get("message_id")
+            return None
+
+        result.error = data.get("description") or f"HTTP {resp.status_code}"
+        if resp.status_code == 429:
+            return float(data.get("parameters", {}).get("retry_after", 1))
+        if resp.status_code in RETRY_STATUSES:
+            return min(2 ** result.attempts, 30) * random.uniform(0.5, 1.0)
+        return None
+
+    async def fan_out(self, messages: list[OutgoingMessage]) -> list[DeliveryResult]:
+        """Разослать сообщения параллельно; отчёт в порядке messages."""
+        return list(
+            await asyncio.gather(
+                *(self.send_message(m.chat_id, m.text, m.reply_markup) for m in messages)
+            )
+        )
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+_sender: TelegramSender | None = None
+
+
+def get_sender() -> TelegramSender:
+    """Общий отправитель процесса (в воркере — на его постоянном loop)."""
+    global _sender
+    if _sender is None:
+        _sender = TelegramSender()
+    return _sender
+
+
+async def close_sender() -> None:
+    global _sender
+    if _sender is not None:
+        await _sender.close()
+        _sender = None
@@ -1,26 +1,32 @@
-from sqlalchemy import select
+from sqlalchemy import or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload
 
+from app.models.order import Order
 from app.models.user import User, UserRole, RoleEnum
+from app.services.sheets_export import USER_SHEET_FIELDS, touch_orders
 
 
-async def get_user_by_telegram_id(db: AsyncSession, telegram_id: int) -> User | None:
-    result = await db.execute(
-        select(User)
-        .options(selectinload(User.roles))
-        .where(User.telegram_id == telegram_id)
-    )
-    return result.scalar_one_or_none()
+async def get_user_by_telegram_id(
+    db: AsyncSession, telegram_id: int, with_roles: bool = False
+) -> User | None:
+    query = select(User).where(User.telegram_id == telegram_id)
+    if with_roles:
+        # Одна строка пользователя — роли тем же запросом
+        query = query.options(joinedload(User.roles))
+    result = await db.execute(query)
+    return result.unique().scalar_one_or_none()
 
 
-async def get_user_by_id(db: AsyncSession, user_id: int) -> User | None:
-    result = await db.execute(
-        select(User)
-        .options(selectinload(User.roles))
-        .where(User.id == user_id)
-    )
-    return result.scalar_one_or_none()
+async def get_user_by_id(
+    db: AsyncSession, user_id: int, with_roles: bool = False
+) -> User | None:
+    query = select(User).where(User.id == user_id)
+    if with_roles:
+        # Одна строка пользователя — роли тем же запросом
+        query = query.options(joinedload(User.roles))
+    result = await db.execute(query)
+    return result.unique().scalar_one_or_none()
 
 
 async def create_user(
@@ -40,9 +46,17 @@ async def create_user(
 
 
 async def update_user(db: AsyncSession, user: User, **kwargs) -> User:
+    changed = set()
     for key, value in kwargs.items():
         if value is not None and hasattr(user, key):
+            if getattr(user, key) != value:
+                changed.add(key)
             setattr(user, key, value)
+    if changed.intersection(USER_SHEET_FIELDS):
+        # Имя и телефон клиента, имя оператора — в строках его заказов
+        await touch_orders(
+            db, or_(Order.user_id == user.id, Order.operator_id == user.id)
+        )
     await db.flush()
     return user
 
@@ -56,6 +70,20 @@ async def get_operators(db: AsyncSession) -> list[User]:
     return list(result.scalars().all())
 
 
+async def get_operator_by_telegram_id(db: AsyncSession, telegram_id: int) -> User | None:
+    """Пользователь с ролью оператора или администратора, иначе None."""
+    result = await db.execute(
+        select(User)
+        .join(UserRole)
+        .where(
+            User.telegram_id == telegram_id,
+            UserRole.role.in_([RoleEnum.operator, RoleEnum.admin]),
+        )
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
 async def has_role(db: AsyncSession, user_id: int, role: RoleEnum) -> bool:
     result = await db.execute(
         select(UserRole.id).where(
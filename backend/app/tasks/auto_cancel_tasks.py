@@ -1,48 +1,62 @@
-import asyncio
 import logging
 
 from app.tasks.celery_app import celery_app
-from app.tasks.notification_tasks import send_telegram_message
+from app.tasks.runner import run_async
 from app.config import get_settings
-from app.services.sheets_service import sync_order_to_sheet, prepare_order_data
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+AUTO_CANCEL_COMMENT = "Автоматическая отмена: нет подтверждения в течение 24 часов"
+AUTO_CANCEL_TEXT = (
+    "❌ Ваш заказ №{id} был автоматически отменён, "
+    "так как не был подтверждён оператором в течение 24 часов.\n"
+    "Пожалуйста, оформите новый заказ."
+)
+
 
 @celery_app.task(name="app.tasks.auto_cancel_tasks.auto_cancel_stale_orders")
 def auto_cancel_stale_orders():
     """Автоматическая отмена заказов старше 24 часов в статусе new."""
     from app.database import async_session
-    from app.services.order_service import get_stale_orders, update_order_status
-    from app.models.order import OrderStatus
+    from app.services.order_service import cancel_stale_orders
+    from app.services.response_cache import invalidate_dirty
+    from app.services.sheets_queue import enqueue
+    from app.tasks.notification_tasks import notify_clients
+
+    batch_size = settings.AUTO_CANCEL_BATCH_SIZE
 
     async def _run():
-        async with async_session() as db:
-            stale = await get_stale_orders(
-                db, hours=settings.ORDER_AUTO_CANCEL_HOURS
-            )
-            for order in stale:
-                await update_order_status(
+        total = 0
+        while True:
+            # Каждая пачка — отдельная короткая транзакция
+            async with async_session() as db:
+                cancelled = await cancel_stale_orders(
                     db,
-                    order,
-                    OrderStatus.cancelled,
-                    comment="Автоматическая отмена: нет подтверждения в течение 24 часов",
+                    hours=settings.ORDER_AUTO_CANCEL_HOURS,
+                    comment=AUTO_CANCEL_COMMENT,
+                    limit=batch_size,
                 )
-
-                # Уведомить клиента
-                if order.user:
-                    send_telegram_message(
-                        order.user.telegram_id,
-                        f"❌ Ваш заказ №{order.id} был автоматически отменён, "
-                        f"так как не был подтверждён оператором в течение 24 часов.\n"
-                        f"Пожалуйста, оформите новый заказ.",
-                    )
-
-                # Синхронизация с Google Sheets
-                data = prepare_order_data(order, order.user, order.address)
-                sync_order_to_sheet(data)
-
-            await db.commit()
-
-    asyncio.run(_run())
+                await db.commit()
+                await invalidate_dirty(db)
+            if not cancelled:
+                break
+            total += len(cancelled)
+
+            # Уведомления и таблица — после commit, через очереди
+            notify_clients.delay(
+                [
+                    [item["telegram_id"], AUTO_CANCEL_TEXT.format(id=item["id"])]
+                    for item in cancelled
+                    if item["telegram_id"]
+                ]
+            )
+            await enqueue(item["id"] for item in cancelled)
+            if len(cancelled) < batch_size:
+                break
+        return total
+
+    total = run_async(_run())
+    if total:
+        logger.info(f"Автоматически отменено заказов: {total}")
+    return total
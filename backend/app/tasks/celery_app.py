@@ -9,6 +9,11 @@ celery_app = Celery(
     "water_delivery",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
+    include=[
+        "app.tasks.auto_cancel_tasks",
+        "app.tasks.notification_tasks",
+        "app.tasks.sheets_tasks",
+    ],
 )
 
 celery_app.conf.update(
@@ -32,6 +37,18 @@ celery_app.conf.beat_schedule = {
         "task": "app.tasks.auto_cancel_tasks.auto_cancel_stale_orders",
         "schedule": crontab(minute="*/15"),  # каждые 15 минут
     },
+    "flush-sheet-queue": {
+        "task": "app.tasks.sheets_tasks.flush_sheet_queue",
+        "schedule": settings.SHEETS_SYNC_INTERVAL,  # накопленные изменения пачкой
+    },
+    "export-sheet-incremental": {
+        "task": "app.tasks.sheets_tasks.export_orders_to_sheet",
+        "schedule": crontab(minute=5),  # раз в час — догнать пропущенное
+    },
+    "repair-sheet-index": {
+        "task": "app.tasks.sheets_tasks.repair_sheet_index",
+        "schedule": crontab(hour=4, minute=0),  # раз в сутки, ночью
+    },
 }
 
 celery_app.autodiscover_tasks(["app.tasks"])
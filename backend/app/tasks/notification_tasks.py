@@ -1,65 +1,62 @@
-import asyncio
 import logging
 
-import httpx
-
 from app.tasks.celery_app import celery_app
+from app.tasks.runner import run_async
 from app.config import get_settings
+from app.services.telegram_service import get_sender, OutgoingMessage
+from app.services.order_events import new_order_keyboard
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-BOT_API = f"https://api.telegram.org/bot{settings.BOT_TOKEN}"
-
 
 def send_telegram_message(chat_id: int, text: str, reply_markup: dict | None = None):
-    """Отправить сообщение через Telegram Bot API."""
-    if not settings.BOT_TOKEN:
-        logger.warning("BOT_TOKEN не настроен, пропуск отправки")
-        return
+    """Отправить сообщение через Telegram Bot API (из синхронного кода задачи)."""
+    return run_async(get_sender().send_message(chat_id, text, reply_markup)).to_dict()
+
+
+def send_many(messages: list[OutgoingMessage]) -> list[dict]:
+    """Разослать сообщения параллельно; отчёт о доставке по каждому получателю."""
+    results = run_async(get_sender().fan_out(messages))
+    return _report(results)
 
-    payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
-    if reply_markup:
-        import json
-        payload["reply_markup"] = json.dumps(reply_markup)
 
-    try:
-        resp = httpx.post(f"{BOT_API}/sendMessage", json=payload, timeout=10)
-        resp.raise_for_status()
-    except Exception as e:
-        logger.error(f"Ошибка отправки в Telegram: {e}")
+def _report(results) -> list[dict]:
+    failed = [r for r in results if not r.ok]
+    if failed:
+        logger.warning(
+            f"Рассылка: доставлено {len(results) - len(failed)} из {len(results)}"
+        )
+    return [r.to_dict() for r in results]
 
 
 @celery_app.task(name="app.tasks.notification_tasks.notify_operators_new_order")
 def notify_operators_new_order(order_id: int, order_info: str, operator_ids: list[int]):
     """Уведомить операторов о новом заказе."""
-    keyboard = {
-        "inline_keyboard": [
-            [
-                {"text": "✅ Подтвердить", "callback_data": f"confirm_{order_id}"},
-                {"text": "❌ Отменить", "callback_data": f"cancel_{order_id}"},
-            ],
-            [
-                {"text": "📅 Перенести", "callback_data": f"reschedule_{order_id}"},
-            ],
-        ]
-    }
-
+    keyboard = new_order_keyboard(order_id)
     text = f"🆕 <b>Новый заказ №{order_id}</b>\n\n{order_info}"
 
-    for op_id in operator_ids:
-        send_telegram_message(op_id, text, keyboard)
+    return send_many([OutgoingMessage(op_id, text, keyboard) for op_id in operator_ids])
 
 
 @celery_app.task(name="app.tasks.notification_tasks.notify_client")
 def notify_client(chat_id: int, text: str):
     """Отправить уведомление клиенту."""
-    send_telegram_message(chat_id, text)
+    return send_telegram_message(chat_id, text)
+
+
+@celery_app.task(name="app.tasks.notification_tasks.notify_clients")
+def notify_clients(messages: list[list]):
+    """Разослать уведомления клиентам: [[chat_id, text], ...]."""
+    return send_many([OutgoingMessage(chat_id, text) for chat_id, text in messages])
 
 
 @celery_app.task(name="app.tasks.notification_tasks.send_reminder_for_stale_orders")
 def send_reminder_for_stale_orders():
     """Повторное уведомление операторам через 2 часа."""
+    if settings.ORDER_REMINDER_DIGEST:
+        return send_reminder_digest()
+
     from app.database import async_session
     from app.services.order_service import get_stale_orders
     from app.services.user_service import get_operators
@@ -68,16 +65,54 @@ def send_reminder_for_stale_orders():
         async with async_session() as db:
             stale = await get_stale_orders(db, hours=settings.ORDER_REMINDER_HOURS)
             if not stale:
-                return
+                return []
             operators = await get_operators(db)
             op_tg_ids = [op.telegram_id for op in operators]
 
-            for order in stale:
-                text = (
-                    f"⏰ <b>Напоминание!</b>\n"
-                    f"Заказ №{order.id} ожидает подтверждения уже более 2 часов."
-                )
-                for op_id in op_tg_ids:
-                    send_telegram_message(op_id, text)
+        messages = []
+        for order in stale:
+            text = (
+                f"⏰ <b>Напоминание!</b>\n"
+                f"Заказ №{order.id} ожидает подтверждения уже более 2 часов."
+            )
+            messages.extend(OutgoingMessage(op_id, text) for op_id in op_tg_ids)
+        return _report(await get_sender().fan_out(messages))
 
-    asyncio.run(_run())
+    return run_async(_run())
+
+
+def send_reminder_digest():
+    """Одна сводка зависших заказов каждому оператору."""
+    from app.database import async_session
+    from app.services.reminder_service import (
+        get_orders_to_remind,
+        build_digest,
+        mark_reminded,
+    )
+    from app.services.user_service import get_operators
+
+    async def _run():
+        async with async_session() as db:
+            orders, fresh = await get_orders_to_remind(
+                db,
+                hours=settings.ORDER_REMINDER_HOURS,
+                repeat_hours=settings.ORDER_REMINDER_REPEAT_HOURS,
+            )
+            if not orders:
+                return []
+            operators = await get_operators(db)
+            digest = build_digest(orders, fresh)
+
+            results = await get_sender().fan_out(
+                [
+                    OutgoingMessage(op.telegram_id, digest.text, digest.keyboard)
+                    for op in operators
+                ]
+            )
+            # Если не дошло ни одному оператору — повторим в следующий запуск
+            if any(r.ok for r in results):
+                await mark_reminded(db, digest.order_ids)
+                await db.commit()
+        return _report(results)
+
+    return run_async(_run())
@@ -0,0 +1,61 @@
+"""
+Постоянный event loop для асинхронного кода в задачах Celery.
+
+Раньше каждая задача вызывала asyncio.run(): создавался новый loop, а пул
+async-движка хранил asyncpg-соединения, привязанные к уже закрытому loop.
+Теперь у каждого процесса воркера (prefork/solo) один loop на всё время
+жизни, и пул соединений с БД переиспользуется между задачами.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Coroutine
+
+from celery.signals import worker_process_init, worker_process_shutdown
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _local.loop = loop
+    return loop
+
+
+def run_async(coro: Coroutine[Any, Any, Any]) -> Any:
+    """Выполнить корутину в постоянном loop текущего процесса воркера."""
+    return get_worker_loop().run_until_complete(coro)
+
+
+@worker_process_init.connect
+def _init_worker_process(**kwargs):
+    # Соединения, унаследованные от родителя через fork, не используем
+    from app.database import engine
+
+    engine.sync_engine.dispose(close=False)
+    _local.loop = asyncio.new_event_loop()
+
+
+@worker_process_shutdown.connect
+def _shutdown_worker_process(**kwargs):
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        return
+
+    from app.cache import close_redis
+    from app.database import engine
+    from app.services.telegram_service import close_sender
+
+    try:
+        loop.run_until_complete(close_sender())
+        loop.run_until_complete(close_redis())
+        loop.run_until_complete(engine.dispose())
+    except Exception as e:
+        logger.warning(f"Ошибка при остановке воркера: {e}")
+    finally:
+        loop.close()
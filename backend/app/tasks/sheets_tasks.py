@@ -0,0 +1,66 @@
+import logging
+
+from app.tasks.celery_app import celery_app
+from app.tasks.runner import run_async
+from app.services.sheets_service import prepare_order_data
+
+logger = logging.getLogger(__name__)
+
+
+def load_orders_data(order_ids: list[int]) -> list[dict]:
+    """Данные заказов для листа (одним запросом с клиентом, адресом, оператором)."""
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from app.database import async_session
+    from app.models.order import Order
+
+    async def _load():
+        async with async_session() as db:
+            result = await db.execute(
+                select(Order)
+                .options(
+                    selectinload(Order.user),
+                    selectinload(Order.address),
+                    selectinload(Order.operator),
+                )
+                .where(Order.id.in_(order_ids))
+                .order_by(Order.id)
+            )
+            return [
+                prepare_order_data(o, o.user, o.address, o.operator)
+                for o in result.scalars().all()
+            ]
+
+    return run_async(_load())
+
+
+@celery_app.task(name="app.tasks.sheets_tasks.flush_sheet_queue")
+def flush_sheet_queue():
+    """Записать накопившиеся изменения заказов в Google Sheets одной пачкой."""
+    from app.services.sheets_queue import drain
+
+    return drain(load_orders_data)
+
+
+@celery_app.task(name="app.tasks.sheets_tasks.export_orders_to_sheet")
+def export_orders_to_sheet(mode: str = "incremental"):
+    """Выгрузка заказов в Google Sheets: full — весь лист, incremental — изменения."""
+    from app.database import async_session
+    from app.services.sheets_export import export_full, export_incremental
+
+    async def _run():
+        async with async_session() as db:
+            if mode == "full":
+                return await export_full(db)
+            return await export_incremental(db)
+
+    return run_async(_run())
+
+
+@celery_app.task(name="app.tasks.sheets_tasks.repair_sheet_index")
+def repair_sheet_index():
+    """Сверить индекс «заказ → строка» с листом (строки могли переставить вручную)."""
+    from app.services.sheets_service import repair_sheet_index as repair
+
+    return repair()
@@ -0,0 +1,102 @@
+"""
+Бенчмарк: asyncio.run на каждую задачу против постоянного loop воркера.
+
+Запуск из каталога backend:
+    python -m benchmarks.celery_runner --runs 200
+    python -m benchmarks.celery_runner --url postgresql+asyncpg://...
+
+Для каждого режима печатает среднюю/p95 задержку «задачи» (один запрос
+к orders, как в get_stale_orders) и число новых соединений с БД.
+Режим «before» повторяет прежнее поведение корректно: движок с пулом
+нельзя переиспользовать между разными loop, поэтому он создаётся заново.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.config import get_settings
+from app.database import Base
+from app.models.order import Order, OrderStatus
+from app.tasks.runner import run_async
+
+
+async def _task_body(session_maker) -> None:
+    threshold = datetime.now() - timedelta(hours=24)
+    async with session_maker() as db:
+        await db.execute(
+            select(Order.id).where(
+                Order.status == OrderStatus.new, Order.created_at <= threshold
+            )
+        )
+
+
+def _make_engine(url: str, connects: list):
+    engine = create_async_engine(url, pool_size=5)
+    event.listen(engine.sync_engine, "connect", lambda *a: connects.append(1))
+    return engine
+
+
+def bench_before(url: str, runs: int) -> tuple[list[float], int]:
+    connects: list = []
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+
+        async def _run():
+            engine = _make_engine(url, connects)
+            try:
+                await _task_body(async_sessionmaker(engine, class_=AsyncSession))
+            finally:
+                await engine.dispose()
+
+        asyncio.run(_run())
+        timings.append(time.perf_counter() - started)
+    return timings, len(connects)
+
+
+def bench_after(url: str, runs: int) -> tuple[list[float], int]:
+    connects: list = []
+    engine = _make_engine(url, connects)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession)
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run_async(_task_body(session_maker))
+        timings.append(time.perf_counter() - started)
+    run_async(engine.dispose())
+    return timings, len(connects)
+
+
+def _report(name: str, timings: list[float], connects: int) -> None:
+    p95 = statistics.quantiles(timings, n=20)[-1]
+    print(
+        f"{name:>7}: avg={statistics.mean(timings) * 1000:.2f}ms "
+        f"p95={p95 * 1000:.2f}ms connections={connects}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=get_settings().database_url)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    async def _prepare():
+        engine = create_async_engine(args.url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+    asyncio.run(_prepare())
+    _report("before", *bench_before(args.url, args.runs))
+    _report("after", *bench_after(args.url, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Бенчмарк: задержка от commit нового заказа до сообщения оператору.
+
+Запуск из каталога backend (нужен PostgreSQL, таблицы будут пересозданы):
+    python -m benchmarks.order_notify_latency --url postgresql+asyncpg://... --orders 200
+
+Слушатель (LISTEN new_order) и рассылка работают как в процессе
+app.order_listener; Bot API заменён локальной заглушкой, которая
+запоминает момент получения sendMessage. Заказы создаются через
+create_order с паузой --interval между ними. Печатает среднюю, p95 и
+максимальную задержку и число сообщений на заказ (повторов быть не должно).
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.config import get_settings
+from app.database import Base
+from app.models.address import Address
+from app.models.district import DistrictLimit
+from app.models.user import RoleEnum, User, UserRole
+from app.services.order_events import NewOrderDispatcher, NewOrderListener
+from app.services.order_service import create_order
+from app.services.telegram_service import TelegramSender
+
+
+def _fake_bot_api(received: dict[int, list[float]]) -> FastAPI:
+    api = FastAPI()
+
+    @api.post("/bot{token}/sendMessage")
+    async def send_message(token: str, request: Request):
+        payload = await request.json()
+        order_id = int(payload["text"].split("№")[1].split("<")[0])
+        received.setdefault(order_id, []).append(time.perf_counter())
+        return {"ok": True, "result": {"message_id": 1, "chat": {"id": payload["chat_id"]}}}
+
+    return api
+
+
+async def _prepare(maker, operators: int) -> dict[int, int]:
+    """Операторы, клиенты и адреса; возвращает {id адреса: id клиента}."""
+    async with maker() as db:
+        db.add(DistrictLimit(district="Прочие", max_per_day=100000, is_active=True))
+        ops = [User(telegram_id=500000 + i, name=f"Оператор {i}") for i in range(operators)]
+        clients = [User(telegram_id=600000 + i, name=f"Клиент {i}") for i in range(50)]
+        db.add_all(ops + clients)
+        await db.flush()
+        db.add_all(UserRole(user_id=op.id, role=RoleEnum.operator) for op in ops)
+        addresses = [
+            Address(user_id=c.id, city="Шахтёрск", district="Прочие", street="Мира", house=str(i))
+            for i, c in enumerate(clients)
+        ]
+        db.add_all(addresses)
+        await db.commit()
+        return {a.id: a.user_id for a in addresses}
+
+
+async def run(url: str, orders: int, operators: int, interval: float) -> None:
+    engine = create_async_engine(url, pool_size=10)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    owners = await _prepare(maker, operators)
+    address_ids = list(owners)
+
+    received: dict[int, list[float]] = {}
+    sender = TelegramSender(
+        token="bench",
+        base_url="http://telegram.bench",
+        concurrency=20,
+        global_rate=10000,
+        per_chat_rate=10000,
+        transport=httpx.ASGITransport(app=_fake_bot_api(received)),
+    )
+    dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    listener = NewOrderListener(dsn, NewOrderDispatcher(maker, sender))
+    task = asyncio.create_task(listener.run())
+    await asyncio.wait_for(listener.ready.wait(), 10)
+
+    committed: dict[int, float] = {}
+    for i in range(orders):
+        address_id = address_ids[i % len(address_ids)]
+        async with maker() as db:
+            # Разные количества, чтобы не сработала защита от дублей
+            order = await create_order(db, owners[address_id], address_id, i + 1, 0)
+            await db.commit()
+        committed[order.id] = time.perf_counter()
+        await asyncio.sleep(interval)
+
+    deadline = time.perf_counter() + 10
+    while len(received) < orders and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await sender.close()
+    await engine.dispose()
+
+    latencies = [
+        max(times) - committed[order_id]
+        for order_id, times in received.items()
+        if order_id in committed
+    ]
+    if not latencies:
+        print("Ни одного уведомления не получено")
+        return
+    per_order = {len(times) for times in received.values()}
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    print(
+        f"orders={orders} delivered={len(latencies)} operators={operators} "
+        f"messages_per_order={sorted(per_order)}"
+    )
+    print(
+        f"commit -> последний оператор: avg={statistics.mean(latencies) * 1000:.1f}ms "
+        f"p95={p95 * 1000:.1f}ms max={max(latencies) * 1000:.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=get_settings().database_url)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--operators", type=int, default=3)
+    parser.add_argument("--interval", type=float, default=0.01)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.orders, args.operators, args.interval))
+
+
+if __name__ == "__main__":
+    main()
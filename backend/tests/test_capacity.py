@@ -0,0 +1,175 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from app.models.address import Address
+from app.models.capacity import DailyCapacity
+from app.models.order import Order, OrderLog, OrderStatus
+from app.models.user import User
+from app.services.address_service import delete_address, update_address
+from app.services.capacity_service import ALL_DISTRICTS, reconcile_capacity, try_reserve
+from app.services.order_service import (
+    cancel_stale_orders,
+    create_order,
+    update_order,
+    update_order_status,
+)
+
+
+async def _ledger(db) -> dict[tuple[date, str], int]:
+    result = await db.execute(
+        select(DailyCapacity.date, DailyCapacity.district, DailyCapacity.used)
+    )
+    return {(row[0], row[1]): row[2] for row in result.all() if row[2]}
+
+
+@pytest_asyncio.fixture
+async def address(db_session):
+    user = User(telegram_id=200300, name="Клиент Журнала")
+    db_session.add(user)
+    await db_session.flush()
+    addr = Address(
+        user_id=user.id, city="Зугрэс", district="Зугрэс", street="ул. Садовая", house="5"
+    )
+    db_session.add(addr)
+    await db_session.flush()
+    return addr
+
+
+@pytest.mark.asyncio
+async def test_create_and_cancel_update_ledger(db_session, address):
+    """Тест: создание занимает лимит, отмена освобождает."""
+    order = await create_order(db_session, address.user_id, address.id, 3, 2)
+    day = order.delivery_date
+    assert await _ledger(db_session) == {(day, "Зугрэс"): 5, (day, ALL_DISTRICTS): 5}
+
+    await update_order_status(db_session, order.id, OrderStatus.cancelled)
+    assert await _ledger(db_session) == {}
+
+
+@pytest.mark.asyncio
+async def test_reschedule_and_edit_move_usage(db_session, address):
+    """Тест: перенос и редактирование переносят занятость."""
+    order = await create_order(db_session, address.user_id, address.id, 4, 0)
+    new_day = date(2030, 3, 4)
+    await update_order_status(
+        db_session, order.id, OrderStatus.rescheduled, delivery_date=new_day
+    )
+    assert await _ledger(db_session) == {
+        (new_day, "Зугрэс"): 4,
+        (new_day, ALL_DISTRICTS): 4,
+    }
+
+    order.status = OrderStatus.new
+    await update_order(db_session, order, jv_qty=7)
+    day = order.delivery_date
+    assert await _ledger(db_session) == {(day, "Зугрэс"): 7, (day, ALL_DISTRICTS): 7}
+
+
+@pytest.mark.asyncio
+async def test_address_district_change_and_delete(db_session, address):
+    """Тест: смена района адреса и удаление адреса."""
+    order = await create_order(db_session, address.user_id, address.id, 2, 1)
+    day = order.delivery_date
+
+    await update_address(db_session, address, district="Торез")
+    assert await _ledger(db_session) == {(day, "Торез"): 3, (day, ALL_DISTRICTS): 3}
+
+    await delete_address(db_session, address)
+    assert await _ledger(db_session) == {(day, ALL_DISTRICTS): 3}
+
+
+@pytest.mark.asyncio
+async def test_reconcile_reports_and_fixes_drift(db_session, address):
+    """Тест: сверка находит и исправляет расхождения."""
+    day = date(2030, 3, 4)
+    db_session.add(
+        Order(
+            user_id=address.user_id,
+            address_id=address.id,
+            jv_qty=6,
+            lv_qty=0,
+            total_qty=6,
+            delivery_date=day,
+            status=OrderStatus.confirmed,
+        )
+    )
+    db_session.add(DailyCapacity(date=day, district="Торез", used=10))
+    await db_session.flush()
+
+    drift = await reconcile_capacity(db_session)
+    assert {(d["district"], d["ledger"], d["actual"]) for d in drift} == {
+        ("Зугрэс", 0, 6),
+        (ALL_DISTRICTS, 0, 6),
+        ("Торез", 10, 0),
+    }
+    assert await _ledger(db_session) == {(day, "Зугрэс"): 6, (day, ALL_DISTRICTS): 6}
+    assert await reconcile_capacity(db_session) == []
+
+
+@pytest.mark.asyncio
+async def test_try_reserve_respects_both_limits(db_session):
+    """Тест: резерв не превышает лимиты и не оставляет следов при отказе."""
+    day = date(2030, 3, 4)
+    assert await try_reserve(db_session, day, "Зугрэс", 40, 50, 331)
+    assert not await try_reserve(db_session, day, "Зугрэс", 11, 50, 331)
+    assert await try_reserve(db_session, day, "Зугрэс", 10, 50, 331)
+    assert not await try_reserve(db_session, day, "Торез", 5, 50, 54)
+    assert await _ledger(db_session) == {
+        (day, "Зугрэс"): 50,
+        (day, ALL_DISTRICTS): 50,
+    }
+
+
+@pytest.mark.asyncio
+async def test_bulk_cancel_stale_orders(db_session, address):
+    """Тест: пакетная автоотмена меняет статусы, пишет журнал и освобождает лимиты."""
+    day = date(2030, 3, 5)
+    orders = [
+        Order(
+            user_id=address.user_id,
+            address_id=address_id,
+            jv_qty=qty,
+            lv_qty=0,
+            total_qty=qty,
+            delivery_date=day,
+            status=status,
+            created_at=datetime.now() - timedelta(hours=30),
+        )
+        for address_id, qty, status in [
+            (address.id, 2, OrderStatus.new),
+            (address.id, 2, OrderStatus.new),
+            (address.id, 2, OrderStatus.confirmed),
+            (None, 1, OrderStatus.new),
+        ]
+    ]
+    db_session.add_all(orders)
+    await db_session.flush()
+    await reconcile_capacity(db_session)
+
+    ids = [order.id for order in orders]
+    cancelled = await cancel_stale_orders(db_session, hours=24, comment="авто", limit=2)
+    assert len(cancelled) == 2
+    assert {item["telegram_id"] for item in cancelled} == {200300}
+    cancelled += await cancel_stale_orders(db_session, hours=24, comment="авто")
+    assert {item["id"] for item in cancelled} == {ids[0], ids[1], ids[3]}
+    assert await cancel_stale_orders(db_session, hours=24, comment="авто") == []
+
+    db_session.expire_all()
+    statuses = dict(
+        (await db_session.execute(select(Order.id, Order.status))).all()
+    )
+    assert statuses[ids[2]] == OrderStatus.confirmed
+    assert all(statuses[item["id"]] == OrderStatus.cancelled for item in cancelled)
+    logs = (
+        await db_session.execute(
+            select(OrderLog.order_id).where(OrderLog.comment == "авто")
+        )
+    ).scalars().all()
+    assert sorted(logs) == sorted(item["id"] for item in cancelled)
+
+    # Журнал занятости совпадает с заказами: остался только подтверждённый
+    assert await reconcile_capacity(db_session) == []
+    assert await _ledger(db_session) == {(day, "Зугрэс"): 2, (day, ALL_DISTRICTS): 2}
@@ -0,0 +1,132 @@
+"""Нагрузочный тест: параллельные заказы не превышают лимиты (PostgreSQL)."""
+
+import asyncio
+import random
+
+import pytest
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.address import Address
+from app.models.district import DistrictLimit
+from app.models.order import Order, OrderStatus
+from app.models.user import User
+from app.services.capacity_service import reconcile_capacity
+from app.services.delivery_date_service import TOTAL_DAILY_LIMIT
+from app.services.order_service import create_order, update_order
+
+CONCURRENT_ORDERS = 400
+DISTRICTS = ["Шахтёрск + посёлки", "Зугрэс", "Торез", "Прочие"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_creates_never_overbook(pg_engine):
+    session_maker = async_sessionmaker(pg_engine, class_=AsyncSession, expire_on_commit=False)
+    rnd = random.Random(42)
+
+    async with session_maker() as db:
+        customers = []
+        for i in range(CONCURRENT_ORDERS):
+            user = User(telegram_id=900000 + i, name=f"Клиент {i}")
+            db.add(user)
+            await db.flush()
+            address = Address(
+                user_id=user.id,
+                city="Город",
+                district=DISTRICTS[i % len(DISTRICTS)],
+                street="ул. Тестовая",
+                house=str(i),
+            )
+            db.add(address)
+            await db.flush()
+            customers.append((user.id, address.id, rnd.randint(1, 10)))
+        await db.commit()
+
+    async def place(user_id: int, address_id: int, qty: int):
+        async with session_maker() as db:
+            order = await create_order(db, user_id, address_id, qty, 0)
+            await db.commit()
+            return order.delivery_date
+
+    results = await asyncio.gather(*(place(*c) for c in customers))
+    assert len(results) == CONCURRENT_ORDERS
+
+    async with session_maker() as db:
+        limits = dict(
+            (await db.execute(select(DistrictLimit.district, DistrictLimit.max_per_day))).all()
+        )
+        active = Order.status != OrderStatus.cancelled
+
+        per_district = await db.execute(
+            select(Order.delivery_date, Address.district, func.sum(Order.total_qty))
+            .join(Address, Order.address_id == Address.id)
+            .where(active)
+            .group_by(Order.delivery_date, Address.district)
+        )
+        for _, district, used in per_district.all():
+            assert used <= limits[district]
+
+        per_day = await db.execute(
+            select(Order.delivery_date, func.sum(Order.total_qty))
+            .where(active)
+            .group_by(Order.delivery_date)
+        )
+        totals = dict(per_day.all())
+        assert all(used <= TOTAL_DAILY_LIMIT for used in totals.values())
+        assert sum(totals.values()) == sum(c[2] for c in customers)
+
+        # Журнал совпадает с заказами
+        assert await reconcile_capacity(db) == []
+
+
+@pytest.mark.asyncio
+async def test_concurrent_edits_and_creates_do_not_deadlock(pg_engine):
+    """Редактирование заказов и новые заказы одновременно: без взаимных блокировок."""
+    session_maker = async_sessionmaker(pg_engine, class_=AsyncSession, expire_on_commit=False)
+    rnd = random.Random(7)
+
+    async with session_maker() as db:
+        customers = []
+        for i in range(200):
+            user = User(telegram_id=950000 + i, name=f"Клиент {i}")
+            db.add(user)
+            await db.flush()
+            address = Address(
+                user_id=user.id,
+                city="Город",
+                district="Торез",
+                street="ул. Тестовая",
+                house=str(i),
+            )
+            db.add(address)
+            await db.flush()
+            customers.append((user.id, address.id))
+        await db.commit()
+
+    # Первая половина клиентов заполняет ближайшие дни района
+    existing = []
+    for user_id, address_id in customers[:100]:
+        async with session_maker() as db:
+            order = await create_order(db, user_id, address_id, rnd.randint(1, 10), 0)
+            await db.commit()
+            existing.append(order.id)
+
+    async def edit(order_id: int):
+        async with session_maker() as db:
+            order = await db.get(Order, order_id)
+            await update_order(db, order, jv_qty=rnd.randint(1, 10))
+            await db.commit()
+
+    async def place(user_id: int, address_id: int):
+        async with session_maker() as db:
+            await create_order(db, user_id, address_id, rnd.randint(1, 10), 0)
+            await db.commit()
+
+    # Взаимная блокировка завершила бы одну из транзакций ошибкой PostgreSQL
+    await asyncio.gather(
+        *(edit(order_id) for order_id in existing),
+        *(place(*c) for c in customers[100:]),
+    )
+
+    async with session_maker() as db:
+        assert await reconcile_capacity(db) == []
@@ -3,6 +3,10 @@ from datetime import date, timedelta
 import pytest
 import pytest_asyncio
 
+from app.models.address import Address
+from app.models.order import Order, OrderStatus
+from app.models.user import User
+from app.services.capacity_service import move_usage, order_usage
 from app.services.delivery_date_service import (
     calculate_nearest_delivery_date,
     is_weekend,
@@ -68,3 +72,99 @@ async def test_unknown_district_uses_default(db_session):
     )
     assert result["delivery_date"] == start
     assert result["district_remaining"] == 86  # 91 - 5
+
+
+async def _add_order(db, address, qty, delivery_date, status=OrderStatus.new):
+    order = Order(
+        user_id=address.user_id,
+        address_id=address.id,
+        jv_qty=qty,
+        lv_qty=0,
+        total_qty=qty,
+        delivery_date=delivery_date,
+        status=status,
+    )
+    db.add(order)
+    await db.flush()
+    await move_usage(db, None, order_usage(order, address.district))
+    return order
+
+
+@pytest_asyncio.fixture
+async def addresses(db_session):
+    user = User(telegram_id=100500, name="Тестовый Клиент")
+    db_session.add(user)
+    await db_session.flush()
+    zugres = Address(
+        user_id=user.id, city="Зугрэс", district="Зугрэс", street="ул. Мира", house="1"
+    )
+    shakhtersk = Address(
+        user_id=user.id,
+        city="Шахтёрск",
+        district="Шахтёрск + посёлки",
+        street="ул. Ленина",
+        house="2",
+    )
+    db_session.add_all([zugres, shakhtersk])
+    await db_session.flush()
+    return zugres, shakhtersk
+
+
+@pytest.mark.asyncio
+async def test_full_district_moves_to_next_day(db_session, addresses):
+    """Тест: лимит района исчерпан — берётся следующий рабочий день."""
+    zugres, _ = addresses
+    monday = date(2025, 1, 6)
+    await _add_order(db_session, zugres, 48, monday)
+
+    result = await calculate_nearest_delivery_date(
+        db_session, "Зугрэс", 5, start_date=monday
+    )
+    assert result["delivery_date"] == monday + timedelta(days=1)
+    assert result["district_remaining"] == 45
+
+
+@pytest.mark.asyncio
+async def test_total_limit_counts_all_districts(db_session, addresses):
+    """Тест: общий лимит учитывает заказы других районов."""
+    zugres, shakhtersk = addresses
+    monday = date(2025, 1, 6)
+    await _add_order(db_session, shakhtersk, 140, monday)
+    await _add_order(db_session, zugres, 50, monday)
+    other = Address(
+        user_id=zugres.user_id, city="Торез", district="Торез", street="ул. Шахтная", house="3"
+    )
+    db_session.add(other)
+    await db_session.flush()
+    await _add_order(db_session, other, 50, monday)
+
+    # 240 из 331 занято: «Прочие» помещаются ровно в остаток
+    result = await calculate_nearest_delivery_date(
+        db_session, "Прочие", 91, start_date=monday
+    )
+    assert result["delivery_date"] == monday
+    assert result["total_remaining"] == 0
+
+    # Заказ без адреса учитывается только в общем лимите
+    orphan = await _add_order(db_session, other, 1, monday)
+    orphan.address_id = None
+    await db_session.flush()
+    result = await calculate_nearest_delivery_date(
+        db_session, "Прочие", 91, start_date=monday
+    )
+    assert result["delivery_date"] == monday + timedelta(days=1)
+    assert result["total_remaining"] == 331 - 91
+
+
+@pytest.mark.asyncio
+async def test_cancelled_orders_do_not_use_capacity(db_session, addresses):
+    """Тест: отменённые заказы не занимают лимит."""
+    zugres, _ = addresses
+    monday = date(2025, 1, 6)
+    await _add_order(db_session, zugres, 50, monday, status=OrderStatus.cancelled)
+
+    result = await calculate_nearest_delivery_date(
+        db_session, "Зугрэс", 50, start_date=monday
+    )
+    assert result["delivery_date"] == monday
+    assert result["district_remaining"] == 0
@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.address import Address
+from app.models.order import Order, OrderStatus
+from app.models.user import RoleEnum, User, UserRole
+from app.services import order_events
+from app.services.order_events import NewOrderDispatcher, NewOrderListener
+from app.services.order_service import create_order, update_order_status
+from app.services.telegram_service import DeliveryResult
+
+
+class FakeSender:
+    """Запоминает отправленные сообщения и время отправки."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.sent: list[tuple[int, str, float]] = []
+
+    async def fan_out(self, messages):
+        results = []
+        for m in messages:
+            self.sent.append((m.chat_id, m.text, time.monotonic()))
+            results.append(DeliveryResult(chat_id=m.chat_id, ok=not self.fail, attempts=1))
+        return results
+
+    def order_ids(self, chat_id):
+        return [
+            int(text.split("№")[1].split("<")[0])
+            for chat, text, _ in self.sent
+            if chat == chat_id
+        ]
+
+
+@pytest.fixture(autouse=True)
+def clean_notified():
+    order_events.reset_memory_notified()
+    yield
+    order_events.reset_memory_notified()
+
+
+async def _seed(db):
+    operator = User(telegram_id=910001, name="Оператор")
+    client = User(telegram_id=910002, name="Клиент Пуш", phone="+79491112233")
+    db.add_all([operator, client])
+    await db.flush()
+    db.add(UserRole(user_id=operator.id, role=RoleEnum.operator))
+    address = Address(
+        user_id=client.id, city="Шахтёрск", district="Зугрэс", street="Мира", house="1"
+    )
+    db.add(address)
+    await db.commit()
+    return operator, client, address
+
+
+@pytest_asyncio.fixture
+async def seeded(db_session):
+    return await _seed(db_session)
+
+
+def _maker(db_session):
+    return async_sessionmaker(db_session.bind, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.mark.asyncio
+async def test_dispatch_is_ordered_and_deduplicated(db_session, seeded):
+    """Тест: заказы уходят по порядку номеров, повторы не рассылаются."""
+    operator, client, address = seeded
+    orders = [
+        Order(user_id=client.id, address_id=address.id, jv_qty=i, lv_qty=0, total_qty=i)
+        for i in (1, 2, 3)
+    ]
+    db_session.add_all(orders)
+    await db_session.commit()
+    ids = [o.id for o in orders]
+
+    sender = FakeSender()
+    dispatcher = NewOrderDispatcher(_maker(db_session), sender)
+    # События пришли не по порядку и с повтором
+    assert await dispatcher.dispatch([ids[2], ids[0], ids[2], ids[1]]) == ids
+    assert await dispatcher.dispatch(ids) == []
+    assert await dispatcher.catch_up() == []
+    assert sender.order_ids(operator.telegram_id) == ids
+    assert "📍 Зугрэс, Мира, 1" in sender.sent[0][1]
+
+
+@pytest.mark.asyncio
+async def test_catch_up_sends_missed_and_skips_processed(db_session, seeded):
+    """Тест: сверка досылает пропущенные новые заказы; обработанные не шлёт."""
+    operator, client, address = seeded
+    missed = Order(user_id=client.id, address_id=address.id, jv_qty=1, lv_qty=0, total_qty=1)
+    confirmed = Order(
+        user_id=client.id, address_id=address.id, jv_qty=2, lv_qty=0,
+        total_qty=2, status=OrderStatus.confirmed,
+    )
+    db_session.add_all([missed, confirmed])
+    await db_session.commit()
+
+    sender = FakeSender()
+    dispatcher = NewOrderDispatcher(_maker(db_session), sender)
+    assert await dispatcher.catch_up() == [missed.id]
+    assert sender.order_ids(operator.telegram_id) == [missed.id]
+
+
+@pytest.mark.asyncio
+async def test_undelivered_order_is_retried(db_session, seeded):
+    """Тест: если уведомление не дошло ни одному оператору, сверка повторит его."""
+    operator, client, address = seeded
+    order = Order(user_id=client.id, address_id=address.id, jv_qty=1, lv_qty=0, total_qty=1)
+    db_session.add(order)
+    await db_session.commit()
+
+    dispatcher = NewOrderDispatcher(_maker(db_session), FakeSender(fail=True))
+    assert await dispatcher.dispatch([order.id]) == []
+
+    dispatcher.sender = FakeSender()
+    assert await dispatcher.catch_up() == [order.id]
+
+
+@pytest.mark.asyncio
+async def test_notify_reaches_operator_within_second(pg_engine):
+    """Тест (PostgreSQL): от commit заказа до отправки оператору — меньше секунды."""
+    maker = async_sessionmaker(pg_engine, class_=AsyncSession, expire_on_commit=False)
+    async with maker() as db:
+        operator, client, address = await _seed(db)
+
+    sender = FakeSender()
+    dsn = pg_engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    listener = NewOrderListener(dsn, NewOrderDispatcher(maker, sender))
+    task = asyncio.create_task(listener.run())
+    try:
+        await asyncio.wait_for(listener.ready.wait(), 5)
+
+        # Откаченный заказ не уведомляется
+        async with maker() as db:
+            await create_order(db, client.id, address.id, 3, 0)
+            await db.rollback()
+
+        async with maker() as db:
+            order = await create_order(db, client.id, address.id, 1, 1)
+            await db.commit()
+        committed = time.monotonic()
+
+        deadline = committed + 2
+        while not sender.sent and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        assert sender.order_ids(operator.telegram_id) == [order.id]
+        assert sender.sent[0][2] - committed < 1.0
+
+        # Заказ, обработанный до сверки, повторно не рассылается
+        async with maker() as db:
+            await update_order_status(db, order.id, OrderStatus.confirmed, operator.id)
+            await db.commit()
+        assert await listener.dispatcher.catch_up() == []
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
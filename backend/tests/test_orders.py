@@ -1,6 +1,24 @@
+from datetime import datetime, timedelta
+
 import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+
+from app.database import get_db
+from app.main import app
 
+from app.models.address import Address
+from app.models.order import Order, OrderLog, OrderStatus
+from app.models.user import RoleEnum, User, UserRole
 from app.schemas.order import OrderCreate
+from app.services.capacity_service import reconcile_capacity
+from app.services.order_service import (
+    bulk_update_status,
+    create_order,
+    get_operator_feed,
+    get_order_context,
+    get_user_orders,
+)
 
 
 def test_order_create_validation():
@@ -26,3 +44,247 @@ def test_order_create_lv_only():
     """Тест: только ЛВ."""
     order = OrderCreate(address_id=1, jv_qty=0, lv_qty=3)
     assert order.lv_qty == 3
+
+
+@pytest.mark.asyncio
+async def test_user_orders_keyset_pagination(db_session):
+    """Тест: курсорная пагинация проходит всю историю без пропусков и повторов."""
+    user = User(telegram_id=300400, name="Клиент Истории")
+    db_session.add(user)
+    await db_session.flush()
+    created = datetime(2025, 1, 1, 12, 0)
+    db_session.add_all(
+        Order(
+            user_id=user.id,
+            jv_qty=1,
+            lv_qty=0,
+            total_qty=1,
+            status=OrderStatus.completed,
+            # Пары заказов с одинаковым временем — порядок решает id
+            created_at=created + timedelta(minutes=i // 2),
+        )
+        for i in range(7)
+    )
+    await db_session.flush()
+
+    seen = []
+    orders, total, cursor = await get_user_orders(db_session, user.id, limit=3)
+    assert total == 7
+    seen.extend(o.id for o in orders)
+    while cursor is not None:
+        orders, total, cursor = await get_user_orders(
+            db_session, user.id, limit=3, cursor=cursor, with_total=False
+        )
+        assert total is None
+        seen.extend(o.id for o in orders)
+
+    expected = (
+        await db_session.execute(
+            select(Order.id)
+            .where(Order.user_id == user.id)
+            .order_by(Order.created_at.desc(), Order.id.desc())
+        )
+    ).scalars().all()
+    assert seen == list(expected)
+
+
+@pytest.mark.asyncio
+async def test_operator_feed_pages_new_orders(db_session):
+    """Тест: лента оператора — только новые, от старых к новым, плоскими строками."""
+    user = User(telegram_id=300500, name="Клиент Ленты", phone="+79490000001")
+    db_session.add(user)
+    await db_session.flush()
+    address = Address(
+        user_id=user.id, city="Шахтёрск", district="Шахтёрск + посёлки",
+        street="Ленина", house="3",
+    )
+    db_session.add(address)
+    await db_session.flush()
+    created = datetime(2025, 1, 1, 9, 0)
+    orders = [
+        Order(
+            user_id=user.id,
+            address_id=address.id if i else None,
+            jv_qty=1,
+            lv_qty=0,
+            total_qty=1,
+            status=OrderStatus.confirmed if i == 3 else OrderStatus.new,
+            created_at=created + timedelta(minutes=i),
+        )
+        for i in range(6)
+    ]
+    db_session.add_all(orders)
+    await db_session.flush()
+    new_ids = [o.id for i, o in enumerate(orders) if i != 3]
+
+    items, remaining, cursor = await get_operator_feed(db_session, limit=2)
+    assert remaining == 5
+    assert items[0]["address"] is None and items[0]["district"] is None
+    assert items[1]["address"] == "Шахтёрск, Шахтёрск + посёлки, Ленина, 3"
+    assert items[1]["client_name"] == "Клиент Ленты"
+    assert items[1]["client_telegram_id"] == 300500
+
+    seen = [item["id"] for item in items]
+    while cursor is not None:
+        items, remaining, cursor = await get_operator_feed(
+            db_session, limit=2, cursor=cursor
+        )
+        seen.extend(item["id"] for item in items)
+    assert seen == new_ids
+    assert remaining == 1
+
+    items, remaining, _ = await get_operator_feed(
+        db_session, district="Шахтёрск + посёлки"
+    )
+    assert remaining == 4 and len(items) == 4
+
+
+@pytest.mark.asyncio
+async def test_order_context(db_session):
+    """Тест: контекст заказа — клиент, последние заказы и итоги одним запросом."""
+    user = User(telegram_id=300600, name="Клиент Контекста", phone="+79490000002")
+    other = User(telegram_id=300601, name="Другой Клиент")
+    db_session.add_all([user, other])
+    await db_session.flush()
+    created = datetime(2025, 1, 1, 9, 0)
+    statuses = [
+        OrderStatus.completed,
+        OrderStatus.cancelled,
+        OrderStatus.completed,
+        OrderStatus.completed,
+        OrderStatus.new,
+    ]
+    orders = [
+        Order(
+            user_id=user.id,
+            jv_qty=i + 1,
+            lv_qty=0,
+            total_qty=i + 1,
+            status=status,
+            created_at=created + timedelta(days=i),
+        )
+        for i, status in enumerate(statuses)
+    ]
+    orders.append(
+        Order(user_id=other.id, jv_qty=9, lv_qty=0, total_qty=9, status=OrderStatus.completed)
+    )
+    db_session.add_all(orders)
+    await db_session.flush()
+
+    context = await get_order_context(db_session, orders[4].id, history_limit=3)
+    assert context["order"].id == orders[4].id
+    assert context["client"].telegram_id == 300600
+    assert context["address"] is None
+    assert [o["id"] for o in context["recent_orders"]] == [
+        orders[4].id, orders[3].id, orders[2].id
+    ]
+    assert context["recent_orders"][1]["status"] == "completed"
+    assert context["stats"] == {
+        "total_orders": 5,
+        "completed_orders": 3,
+        "cancelled_orders": 1,
+        "total_bottles": 1 + 3 + 4,
+        "first_order_at": created,
+        "last_completed_at": created + timedelta(days=3),
+    }
+    assert await get_order_context(db_session, 999999) is None
+
+
+async def _bulk_orders(db_session, telegram_id: int, count: int) -> list[Order]:
+    user = User(telegram_id=telegram_id, name="Клиент Массовых")
+    db_session.add(user)
+    await db_session.flush()
+    address = Address(
+        user_id=user.id, city="Торез", district="Торез", street="Ленина", house="7"
+    )
+    db_session.add(address)
+    await db_session.flush()
+    # Разное количество — чтобы не сработала защита от дублей
+    return [
+        await create_order(db_session, user.id, address.id, i + 1, 0) for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_reports_each_order(db_session):
+    """Тест: массовое действие применяет допустимые переходы и объясняет остальные."""
+    orders = await _bulk_orders(db_session, 300700, 3)
+    orders[2].status = OrderStatus.completed
+    await db_session.flush()
+    ids = [o.id for o in orders]
+
+    results = await bulk_update_status(db_session, "confirm", ids + [999999])
+    assert [r["ok"] for r in results] == [True, True, False, False]
+    assert results[2]["status"] == "completed"
+    assert results[3]["error"] == "Заказ не найден"
+
+    statuses = (
+        await db_session.execute(select(Order.status).where(Order.id.in_(ids)).order_by(Order.id))
+    ).scalars().all()
+    assert statuses == [OrderStatus.confirmed, OrderStatus.confirmed, OrderStatus.completed]
+    logs = (
+        await db_session.execute(
+            select(OrderLog.order_id).where(OrderLog.new_status == "confirmed")
+        )
+    ).scalars().all()
+    assert sorted(logs) == ids[:2]
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_by_delivery_date(db_session):
+    """Тест: фильтр по дате берёт только заказы в допустимых статусах; dry_run ничего не меняет."""
+    orders = await _bulk_orders(db_session, 300701, 3)
+    delivery_date = orders[0].delivery_date
+    for order in orders:
+        order.delivery_date = delivery_date
+    orders[1].status = OrderStatus.confirmed
+    orders[2].status = OrderStatus.confirmed
+    await db_session.flush()
+
+    preview = await bulk_update_status(
+        db_session, "deliver", delivery_date=delivery_date, district="Торез", dry_run=True
+    )
+    assert [r["id"] for r in preview] == [orders[1].id, orders[2].id]
+    assert (await db_session.get(Order, orders[1].id)).status == OrderStatus.confirmed
+
+    results = await bulk_update_status(db_session, "deliver", delivery_date=delivery_date)
+    assert all(r["ok"] for r in results) and len(results) == 2
+    assert await bulk_update_status(db_session, "deliver", delivery_date=delivery_date) == []
+
+
+@pytest.mark.asyncio
+async def test_bulk_cancel_releases_capacity(db_session):
+    """Тест: массовая отмена освобождает лимит в журнале занятости."""
+    orders = await _bulk_orders(db_session, 300702, 3)
+    results = await bulk_update_status(db_session, "cancel", [o.id for o in orders[:2]])
+    assert all(r["ok"] for r in results)
+    assert await reconcile_capacity(db_session) == []
+
+
+@pytest.mark.asyncio
+async def test_bulk_endpoint_requires_operator(db_session):
+    """Тест: массовые действия доступны только оператору или администратору."""
+    orders = await _bulk_orders(db_session, 300703, 1)
+    client_user = await db_session.get(User, orders[0].user_id)
+    operator = User(telegram_id=300704, name="Оператор Массовых")
+    db_session.add(operator)
+    await db_session.flush()
+    db_session.add(UserRole(user_id=operator.id, role=RoleEnum.operator))
+    await db_session.flush()
+
+    async def override_get_db():
+        yield db_session
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+            url = "/api/v1/operator/orders/bulk/confirm"
+            body = {"order_ids": [orders[0].id]}
+            for telegram_id in (client_user.telegram_id, 999999):
+                response = await c.post(url, json={**body, "operator_telegram_id": telegram_id})
+                assert response.status_code == 403
+            response = await c.post(url, json={**body, "operator_telegram_id": 300704})
+            assert response.status_code == 200
+            assert response.json()["updated"] == 1
+    finally:
+        app.dependency_overrides.clear()
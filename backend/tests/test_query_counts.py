@@ -0,0 +1,116 @@
+"""
+Число SQL-запросов на эндпоинт.
+
+Защищает от возврата неявных eager-загрузок: история заказов и адреса
+клиента не должны подтягиваться в запросы, которым они не нужны.
+"""
+
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+
+from app.database import get_db
+from app.main import app
+from app.models.address import Address
+from app.models.order import Order, OrderLog, OrderStatus
+from app.models.user import User, UserRole, RoleEnum
+
+TELEGRAM_ID = 700700
+
+
+@pytest_asyncio.fixture
+async def client(db_session):
+    async def override_get_db():
+        yield db_session
+        await db_session.flush()
+
+    app.dependency_overrides[get_db] = override_get_db
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+    app.dependency_overrides.clear()
+
+
+@pytest_asyncio.fixture
+async def long_time_customer(db_session):
+    """Клиент с длинной историей: много адресов, заказов и логов."""
+    user = User(telegram_id=TELEGRAM_ID, name="Постоянный Клиент", phone="+79000000001")
+    db_session.add(user)
+    await db_session.flush()
+    db_session.add(UserRole(user_id=user.id, role=RoleEnum.client))
+
+    addresses = [
+        Address(
+            user_id=user.id, city="Торез", district="Торез", street="ул. Новая", house=str(i)
+        )
+        for i in range(5)
+    ]
+    db_session.add_all(addresses)
+    await db_session.flush()
+
+    orders = [
+        Order(
+            user_id=user.id,
+            address_id=addresses[i % 5].id,
+            jv_qty=1,
+            lv_qty=0,
+            total_qty=1,
+            delivery_date=date(2024, 1, 1) + timedelta(days=i),
+            status=OrderStatus.completed,
+        )
+        for i in range(50)
+    ]
+    db_session.add_all(orders)
+    await db_session.flush()
+    db_session.add_all(
+        OrderLog(order_id=o.id, action="created", new_status="new") for o in orders
+    )
+    await db_session.flush()
+    return user, orders
+
+
+@contextmanager
+def count_queries(db_session):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        (f"/api/v1/users/tg/{TELEGRAM_ID}", 1),
+        (f"/api/v1/addresses/user/{TELEGRAM_ID}", 2),
+        (f"/api/v1/orders/user/{TELEGRAM_ID}", 3),
+        (f"/api/v1/orders/user/{TELEGRAM_ID}/active", 2),
+        (f"/api/v1/orders/user/{TELEGRAM_ID}/last-completed", 2),
+        ("/api/v1/orders/{order_id}", 1),
+        ("/api/v1/operator/orders/new", 1),
+        ("/api/v1/operator/orders/feed", 1),
+        ("/api/v1/operator/orders/{order_id}/context", 1),
+        ("/api/v1/districts/", 1),
+    ],
+)
+async def test_get_endpoint_query_count(
+    client, db_session, long_time_customer, path, expected
+):
+    _, orders = long_time_customer
+    db_session.expunge_all()
+
+    with count_queries(db_session) as statements:
+        resp = await client.get(path.format(order_id=orders[0].id))
+
+    assert resp.status_code == 200
+    assert len(statements) == expected, statements
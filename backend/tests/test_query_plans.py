@@ -0,0 +1,122 @@
+"""
+EXPLAIN-проверка: запросы сервисов по заказам используют индексы.
+
+Требует PostgreSQL (TEST_POSTGRES_URL): создаёт 1 000 000 заказов.
+"""
+
+import json
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.services.delivery_date_service import get_orders_count_for_date
+from app.services.order_service import (
+    create_order,
+    get_active_order,
+    get_last_completed_order,
+    get_new_orders,
+    get_stale_orders,
+    get_user_orders,
+)
+
+ORDERS_COUNT = 1_000_000
+USERS_COUNT = 20_000
+INDEX_NODES = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+SEED_SQL = [
+    f"""
+    INSERT INTO users (telegram_id, name)
+    SELECT 5000000 + g, 'Клиент ' || g FROM generate_series(1, {USERS_COUNT}) g
+    """,
+    """
+    INSERT INTO addresses (user_id, city, district, street, house, is_default)
+    SELECT id, 'Торез', 'Торез', 'ул. Тестовая', id::text, true FROM users
+    """,
+    # 98% заказов — выполненные/отменённые, остальные — активные
+    f"""
+    INSERT INTO orders (
+        user_id, address_id, jv_qty, lv_qty, total_qty,
+        delivery_date, status, created_at
+    )
+    SELECT
+        u.id, a.id, 1, 0, 1,
+        DATE '2022-01-01' + (g % 1500),
+        (CASE
+            WHEN g % 100 = 0 THEN 'new'
+            WHEN g % 100 = 1 THEN 'confirmed'
+            WHEN g % 10 = 2 THEN 'cancelled'
+            ELSE 'completed'
+        END)::orderstatus,
+        TIMESTAMPTZ '2022-01-01' + (g || ' minutes')::interval
+    FROM generate_series(1, {ORDERS_COUNT}) g
+    JOIN users u ON u.id = 1 + g % {USERS_COUNT}
+    JOIN addresses a ON a.user_id = u.id
+    """,
+    "ANALYZE",
+]
+
+
+def _plan_nodes(plan: dict) -> list[dict]:
+    nodes = [plan]
+    for child in plan.get("Plans", []):
+        nodes.extend(_plan_nodes(child))
+    return nodes
+
+
+@contextmanager
+def capture_queries(engine):
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        if statement.lstrip().upper().startswith("SELECT") and "orders" in statement:
+            captured.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield captured
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.asyncio
+async def test_order_queries_use_indexes(pg_engine):
+    async with pg_engine.begin() as conn:
+        for sql in SEED_SQL:
+            await conn.execute(text(sql))
+
+    session_maker = async_sessionmaker(pg_engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as db:
+        user_id = 42
+        with capture_queries(pg_engine) as captured:
+            await get_active_order(db, user_id)
+            await get_user_orders(db, user_id)
+            await get_last_completed_order(db, user_id)
+            await get_new_orders(db)
+            await get_stale_orders(db, hours=24)
+            await get_orders_count_for_date(db, date(2023, 5, 4))
+            address_id = (
+                await db.execute(text(f"SELECT id FROM addresses WHERE user_id = {user_id}"))
+            ).scalar_one()
+            await create_order(db, user_id, address_id, 2, 1)
+        await db.rollback()
+
+        assert captured
+        conn = await db.connection()
+        for statement, parameters in captured:
+            result = await conn.exec_driver_sql(
+                "EXPLAIN (FORMAT JSON) " + statement, parameters
+            )
+            explain = result.scalar_one()
+            if isinstance(explain, str):
+                explain = json.loads(explain)
+            nodes = _plan_nodes(explain[0]["Plan"])
+
+            seq_scans = [
+                n for n in nodes
+                if n["Node Type"] == "Seq Scan" and n.get("Relation Name") == "orders"
+            ]
+            assert not seq_scans, f"Seq Scan по orders:\n{statement}"
+            assert any(n["Node Type"] in INDEX_NODES for n in nodes), statement
@@ -0,0 +1,55 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import event, select
+
+from app.models.district import DistrictLimit
+from app.models.holiday import Holiday
+from app.services import reference_cache
+from app.services.delivery_date_service import calculate_nearest_delivery_date
+
+
+@pytest.mark.asyncio
+async def test_date_calculation_skips_reference_queries(db_session):
+    """Тест: после прогрева кэша справочники не запрашиваются из БД."""
+    await reference_cache.get_reference_data(db_session)
+
+    statements = []
+    engine = db_session.get_bind()
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        await calculate_nearest_delivery_date(
+            db_session, "Зугрэс", 5, start_date=date(2025, 1, 1)
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert not any("district_limits" in s or "holidays" in s for s in statements)
+    assert len(statements) == 1  # только журнал занятости
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reloads_changes(db_session):
+    """Тест: после сброса кэша видны новые лимиты и праздники."""
+    data = await reference_cache.get_reference_data(db_session)
+    assert data.district_limit("Зугрэс") == 50
+    assert data.district_limit("Неизвестный") == 91
+
+    zugres = await db_session.scalar(
+        select(DistrictLimit).where(DistrictLimit.district == "Зугрэс")
+    )
+    zugres.max_per_day = 60
+    db_session.add(Holiday(date=date(2025, 1, 2), description="Каникулы"))
+    await db_session.commit()
+
+    # Без сброса — прежние данные
+    assert (await reference_cache.get_reference_data(db_session)).district_limit("Зугрэс") == 50
+
+    await reference_cache.invalidate_reference_data()
+    data = await reference_cache.get_reference_data(db_session)
+    assert data.district_limit("Зугрэс") == 60
+    assert date(2025, 1, 2) in data.holidays
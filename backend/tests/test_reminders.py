@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+
+from app.models.address import Address
+from app.models.order import Order, OrderStatus
+from app.models.user import User
+from app.services.reminder_service import (
+    get_orders_to_remind,
+    build_digest,
+    mark_reminded,
+)
+
+NOW = datetime(2025, 3, 3, 18, 0)
+
+
+@pytest_asyncio.fixture
+async def client_with_address(db_session):
+    user = User(telegram_id=500600, name="Клиент Напоминаний")
+    db_session.add(user)
+    await db_session.flush()
+    address = Address(
+        user_id=user.id, city="Харцызск", district="Зугрэс", street="Ленина", house="1"
+    )
+    db_session.add(address)
+    await db_session.flush()
+    return user, address
+
+
+async def _add_stale(db, user, address, hours_ago, status=OrderStatus.new):
+    order = Order(
+        user_id=user.id,
+        address_id=address.id if address else None,
+        jv_qty=2,
+        lv_qty=0,
+        total_qty=2,
+        status=status,
+        created_at=NOW - timedelta(hours=hours_ago),
+    )
+    db.add(order)
+    await db.flush()
+    return order
+
+
+@pytest.mark.asyncio
+async def test_digest_only_sends_changes(db_session, client_with_address):
+    """Тест: повторный запуск без новых заказов сводку не отправляет."""
+    user, address = client_with_address
+    old = await _add_stale(db_session, user, address, hours_ago=14)
+    recent = await _add_stale(db_session, user, None, hours_ago=3)
+    await _add_stale(db_session, user, address, hours_ago=1)  # ещё не завис
+    await _add_stale(db_session, user, address, hours_ago=5, status=OrderStatus.confirmed)
+
+    orders, fresh = await get_orders_to_remind(db_session, 2, 2, now=NOW)
+    assert [o.id for o in orders] == [old.id, recent.id]
+    assert fresh == {old.id, recent.id}
+    await mark_reminded(db_session, [o.id for o in orders], now=NOW)
+
+    orders, fresh = await get_orders_to_remind(
+        db_session, 2, 2, now=NOW + timedelta(minutes=30)
+    )
+    assert orders == []
+
+    # Новый зависший заказ — сводка со всеми, отмечен только он
+    newer = await _add_stale(db_session, user, address, hours_ago=2.5)
+    orders, fresh = await get_orders_to_remind(
+        db_session, 2, 2, now=NOW + timedelta(minutes=30)
+    )
+    assert {o.id for o in orders} == {old.id, recent.id, newer.id}
+    assert fresh == {newer.id}
+
+    # Без изменений сводка повторяется после интервала повтора
+    await mark_reminded(db_session, [o.id for o in orders], now=NOW)
+    orders, fresh = await get_orders_to_remind(
+        db_session, 2, 2, now=NOW + timedelta(hours=2, minutes=1)
+    )
+    # К этому времени завис и заказ, созданный за час до NOW
+    assert len(orders) == 4
+    assert len(fresh) == 1
+
+
+@pytest.mark.asyncio
+async def test_digest_groups_by_district_and_age(db_session, client_with_address):
+    """Тест: сводка сгруппирована по району и возрасту, с кнопками действий."""
+    user, address = client_with_address
+    old = await _add_stale(db_session, user, address, hours_ago=14)
+    recent = await _add_stale(db_session, user, None, hours_ago=3)
+
+    orders, fresh = await get_orders_to_remind(db_session, 2, 2, now=NOW)
+    digest = build_digest(orders, fresh, now=NOW)
+
+    assert digest.text.startswith("⏰ <b>Ожидают подтверждения: 2</b>")
+    text = digest.text
+    assert text.index("Без адреса") < text.index(f"№{recent.id}")
+    assert text.index("Зугрэс") < text.index(f"№{old.id}")
+    assert f"№{old.id} · 2 бут. · доставка — · более 12 ч" in text
+    assert f"№{recent.id} · 2 бут. · доставка — · до 6 ч" in text
+    callbacks = [b["callback_data"] for row in digest.keyboard["inline_keyboard"] for b in row]
+    assert callbacks == [
+        f"op_confirm_{old.id}", f"op_cancel_{old.id}",
+        f"op_confirm_{recent.id}", f"op_cancel_{recent.id}",
+    ]
@@ -0,0 +1,186 @@
+import asyncio
+
+import fakeredis
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+
+from app.database import get_db
+from app.main import app
+from app.models.address import Address
+from app.models.user import User
+from app.services import response_cache
+from app.services.order_service import create_order
+from app.services.response_cache import invalidate_dirty
+
+
+@pytest_asyncio.fixture
+async def client(db_session):
+    async def override_get_db():
+        # Как get_db: commit и сброс кэша после него
+        yield db_session
+        await db_session.commit()
+        await invalidate_dirty(db_session)
+
+    app.dependency_overrides[get_db] = override_get_db
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def queries(db_session):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.asyncio
+async def test_calculate_date_is_cached_until_capacity_changes(db_session, client, queries):
+    """Тест: повторный расчёт даты — без запросов; заказ сбрасывает кэш только своего района."""
+    params = {"district": "Торез", "qty": 20}
+    other = {"district": "Зугрэс", "qty": 20}
+    first = await client.get("/api/v1/districts/calculate-date", params=params)
+    assert first.status_code == 200
+    assert queries
+    other_first = await client.get("/api/v1/districts/calculate-date", params=other)
+
+    queries.clear()
+    again = await client.get("/api/v1/districts/calculate-date", params=params)
+    assert again.json() == first.json()
+    assert queries == []
+
+    user = User(telegram_id=810001, name="Клиент Кэша")
+    db_session.add(user)
+    await db_session.flush()
+    address = Address(
+        user_id=user.id, city="Торез", district="Торез", street="Ленина", house="5"
+    )
+    db_session.add(address)
+    await db_session.flush()
+    await create_order(db_session, user.id, address.id, 20, 0)
+    await db_session.commit()
+    await invalidate_dirty(db_session)
+
+    after = await client.get("/api/v1/districts/calculate-date", params=params)
+    assert after.json()["district_remaining"] == first.json()["district_remaining"] - 20
+
+    queries.clear()
+    other_after = await client.get("/api/v1/districts/calculate-date", params=other)
+    assert other_after.json() == other_first.json()
+    assert queries == []
+
+
+@pytest.mark.asyncio
+async def test_district_edit_invalidates_list(client):
+    """Тест: изменение лимита района сразу видно в списке районов."""
+    districts = (await client.get("/api/v1/districts/")).json()
+    torez = next(d for d in districts if d["district"] == "Торез")
+
+    response = await client.patch(f"/api/v1/districts/{torez['id']}", json={"max_per_day": 77})
+    assert response.status_code == 200
+
+    districts = (await client.get("/api/v1/districts/")).json()
+    assert next(d for d in districts if d["district"] == "Торез")["max_per_day"] == 77
+    date_info = await client.get(
+        "/api/v1/districts/calculate-date", params={"district": "Торез"}
+    )
+    assert date_info.json()["district_remaining"] == 76
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_compute_once():
+    """Тест: одновременные промахи по одному ключу ждут один расчёт."""
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"value": 42}
+
+    results = await asyncio.gather(
+        *(response_cache.cached("test", "key", load) for _ in range(20))
+    )
+    assert calls == 1
+    assert all(r == {"value": 42} for r in results)
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached():
+    """Тест: ошибка расчёта не кэшируется и передаётся всем ожидающим."""
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("нет даты")
+
+    results = await asyncio.gather(
+        *(response_cache.cached("test", "err", load) for _ in range(3)),
+        return_exceptions=True,
+    )
+    assert all(isinstance(r, ValueError) for r in results)
+    with pytest.raises(ValueError):
+        await response_cache.cached("test", "err", load)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_waiter_recomputes_when_loader_is_cancelled():
+    """Тест: отмена считающего запроса не отменяет ожидающих — они считают сами."""
+    started = asyncio.Event()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        started.set()
+        await asyncio.sleep(0.05)
+        return {"value": calls}
+
+    leader = asyncio.create_task(response_cache.cached("test", "cancel", load))
+    await started.wait()
+    follower = asyncio.create_task(response_cache.cached("test", "cancel", load))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == {"value": 2}
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_scope_invalidation_through_redis(monkeypatch):
+    """Тест: сброс области в Redis не трогает соседние области пространства."""
+    redis = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(response_cache, "get_redis", lambda: redis)
+    calls = []
+
+    def loader(name):
+        async def load():
+            calls.append(name)
+            return {"district": name}
+        return load
+
+    for name in ("Торез", "Зугрэс", "Торез", "Зугрэс"):
+        await response_cache.cached("dates", name, loader(name), scope=name)
+    assert calls == ["Торез", "Зугрэс"]
+
+    await response_cache.invalidate(response_cache.scoped("dates", "Торез"))
+    for name in ("Торез", "Зугрэс"):
+        await response_cache.cached("dates", name, loader(name), scope=name)
+    assert calls == ["Торез", "Зугрэс", "Торез"]
+
+    await response_cache.invalidate("dates")
+    await response_cache.cached("dates", "Зугрэс", loader("Зугрэс"), scope="Зугрэс")
+    assert calls == ["Торез", "Зугрэс", "Торез", "Зугрэс"]
@@ -0,0 +1,421 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import gspread
+import pytest
+
+from app.models.address import Address
+from app.models.order import Order, OrderStatus
+from app.models.user import User
+from app.services import (
+    address_service,
+    sheets_export,
+    sheets_queue,
+    sheets_service,
+    user_service,
+)
+from app.services.sheet_index import SheetRowIndex, reset_memory_index
+
+
+class FakeWorksheet:
+    """Лист в памяти; каждый метод — один запрос к Sheets API."""
+
+    def __init__(self, api):
+        self.api = api
+        self.rows: list[list] = []
+        self.grid_rows = 1000
+
+    @property
+    def row_count(self):
+        return max(self.grid_rows, len(self.rows))
+
+    def add_rows(self, n):
+        self.api.calls.append("add_rows")
+        self.grid_rows = self.row_count + n
+
+    def batch_clear(self, ranges):
+        self.api.calls.append("batch_clear")
+        for range_name in ranges:
+            first, last = (int(part[1:]) for part in range_name.split(":"))
+            for row in range(first, min(last, len(self.rows)) + 1):
+                self.rows[row - 1] = []
+
+    def row_values(self, row):
+        self.api.calls.append("row_values")
+        return self.rows[row - 1] if len(self.rows) >= row else []
+
+    def append_row(self, values):
+        self.api.calls.append("append_row")
+        self.rows.append(list(values))
+        n = len(self.rows)
+        return {"updates": {"updatedRange": f"'Лист1'!A{n}:M{n}", "updatedRows": 1}}
+
+    def batch_update(self, data):
+        self.api.check_quota("batch_update")
+        for item in data:
+            row = int(item["range"].split(":")[0][1:])
+            self.rows[row - 1] = list(item["values"][0])
+
+    def append_rows(self, values):
+        self.api.check_quota("append_rows")
+        first = len(self.rows) + 1
+        self.rows.extend(list(v) for v in values)
+        last = len(self.rows)
+        return {"updates": {"updatedRange": f"'Лист1'!A{first}:M{last}"}}
+
+    def col_values(self, col):
+        self.api.calls.append("col_values")
+        return [row[col - 1] for row in self.rows]
+
+    def update(self, range_name, values):
+        self.api.calls.append("update")
+        first, last = (int(part[1:]) for part in range_name.split(":"))
+        assert last <= self.row_count, "range за пределами листа"
+        while len(self.rows) < last:
+            self.rows.append([])
+        for offset, values_row in enumerate(values):
+            self.rows[first - 1 + offset] = list(values_row)
+
+
+class FakeSheetsApi:
+    def __init__(self):
+        self.calls: list[str] = []
+        self.worksheet = FakeWorksheet(self)
+        self.quota_exhausted_on: set[str] = set()
+
+    def check_quota(self, method):
+        self.calls.append(method)
+        if method in self.quota_exhausted_on:
+            response = SimpleNamespace(
+                status_code=429,
+                text="",
+                json=lambda: {"error": {"code": 429, "message": "Quota exceeded"}},
+            )
+            raise gspread.exceptions.APIError(response)
+
+    def authorize(self, creds):
+        self.calls.append("token")
+        return self
+
+    def open_by_key(self, key):
+        self.calls.append("open_by_key")
+        api = self
+
+        class Spreadsheet:
+            @property
+            def sheet1(self):
+                api.calls.append("sheet1")
+                return api.worksheet
+
+        return Spreadsheet()
+
+
+@pytest.fixture
+def sheets_api(monkeypatch):
+    api = FakeSheetsApi()
+    settings = sheets_service.get_settings()
+    monkeypatch.setattr(settings, "GOOGLE_SHEETS_CREDENTIALS", "{}")
+    monkeypatch.setattr(settings, "GOOGLE_SHEET_ID", "sheet")
+    monkeypatch.setattr(
+        sheets_service.Credentials,
+        "from_service_account_info",
+        lambda info, scopes: object(),
+    )
+    monkeypatch.setattr(sheets_service.gspread, "authorize", api.authorize)
+    sheets_service.reset_sheets_client()
+    reset_memory_index()
+    sheets_queue.reset_memory_queue()
+    sheets_export.reset_memory_watermark()
+    yield api
+    sheets_service.reset_sheets_client()
+    reset_memory_index()
+    sheets_queue.reset_memory_queue()
+    sheets_export.reset_memory_watermark()
+
+
+def _order(order_id, status="new"):
+    return {"id": order_id, "status": status, "total_qty": 2}
+
+
+def test_cached_worksheet_saves_api_calls(sheets_api):
+    """Тест: клиент и лист открываются один раз, заголовки проверяются один раз."""
+    orders = 10
+    sheets_api.worksheet.rows = [list(sheets_service.HEADERS)]
+
+    # Как раньше: всё заново на каждый заказ
+    for i in range(orders):
+        sheets_service.reset_sheets_client()
+        assert sheets_service.sync_order_to_sheet(_order(i))
+    uncached = len(sheets_api.calls)
+
+    sheets_api.calls.clear()
+    sheets_service.reset_sheets_client()
+    for i in range(orders):
+        assert sheets_service.sync_order_to_sheet(_order(i, "confirmed"))
+    cached = len(sheets_api.calls)
+
+    # Открытие один раз, дальше на заказ — одна запись в известную строку
+    assert sheets_api.calls[4:] == ["update"] * orders
+    # token, open_by_key, sheet1, row_values — 4 запроса экономятся на заказ
+    assert uncached - cached == 4 * (orders - 1) + 1  # + построение индекса
+
+    rows = sheets_api.worksheet.rows
+    assert rows[0] == sheets_service.HEADERS
+    assert len(rows) == orders + 1
+    assert all(row[10] == "confirmed" for row in rows[1:])
+
+
+def test_row_index_avoids_sheet_scans(sheets_api):
+    """Тест: индекс строится одним чтением столбца, обновления идут по номеру строки."""
+    ws = sheets_api.worksheet
+    ws.rows = [list(sheets_service.HEADERS), [7, "", "старый"], [3, "", "старый"]]
+
+    assert sheets_service.sync_order_to_sheet(_order(3, "confirmed"))
+    assert sheets_service.sync_order_to_sheet(_order(11))
+    assert sheets_service.sync_order_to_sheet(_order(11, "completed"))
+    assert sheets_api.calls.count("col_values") == 1
+    assert "find" not in sheets_api.calls
+    assert ws.rows[2][10] == "confirmed"
+    assert ws.rows[3][0] == 11 and ws.rows[3][10] == "completed"
+    assert len(ws.rows) == 4
+
+
+def test_repair_row_index_after_manual_reorder(sheets_api):
+    """Тест: после ручной перестановки строк индекс пересобирается."""
+    ws = sheets_api.worksheet
+    ws.rows = [list(sheets_service.HEADERS)]
+    for order_id in (1, 2, 3):
+        sheets_service.sync_order_to_sheet(_order(order_id))
+
+    # Оператор отсортировал лист по убыванию и удалил заказ 2
+    ws.rows = [ws.rows[0], ws.rows[3], ws.rows[1]]
+    report = sheets_service.repair_sheet_index()
+    assert report == {"moved": 2, "missing": 0, "stale": 1}
+
+    index = SheetRowIndex("sheet")
+    assert index.get(3) == 2 and index.get(1) == 3 and index.get(2) is None
+    sheets_service.sync_order_to_sheet(_order(1, "paid"))
+    assert ws.rows[2][0] == 1 and ws.rows[2][10] == "paid"
+
+
+@pytest.mark.asyncio
+async def test_queue_coalesces_and_writes_one_batch(sheets_api):
+    """Тест: повторные изменения схлопываются, пачка — batch_update + append_rows."""
+    ws = sheets_api.worksheet
+    ws.rows = [list(sheets_service.HEADERS), [1, "", "", "", "", "", 0, 0, 0, "", "new"]]
+    for order_id in (1, 2, 3, 2, 1):
+        await sheets_queue.enqueue([order_id])
+
+    loaded = []
+
+    def load(ids):
+        loaded.append(ids)
+        return [_order(i, "confirmed") for i in ids]
+
+    report = sheets_queue.drain(load)
+    assert report == {"written": 3, "requeued": 0, "pause": 0}
+    assert loaded == [[1, 2, 3]]
+    writes = [c for c in sheets_api.calls if c in ("batch_update", "append_rows")]
+    assert writes == ["batch_update", "append_rows"]
+    assert [row[0] for row in ws.rows[1:]] == [1, 2, 3]
+    assert all(row[10] == "confirmed" for row in ws.rows[1:])
+    assert sheets_queue.drain(load)["written"] == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_backs_off_on_quota_and_resumes(sheets_api, monkeypatch):
+    """Тест: при исчерпании квоты незаписанное остаётся в очереди и пишется позже."""
+    ws = sheets_api.worksheet
+    ws.rows = [list(sheets_service.HEADERS), [1, "", "", "", "", "", 0, 0, 0, "", "new"]]
+    await sheets_queue.enqueue([1, 2, 3])
+    load = lambda ids: [_order(i, "paid") for i in ids]  # noqa: E731
+
+    sheets_api.quota_exhausted_on = {"append_rows"}
+    report = sheets_queue.drain(load)
+    # Существующая строка записана, новые вернулись в очередь
+    assert report == {"written": 1, "requeued": 2, "pause": 30}
+    assert ws.rows[1][10] == "paid" and len(ws.rows) == 2
+
+    # Во время паузы очередь не трогается
+    sheets_api.quota_exhausted_on = set()
+    assert sheets_queue.drain(load)["written"] == 0
+
+    monkeypatch.setitem(sheets_queue._memory_backoff, "until", 0.0)
+    assert sheets_queue.drain(load) == {"written": 2, "requeued": 0, "pause": 0}
+    assert [row[0] for row in ws.rows[1:]] == [1, 2, 3]
+    assert all(row[10] == "paid" for row in ws.rows[1:])
+
+
+@pytest.mark.asyncio
+async def test_queue_keeps_ids_while_sheet_unavailable(sheets_api, monkeypatch):
+    """Тест: без листа id остаются в очереди, запись откладывается с паузой."""
+    await sheets_queue.enqueue([1, 2])
+    monkeypatch.setattr(sheets_service.get_settings(), "GOOGLE_SHEET_ID", "")
+    sheets_service.reset_sheets_client()
+    load = lambda ids: [_order(i) for i in ids]  # noqa: E731
+
+    assert sheets_queue.drain(load) == {"written": 0, "requeued": 0, "pause": 30}
+    assert sorted(sheets_queue._memory_dirty) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_queue_backs_off_when_opening_sheet_fails(sheets_api, monkeypatch):
+    """Тест: ошибка API при открытии листа — id в очереди, запись на паузе."""
+    await sheets_queue.enqueue([1, 2])
+    sheets_api.quota_exhausted_on = {"open_by_key"}
+    original = sheets_api.open_by_key
+
+    def open_by_key(key):
+        sheets_api.check_quota("open_by_key")
+        return original(key)
+
+    monkeypatch.setattr(sheets_api, "open_by_key", open_by_key)
+    load = lambda ids: [_order(i) for i in ids]  # noqa: E731
+
+    assert sheets_queue.drain(load) == {"written": 0, "requeued": 0, "pause": 30}
+    assert sorted(sheets_queue._memory_dirty) == [1, 2]
+    # Во время паузы лист не открывается повторно
+    sheets_api.calls.clear()
+    assert sheets_queue.drain(load)["written"] == 0
+    assert sheets_api.calls == []
+
+
+@pytest.mark.asyncio
+async def test_orders_are_queued_after_commit(db_session, sheets_api):
+    """Тест: заказ попадает в очередь только после commit."""
+    sheets_queue.mark_sheet_dirty(db_session, 42)
+    assert sheets_queue._take(10) == []
+    await sheets_queue.enqueue_dirty(db_session)
+    assert sheets_queue._take(10) == [42]
+
+
+@pytest.mark.asyncio
+async def test_full_and_incremental_export(db_session, sheets_api):
+    """Тест: полная выгрузка перезаписывает лист блоками, инкрементальная — только изменения."""
+    user = User(telegram_id=700800, name="Клиент Выгрузки", phone="+79490000000")
+    db_session.add(user)
+    await db_session.flush()
+    address = Address(
+        user_id=user.id, city="Торез", district="Торез", street="Победы", house="9"
+    )
+    db_session.add(address)
+    await db_session.flush()
+    orders = [
+        Order(
+            user_id=user.id,
+            address_id=address.id if i % 2 else None,
+            jv_qty=i + 1,
+            lv_qty=0,
+            total_qty=i + 1,
+            status=OrderStatus.new,
+            updated_at=datetime(2025, 3, 1, 10, i),
+        )
+        for i in range(7)
+    ]
+    db_session.add_all(orders)
+    await db_session.commit()
+    ids = [o.id for o in orders]
+
+    ws = sheets_api.worksheet
+    # Старое содержимое длиннее новой выгрузки; сетка листа меньше нужной
+    ws.rows = [list(sheets_service.HEADERS)] + [[900 + i] for i in range(10)]
+    ws.grid_rows = 5
+
+    assert await sheets_export.export_full(db_session, chunk=3) == 7
+    assert [row[0] for row in ws.rows[1:8]] == ids
+    assert ws.rows[2][4] == "Торез, Торез, Победы, 9"
+    assert all(row == [] for row in ws.rows[8:])
+    assert sheets_api.calls.count("update") == 3  # блоки по 3 строки
+    assert SheetRowIndex("sheet").get(ids[6]) == 8
+    assert await sheets_export.get_watermark() == datetime(2025, 3, 1, 10, 6)
+
+    orders[2].status = OrderStatus.confirmed
+    orders[2].updated_at = datetime(2025, 3, 1, 11, 0)
+    await db_session.commit()
+    sheets_api.calls.clear()
+
+    # Заказ 7 попадает в запас WATERMARK_OVERLAP, заказ 3 изменён
+    assert await sheets_export.export_incremental(db_session, chunk=3) == 2
+    assert sheets_api.calls == ["batch_update"]
+    assert ws.rows[3][0] == ids[2] and ws.rows[3][10] == "confirmed"
+    assert await sheets_export.get_watermark() == datetime(2025, 3, 1, 11, 0)
+
+
+@pytest.mark.asyncio
+async def test_incremental_export_keeps_watermark_without_sheet(
+    db_session, sheets_api, monkeypatch
+):
+    """Тест: без листа отметка не сдвигается; выгрузки не идут одновременно."""
+    user = User(telegram_id=700801, name="Клиент Отметки")
+    db_session.add(user)
+    await db_session.flush()
+    db_session.add(
+        Order(
+            user_id=user.id,
+            jv_qty=1,
+            lv_qty=0,
+            total_qty=1,
+            status=OrderStatus.new,
+            updated_at=datetime(2025, 3, 2, 10, 0),
+        )
+    )
+    await db_session.commit()
+    watermark = datetime(2025, 3, 1, 10, 0)
+    await sheets_export.set_watermark(watermark)
+
+    with sheets_queue.export_lock():
+        with pytest.raises(RuntimeError):
+            await sheets_export.export_incremental(db_session)
+
+    monkeypatch.setattr(sheets_service.get_settings(), "GOOGLE_SHEET_ID", "")
+    sheets_service.reset_sheets_client()
+    assert await sheets_export.export_incremental(db_session) == 0
+    assert await sheets_export.get_watermark() == watermark
+
+
+@pytest.mark.asyncio
+async def test_address_and_user_edits_are_reexported(db_session, sheets_api):
+    """Тест: правка адреса или клиента снова выгружает его заказы."""
+    user = User(telegram_id=700802, name="Клиент Правки", phone="+79490000001")
+    db_session.add(user)
+    await db_session.flush()
+    address = Address(
+        user_id=user.id, city="Торез", district="Торез", street="Победы", house="9"
+    )
+    db_session.add(address)
+    await db_session.flush()
+    order = Order(
+        user_id=user.id,
+        address_id=address.id,
+        jv_qty=1,
+        lv_qty=0,
+        total_qty=1,
+        status=OrderStatus.new,
+        updated_at=datetime(2025, 3, 1, 10, 0),
+    )
+    db_session.add(order)
+    await db_session.commit()
+
+    ws = sheets_api.worksheet
+    ws.rows = [list(sheets_service.HEADERS)]
+    assert await sheets_export.export_full(db_session) == 1
+    # Отметка далеко впереди запаса: без правок выгружать нечего
+    await sheets_export.set_watermark(datetime(2025, 3, 1, 12, 0))
+    assert await sheets_export.export_incremental(db_session) == 0
+
+    await address_service.update_address(db_session, address, street="Ленина")
+    await db_session.commit()
+    assert await sheets_export.export_incremental(db_session) == 1
+    assert ws.rows[1][4] == "Торез, Торез, Ленина, 9"
+
+    # Правка, не попадающая в лист, заказ не трогает
+    order.updated_at = datetime(2025, 3, 1, 10, 0)
+    await db_session.commit()
+    await address_service.update_address(db_session, address, is_default=False)
+    await db_session.commit()
+    assert await sheets_export.export_incremental(db_session) == 0
+
+    await user_service.update_user(db_session, user, name="Клиент Новый")
+    await db_session.commit()
+    assert await sheets_export.export_incremental(db_session) == 1
+    assert ws.rows[1][2] == "Клиент Новый"
@@ -0,0 +1,88 @@
+"""Тесты переходов статусов заказа по ORDER_TRANSITIONS."""
+
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.address import Address
+from app.models.order import ORDER_TRANSITIONS, Order, OrderLog, OrderStatus
+from app.models.user import User
+from app.services.capacity_service import reconcile_capacity
+from app.services.order_service import create_order, update_order_status
+
+
+async def _order(db, telegram_id: int) -> Order:
+    user = User(telegram_id=telegram_id, name="Клиент Статусов")
+    db.add(user)
+    await db.flush()
+    address = Address(
+        user_id=user.id, city="Торез", district="Торез", street="Ленина", house="9"
+    )
+    db.add(address)
+    await db.flush()
+    return await create_order(db, user.id, address.id, 2, 0)
+
+
+@pytest.mark.asyncio
+async def test_transition_follows_table(db_session):
+    """Тест: допустимая цепочка проходит, недопустимый переход — ValueError."""
+    order = await _order(db_session, 300800)
+
+    with pytest.raises(ValueError, match="new → completed"):
+        await update_order_status(db_session, order.id, OrderStatus.completed)
+
+    for status in (OrderStatus.confirmed, OrderStatus.in_delivery, OrderStatus.completed):
+        assert OrderStatus(order.status) in ORDER_TRANSITIONS[status]
+        order = await update_order_status(db_session, order.id, status)
+        assert order.status == status
+
+    with pytest.raises(ValueError):
+        await update_order_status(db_session, order.id, OrderStatus.cancelled)
+    assert await update_order_status(db_session, 999999, OrderStatus.confirmed) is None
+
+    logs = (
+        await db_session.execute(
+            select(OrderLog.old_status, OrderLog.new_status)
+            .where(OrderLog.order_id == order.id, OrderLog.action == "status_change")
+            .order_by(OrderLog.id)
+        )
+    ).all()
+    assert logs == [
+        ("new", "confirmed"),
+        ("confirmed", "in_delivery"),
+        ("in_delivery", "completed"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_status_changes_resolve_once(pg_engine):
+    """Тест: одновременные подтверждения одного заказа — проходит ровно одно (PostgreSQL)."""
+    session_maker = async_sessionmaker(pg_engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as db:
+        order = await _order(db, 300801)
+        await db.commit()
+
+    async def confirm():
+        async with session_maker() as db:
+            try:
+                await update_order_status(db, order.id, OrderStatus.confirmed)
+            except ValueError:
+                return False
+            await db.commit()
+            return True
+
+    results = await asyncio.gather(*(confirm() for _ in range(20)))
+    assert sum(results) == 1
+
+    async with session_maker() as db:
+        changes = (
+            await db.execute(
+                select(OrderLog.id).where(
+                    OrderLog.order_id == order.id, OrderLog.new_status == "confirmed"
+                )
+            )
+        ).all()
+        assert len(changes) == 1
+        assert await reconcile_capacity(db) == []
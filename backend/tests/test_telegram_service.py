@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+import fakeredis
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.services import telegram_service
+from app.services.telegram_service import OutgoingMessage, SharedTokenBucket, TelegramSender
+
+BLOCKED_CHAT = 403
+FLOOD_CHAT = 429
+
+
+class FakeBotApi:
+    """Заглушка Bot API: считает параллельные запросы и отвечает как Telegram."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls: list[tuple[int, float]] = []
+        self.flooded = False
+        self.app = FastAPI()
+        self.app.post("/bot{token}/sendMessage")(self.send_message)
+
+    async def send_message(self, token: str, request: Request):
+        payload = await request.json()
+        chat_id = payload["chat_id"]
+        self.calls.append((chat_id, time.monotonic()))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+
+        if chat_id == BLOCKED_CHAT:
+            return JSONResponse(
+                {"ok": False, "error_code": 403,
+                 "description": "Forbidden: bot was blocked by the user"},
+                status_code=403,
+            )
+        if chat_id == FLOOD_CHAT and not self.flooded:
+            self.flooded = True
+            return JSONResponse(
+                {"ok": False, "error_code": 429,
+                 "description": "Too Many Requests: retry after 1",
+                 "parameters": {"retry_after": 1}},
+                status_code=429,
+            )
+        return {"ok": True, "result": {"message_id": len(self.calls), "chat": {"id": chat_id}}}
+
+
+def make_sender(api: FakeBotApi, **kwargs) -> TelegramSender:
+    params = dict(
+        token="test",
+        base_url="http://telegram.test",
+        concurrency=10,
+        global_rate=1000,
+        per_chat_rate=1000,
+        transport=httpx.ASGITransport(app=api.app),
+    )
+    params.update(kwargs)
+    return TelegramSender(**params)
+
+
+@pytest.mark.asyncio
+async def test_fan_out_is_concurrent_and_bounded():
+    """Тест: рассылка идёт параллельно, но не больше concurrency запросов сразу."""
+    api = FakeBotApi(delay=0.05)
+    sender = make_sender(api, concurrency=10)
+    messages = [OutgoingMessage(chat_id, "текст") for chat_id in range(1000, 1040)]
+
+    started = time.monotonic()
+    try:
+        results = await sender.fan_out(messages)
+    finally:
+        await sender.close()
+    elapsed = time.monotonic() - started
+
+    assert all(r.ok for r in results)
+    assert [r.chat_id for r in results] == [m.chat_id for m in messages]
+    assert 1 < api.max_in_flight <= 10
+    # Последовательно было бы 40 * 0.05 = 2 с
+    assert elapsed < 1.0
+
+
+@pytest.mark.asyncio
+async def test_report_handles_flood_wait_and_blocked_chat():
+    """Тест: 429 повторяется после retry_after, 403 попадает в отчёт без повторов."""
+    api = FakeBotApi(delay=0)
+    sender = make_sender(api)
+    try:
+        results = await sender.fan_out(
+            [
+                OutgoingMessage(FLOOD_CHAT, "a"),
+                OutgoingMessage(BLOCKED_CHAT, "b"),
+                OutgoingMessage(1, "c"),
+            ]
+        )
+    finally:
+        await sender.close()
+
+    flood, blocked, ok = results
+    assert flood.ok and flood.attempts == 2
+    flood_calls = [t for chat_id, t in api.calls if chat_id == FLOOD_CHAT]
+    assert flood_calls[1] - flood_calls[0] >= 1.0
+
+    assert not blocked.ok
+    assert blocked.attempts == 1
+    assert blocked.status_code == 403
+    assert "blocked" in blocked.error
+
+    assert ok.ok and ok.message_id is not None
+
+
+@pytest.mark.asyncio
+async def test_per_chat_rate_limit():
+    """Тест: сообщения в один чат разнесены по времени согласно лимиту."""
+    api = FakeBotApi(delay=0)
+    sender = make_sender(api, per_chat_rate=10)
+    try:
+        results = await sender.fan_out([OutgoingMessage(7, str(i)) for i in range(4)])
+    finally:
+        await sender.close()
+
+    assert all(r.ok for r in results)
+    times = sorted(t for _, t in api.calls)
+    # 4 сообщения при 10/с и запасе в 1 токен — не быстрее 0.3 с
+    assert times[-1] - times[0] >= 0.28
+
+
+@pytest.mark.asyncio
+async def test_flood_wait_pauses_whole_fan_out():
+    """Тест: после 429 остальная рассылка ждёт retry_after, а не получает новые 429."""
+    api = FakeBotApi(delay=0)
+    sender = make_sender(api, global_rate=2)
+    try:
+        results = await sender.fan_out(
+            [OutgoingMessage(FLOOD_CHAT, "a")] + [OutgoingMessage(i, "b") for i in range(4)]
+        )
+    finally:
+        await sender.close()
+
+    assert all(r.ok for r in results)
+    flood_at = api.calls[0][1]
+    assert api.calls[0][0] == FLOOD_CHAT
+    # Запас ведра (2) ушёл сразу, дальше — только после паузы в 1 с
+    assert all(t - flood_at >= 0.95 for _, t in api.calls[2:])
+
+
+@pytest.mark.asyncio
+async def test_global_bucket_is_shared_through_redis(monkeypatch):
+    """Тест: общий лимит и пауза действуют на отправители разных процессов."""
+    redis = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(telegram_service, "get_redis", lambda: redis)
+    first, second = SharedTokenBucket(10, 1), SharedTokenBucket(10, 1)
+
+    started = time.monotonic()
+    await asyncio.gather(*(b.acquire() for b in (first, second) * 3))
+    # 6 токенов при 10/с и запасе 1 на двоих — не быстрее 0.5 с
+    assert time.monotonic() - started >= 0.45
+
+    await first.pause(0.3)
+    started = time.monotonic()
+    await second.acquire()
+    assert time.monotonic() - started >= 0.25
+    await redis.aclose()
@@ -8,6 +8,40 @@ class BotSettings(BaseSettings):
     REDIS_HOST: str = "redis"
     REDIS_PORT: int = 6379
 
+    # Режим работы: polling — один процесс с long polling;
+    # webhook — приём апдейтов в очередь Redis; worker — обработка очереди
+    BOT_MODE: str = "polling"
+    WEBHOOK_URL: str = ""  # публичный https-адрес, например https://bot.example.com
+    WEBHOOK_PATH: str = "/telegram/webhook"
+    WEBHOOK_SECRET: str = ""  # X-Telegram-Bot-Api-Secret-Token
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+    UPDATE_QUEUE_PARTITIONS: int = 16
+    UPDATE_QUEUE_MAXLEN: int = 100000  # апдейтов в одной партиции
+    UPDATE_WORKER_CONCURRENCY: int = 64  # апдейтов в обработке на воркер
+
+    # Ограничение частоты (token bucket в Redis): скорость в секунду и запас
+    THROTTLE_MESSAGE_RATE: float = 1.0
+    THROTTLE_MESSAGE_BURST: int = 5
+    THROTTLE_CALLBACK_RATE: float = 3.0
+    THROTTLE_CALLBACK_BURST: int = 10
+    THROTTLE_FEEDBACK: bool = True  # подсказать пользователю «слишком часто»
+
+    # HTTP-клиент backend API
+    API_POOL_LIMIT: int = 100
+    API_POOL_LIMIT_PER_HOST: int = 50
+    API_DNS_CACHE_TTL: int = 300
+    API_KEEPALIVE_TIMEOUT: float = 30.0
+    API_TIMEOUT: float = 10.0
+    API_CONNECT_TIMEOUT: float = 3.0
+    API_RETRIES: int = 2
+    API_RETRY_BACKOFF: float = 0.2
+
+    # Кэш профилей пользователей
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_LOCAL_TTL: float = 60.0
+    USER_CACHE_REDIS_TTL: int = 600
+
     @property
     def redis_url(self) -> str:
         return f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}/0"
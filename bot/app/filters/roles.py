@@ -0,0 +1,22 @@
+"""Фильтр операторских обработчиков по ролям пользователя из backend."""
+
+from aiogram.filters import BaseFilter
+from aiogram.types import CallbackQuery, Message
+
+from app.services.api_client import api_client
+from app.services.user_cache import user_cache
+
+OPERATOR_ROLES = {"operator", "admin"}
+
+
+class OperatorFilter(BaseFilter):
+    """
+    Пропускает только операторов и администраторов. Фильтры срабатывают
+    раньше AuthMiddleware, поэтому профиль берётся из того же кэша сам.
+    """
+
+    async def __call__(self, event: Message | CallbackQuery) -> bool:
+        if event.from_user is None:
+            return False
+        user = await user_cache.get(event.from_user.id, api_client.get_user)
+        return bool(user) and bool(OPERATOR_ROLES & set(user.get("roles") or ()))
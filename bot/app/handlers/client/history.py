@@ -16,7 +16,7 @@ async def order_history(message: Message, db_user: dict | None):
         await message.answer("Сначала зарегистрируйтесь: /start")
         return
 
-    result = await api_client.get_orders(message.from_user.id, limit=20, offset=0)
+    result = await api_client.get_orders(message.from_user.id, limit=20)
 
     if not result or not result.get("orders"):
         await message.answer(
@@ -32,16 +32,21 @@ async def order_history(message: Message, db_user: dict | None):
         f"📋 <b>История заказов</b> ({total} всего):\n\n"
         f"Нажмите на заказ для подробностей:",
         parse_mode="HTML",
-        reply_markup=order_history_keyboard(orders, offset=0),
+        reply_markup=order_history_keyboard(orders, result.get("next_cursor")),
     )
 
 
-@router.callback_query(F.data.startswith("history_offset_"))
+@router.callback_query(F.data.startswith("history_next_") | (F.data == "history_first"))
 async def history_page(callback: CallbackQuery):
-    offset = int(callback.data.replace("history_offset_", ""))
+    cursor = None
+    if callback.data.startswith("history_next_"):
+        cursor = int(callback.data.replace("history_next_", ""))
     telegram_id = callback.from_user.id
 
-    result = await api_client.get_orders(telegram_id, limit=20, offset=offset)
+    # Общее число показано на первой странице — дальше не пересчитываем
+    result = await api_client.get_orders(
+        telegram_id, limit=20, cursor=cursor, with_total=False
+    )
     if not result or not result.get("orders"):
         await callback.answer("Нет больше заказов")
         return
@@ -49,7 +54,9 @@ async def history_page(callback: CallbackQuery):
     orders = result["orders"]
 
     await callback.message.edit_reply_markup(
-        reply_markup=order_history_keyboard(orders, offset=offset)
+        reply_markup=order_history_keyboard(
+            orders, result.get("next_cursor"), is_first_page=cursor is None
+        )
     )
     await callback.answer()
 
@@ -4,8 +4,10 @@ from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message
 
+from app.filters.roles import OperatorFilter
 from app.keyboards.operator import operator_menu_keyboard
 from app.services.api_client import api_client
+from app.utils import metrics
 
 router = Router()
 
@@ -40,3 +42,12 @@ async def manage_districts(message: Message):
         text += f"{status} {d['district']}: {d['max_per_day']} бут./день\n"
 
     await message.answer(text, parse_mode="HTML")
+
+
+@router.message(Command("stats"), OperatorFilter())
+async def cmd_stats(message: Message):
+    """Метрики процесса бота (только операторам): кэш профилей, обращения к backend."""
+    await message.answer(
+        f"📈 <b>Статистика бота</b>\n\n<pre>{metrics.render()}</pre>",
+        parse_mode="HTML",
+    )
@@ -0,0 +1,146 @@
+"""
+Операторская часть: массовые действия с заказами на сегодня.
+
+Предпросмотр (dry_run) показывает заказы и кладёт их id в данные FSM
+вместе с id сообщения предпросмотра. «Применить» отправляет именно эти id,
+а не фильтр по дате: заказы, появившиеся после предпросмотра, не
+затрагиваются. Предпросмотр действует BULK_PREVIEW_TTL секунд.
+"""
+
+import time
+from datetime import date
+
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message, CallbackQuery
+
+from app.filters.roles import OperatorFilter
+from app.keyboards.operator import bulk_today_keyboard, bulk_confirm_keyboard
+from app.services.api_client import api_client
+
+router = Router()
+router.message.filter(OperatorFilter())
+router.callback_query.filter(OperatorFilter())
+
+# Действие → (что делаем, итог)
+BULK_LABELS = {
+    "confirm": ("✅ Подтвердить", "подтверждено"),
+    "deliver": ("🚚 Отправить в доставку", "в доставке"),
+    "complete": ("✔️ Отметить выполненными", "выполнено"),
+}
+
+BULK_PREVIEW_KEY = "bulk_preview"
+BULK_PREVIEW_TTL = 600
+
+
+@router.message(F.text == "📦 На сегодня")
+async def bulk_menu(message: Message):
+    await message.answer(
+        f"📦 <b>Заказы на {date.today().isoformat()}</b>\n\nВыберите действие для всех:",
+        parse_mode="HTML",
+        reply_markup=bulk_today_keyboard(),
+    )
+
+
+async def _preview(
+    message: Message, state: FSMContext, action: str, operator_tg_id: int
+) -> None:
+    """Показать, сколько заказов затронет действие, и спросить подтверждение."""
+    today = date.today().isoformat()
+    result = await api_client.bulk_action(
+        action, operator_tg_id, delivery_date=today, dry_run=True
+    )
+    if not result or "error" in result:
+        await message.answer(f"❌ {(result or {}).get('error', 'Ошибка сервера')}")
+        return
+
+    ids = [r["id"] for r in result["results"] if r["ok"]]
+    if not ids:
+        await message.answer(f"Нет заказов на {today}, к которым применимо это действие.")
+        return
+
+    verb, _ = BULK_LABELS[action]
+    shown = ", ".join(f"№{i}" for i in ids[:30])
+    if len(ids) > 30:
+        shown += f" и ещё {len(ids) - 30}"
+    sent = await message.answer(
+        f"{verb} заказы на {today}: <b>{len(ids)}</b>\n{shown}",
+        parse_mode="HTML",
+        reply_markup=bulk_confirm_keyboard(),
+    )
+    await state.update_data(
+        {
+            BULK_PREVIEW_KEY: {
+                "message_id": sent.message_id,
+                "action": action,
+                "ids": ids,
+                "expires": time.time() + BULK_PREVIEW_TTL,
+            }
+        }
+    )
+
+
+@router.message(Command("confirm_today", "deliver_today", "complete_today"))
+async def bulk_command(message: Message, command: CommandObject, state: FSMContext):
+    action = command.command.removesuffix("_today")
+    await _preview(message, state, action, message.from_user.id)
+
+
+@router.callback_query(F.data.startswith("bulk_preview_"))
+async def bulk_preview(callback: CallbackQuery, state: FSMContext):
+    action = callback.data.replace("bulk_preview_", "")
+    await _preview(callback.message, state, action, callback.from_user.id)
+    await callback.answer()
+
+
+async def _pop_preview(state: FSMContext, message_id: int) -> dict | None:
+    """Снять сохранённый предпросмотр этого сообщения (None — устарел или чужой)."""
+    data = await state.get_data()
+    preview = data.get(BULK_PREVIEW_KEY)
+    if not preview or preview["message_id"] != message_id:
+        return None
+    await state.update_data({BULK_PREVIEW_KEY: None})
+    if preview["expires"] < time.time():
+        return None
+    return preview
+
+
+@router.callback_query(F.data == "bulk_apply")
+async def bulk_apply(callback: CallbackQuery, state: FSMContext):
+    preview = await _pop_preview(state, callback.message.message_id)
+    if preview is None:
+        await callback.message.edit_reply_markup(reply_markup=None)
+        await callback.answer(
+            "Предпросмотр устарел — запросите действие заново", show_alert=True
+        )
+        return
+
+    action = preview["action"]
+    result = await api_client.bulk_action(
+        action,
+        callback.from_user.id,
+        order_ids=preview["ids"],
+        comment="Массовое действие оператора",
+    )
+    if not result or "error" in result:
+        await callback.answer(
+            f"Ошибка: {(result or {}).get('error', 'Ошибка сервера')}", show_alert=True
+        )
+        return
+
+    _, done = BULK_LABELS[action]
+    skipped = [r for r in result["results"] if not r["ok"]]
+    text = f"{callback.message.html_text}\n\n<b>Готово: {done} {result['updated']}</b>"
+    if skipped:
+        text += f", пропущено {len(skipped)}:\n"
+        text += "\n".join(f"  №{r['id']}: {r['error']}" for r in skipped[:20])
+    await callback.message.edit_text(text, parse_mode="HTML")
+    await callback.answer()
+
+
+@router.callback_query(F.data == "bulk_dismiss")
+async def bulk_dismiss(callback: CallbackQuery, state: FSMContext):
+    await _pop_preview(state, callback.message.message_id)
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await callback.answer("Отменено")
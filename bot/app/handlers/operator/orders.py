@@ -1,36 +1,103 @@
 """Операторская часть: управление заказами."""
 
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
 
-from app.keyboards.operator import operator_menu_keyboard, order_actions_keyboard
+from app.keyboards.operator import (
+    operator_menu_keyboard,
+    order_actions_keyboard,
+    operator_feed_keyboard,
+)
 from app.keyboards.client import cancel_keyboard
 from app.services.api_client import api_client
 from app.states.order_states import RescheduleStates
-from app.utils.formatters import format_order_for_operator
+from app.utils.formatters import (
+    format_address,
+    format_order_for_operator,
+    format_operator_feed,
+)
 
 router = Router()
 
+FEED_PAGE_SIZE = 10
+
+# Сводка напоминаний от backend: одна клавиатура на несколько заказов
+DIGEST_PREFIX = "⏰ Ожидают подтверждения"
+
+
+async def _mark_in_digest(callback: CallbackQuery, order_id: int) -> bool:
+    """В сводке убрать кнопки обработанного заказа, не трогая остальные."""
+    message = callback.message
+    if not (message.text or "").startswith(DIGEST_PREFIX):
+        return False
+    suffix = f"_{order_id}"
+    rows = [
+        row
+        for row in message.reply_markup.inline_keyboard
+        if not any((b.callback_data or "").endswith(suffix) for b in row)
+    ]
+    await message.edit_reply_markup(
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=rows) if rows else None
+    )
+    return True
+
 
 @router.message(F.text == "📋 Новые заказы")
 async def list_new_orders(message: Message):
-    orders = await api_client.get_new_orders()
+    feed = await api_client.get_operator_feed(limit=FEED_PAGE_SIZE)
 
-    if not orders:
+    if not feed or not feed["items"]:
         await message.answer(
             "Нет новых заказов.",
             reply_markup=operator_menu_keyboard(),
         )
         return
 
-    for order in orders:
-        text = format_order_for_operator(order)
-        await message.answer(
-            text,
-            parse_mode="HTML",
-            reply_markup=order_actions_keyboard(order["id"]),
-        )
+    # Одна страница — одно сообщение, листание редактирует его
+    await message.answer(
+        format_operator_feed(feed["items"], feed["remaining"]),
+        parse_mode="HTML",
+        reply_markup=operator_feed_keyboard(feed["items"], feed["next_cursor"]),
+    )
+
+
+@router.callback_query(F.data.startswith("feed_next_") | (F.data == "feed_first"))
+async def feed_page(callback: CallbackQuery):
+    cursor = None
+    if callback.data.startswith("feed_next_"):
+        cursor = int(callback.data.replace("feed_next_", ""))
+
+    feed = await api_client.get_operator_feed(limit=FEED_PAGE_SIZE, cursor=cursor)
+    if not feed or not feed["items"]:
+        await callback.answer("Больше новых заказов нет")
+        return
+
+    await callback.message.edit_text(
+        format_operator_feed(feed["items"], feed["remaining"]),
+        parse_mode="HTML",
+        reply_markup=operator_feed_keyboard(
+            feed["items"], feed["next_cursor"], is_first_page=cursor is None
+        ),
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("op_open_"))
+async def open_order(callback: CallbackQuery):
+    order_id = int(callback.data.replace("op_open_", ""))
+    order = await api_client.get_order(order_id)
+
+    if not order:
+        await callback.answer("Заказ не найден", show_alert=True)
+        return
+
+    await callback.message.answer(
+        format_order_for_operator(order),
+        parse_mode="HTML",
+        reply_markup=order_actions_keyboard(order["id"]),
+    )
+    await callback.answer()
 
 
 # === Подтвердить ===
@@ -43,11 +110,12 @@ async def confirm_order(callback: CallbackQuery):
         await callback.answer(f"Ошибка: {result['error']}", show_alert=True)
         return
 
-    await callback.message.edit_text(
-        callback.message.text + "\n\n✅ <b>ПОДТВЕРЖДЁН</b>",
-        parse_mode="HTML",
-    )
-    await callback.answer("Заказ подтверждён!")
+    if not await _mark_in_digest(callback, order_id):
+        await callback.message.edit_text(
+            callback.message.text + "\n\n✅ <b>ПОДТВЕРЖДЁН</b>",
+            parse_mode="HTML",
+        )
+    await callback.answer(f"Заказ №{order_id} подтверждён!")
 
 
 # === Отменить ===
@@ -60,11 +128,12 @@ async def cancel_order(callback: CallbackQuery):
         await callback.answer(f"Ошибка: {result['error']}", show_alert=True)
         return
 
-    await callback.message.edit_text(
-        callback.message.text + "\n\n❌ <b>ОТМЕНЁН</b>",
-        parse_mode="HTML",
-    )
-    await callback.answer("Заказ отменён!")
+    if not await _mark_in_digest(callback, order_id):
+        await callback.message.edit_text(
+            callback.message.text + "\n\n❌ <b>ОТМЕНЁН</b>",
+            parse_mode="HTML",
+        )
+    await callback.answer(f"Заказ №{order_id} отменён!")
 
 
 # === Перенести дату ===
@@ -150,24 +219,30 @@ async def complete_order(callback: CallbackQuery):
 @router.callback_query(F.data.startswith("op_contact_"))
 async def contact_client(callback: CallbackQuery):
     order_id = int(callback.data.replace("op_contact_", ""))
-    order = await api_client.get_order(order_id)
+    context = await api_client.get_order_context(order_id, history_limit=5)
 
-    if not order:
+    if not context:
         await callback.answer("Заказ не найден", show_alert=True)
         return
 
-    user = await api_client.get_user(order.get("user_id", 0))
-    # Получаем историю клиента
-    history = await api_client.get_client_history(order["user_id"], limit=5)
-
+    user = context["client"]
+    stats = context["stats"]
     text = f"📞 <b>Информация о клиенте:</b>\n\n"
-    if user:
-        text += f"👤 {user.get('name', '—')}\n📱 {user.get('phone', '—')}\n\n"
+    text += f"👤 {user.get('name', '—')}\n📱 {user.get('phone') or '—'}\n"
+    if context.get("address"):
+        text += f"📍 {format_address(context['address'])}\n"
+    text += (
+        f"\n📊 Заказов: {stats['total_orders']} "
+        f"(выполнено {stats['completed_orders']}, отменено {stats['cancelled_orders']}), "
+        f"бутылей: {stats['total_bottles']}\n"
+    )
+    if stats.get("first_order_at"):
+        text += f"Клиент с {stats['first_order_at'][:10]}\n"
 
-    if history:
-        text += "<b>Последние заказы:</b>\n"
-        for h in history:
-            text += f"  №{h['id']} | {h.get('delivery_date', '—')} | {h['total_qty']} бут. | {h['status']}\n"
+    if context["recent_orders"]:
+        text += "\n<b>Последние заказы:</b>\n"
+        for h in context["recent_orders"]:
+            text += f"  №{h['id']} | {h.get('delivery_date') or '—'} | {h['total_qty']} бут. | {h['status']}\n"
 
     await callback.message.answer(text, parse_mode="HTML")
     await callback.answer()
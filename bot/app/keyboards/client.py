@@ -101,7 +101,9 @@ def districts_keyboard(districts: list) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def order_history_keyboard(orders: list, offset: int = 0) -> InlineKeyboardMarkup:
+def order_history_keyboard(
+    orders: list, next_cursor: int | None = None, is_first_page: bool = True
+) -> InlineKeyboardMarkup:
     buttons = []
     for o in orders:
         status_emoji = {
@@ -118,13 +120,13 @@ def order_history_keyboard(orders: list, offset: int = 0) -> InlineKeyboardMarku
         )
 
     nav = []
-    if offset > 0:
+    if not is_first_page:
         nav.append(
-            InlineKeyboardButton(text="⬅️ Назад", callback_data=f"history_offset_{offset - 20}")
+            InlineKeyboardButton(text="⏮ В начало", callback_data="history_first")
         )
-    if len(orders) == 20:
+    if next_cursor is not None:
         nav.append(
-            InlineKeyboardButton(text="➡️ Далее", callback_data=f"history_offset_{offset + 20}")
+            InlineKeyboardButton(text="➡️ Далее", callback_data=f"history_next_{next_cursor}")
         )
     if nav:
         buttons.append(nav)
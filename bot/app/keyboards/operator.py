@@ -14,6 +14,7 @@ def operator_menu_keyboard() -> ReplyKeyboardMarkup:
                 KeyboardButton(text="📊 Все заказы"),
             ],
             [
+                KeyboardButton(text="📦 На сегодня"),
                 KeyboardButton(text="⚙️ Управление районами"),
             ],
         ],
@@ -56,3 +57,68 @@ def order_actions_keyboard(order_id: int) -> InlineKeyboardMarkup:
             ],
         ]
     )
+
+
+def operator_feed_keyboard(
+    items: list, next_cursor: int | None = None, is_first_page: bool = True
+) -> InlineKeyboardMarkup:
+    buttons = []
+    row = []
+    for item in items:
+        row.append(
+            InlineKeyboardButton(
+                text=f"№{item['id']} · {item['total_qty']} бут.",
+                callback_data=f"op_open_{item['id']}",
+            )
+        )
+        if len(row) == 2:
+            buttons.append(row)
+            row = []
+    if row:
+        buttons.append(row)
+
+    nav = []
+    if not is_first_page:
+        nav.append(InlineKeyboardButton(text="⏮ В начало", callback_data="feed_first"))
+    if next_cursor is not None:
+        nav.append(
+            InlineKeyboardButton(text="➡️ Далее", callback_data=f"feed_next_{next_cursor}")
+        )
+    if nav:
+        buttons.append(nav)
+
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def bulk_today_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="✅ Подтвердить все", callback_data="bulk_preview_confirm"
+                ),
+            ],
+            [
+                InlineKeyboardButton(
+                    text="🚚 Все в доставку", callback_data="bulk_preview_deliver"
+                ),
+            ],
+            [
+                InlineKeyboardButton(
+                    text="✔️ Все выполнены", callback_data="bulk_preview_complete"
+                ),
+            ],
+        ]
+    )
+
+
+def bulk_confirm_keyboard() -> InlineKeyboardMarkup:
+    # Действие и id заказов — в данных FSM предпросмотра (handlers/operator/bulk.py)
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="Применить", callback_data="bulk_apply"),
+                InlineKeyboardButton(text="Отмена", callback_data="bulk_dismiss"),
+            ],
+        ]
+    )
@@ -2,16 +2,18 @@
 
 import asyncio
 import logging
+import signal
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.fsm.storage.redis import RedisEventIsolation, RedisStorage
+from aiohttp import web
 from redis.asyncio import Redis
 
 from app.config import get_bot_settings
 from app.middlewares.auth import AuthMiddleware
-from app.middlewares.throttling import ThrottlingMiddleware
+from app.middlewares.throttling import Limit, ThrottlingMiddleware
 from app.handlers.start import router as start_router
 from app.handlers.client.new_order import router as new_order_router
 from app.handlers.client.repeat_order import router as repeat_order_router
@@ -20,7 +22,11 @@ from app.handlers.client.addresses import router as addresses_router
 from app.handlers.client.history import router as history_router
 from app.handlers.operator.orders import router as operator_orders_router
 from app.handlers.operator.admin import router as admin_router
+from app.handlers.operator.bulk import router as bulk_router
 from app.services.api_client import api_client
+from app.services.update_queue import UpdateQueue, UpdateWorker
+from app.services.user_cache import user_cache
+from app.webhook import create_webhook_app
 
 logging.basicConfig(
     level=logging.INFO,
@@ -29,24 +35,34 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def main():
-    settings = get_bot_settings()
-
-    if not settings.BOT_TOKEN:
-        logger.error("BOT_TOKEN не указан! Укажите в .env")
-        return
-
-    bot = Bot(
-        token=settings.BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
-    )
-
-    redis_client = Redis.from_url(settings.redis_url)
+def build_dispatcher(redis_client: Redis, isolated: bool = False) -> Dispatcher:
+    """
+    Диспетчер со всеми роутерами. isolated — блокировка чата через Redis
+    (RedisEventIsolation) на случай, когда несколько процессов обрабатывают
+    апдейты одновременно.
+    """
     storage = RedisStorage(redis=redis_client)
-    dp = Dispatcher(storage=storage)
+    events_isolation = RedisEventIsolation(redis=redis_client) if isolated else None
+    dp = Dispatcher(storage=storage, events_isolation=events_isolation)
 
     # Middleware — throttling первым, потом auth
-    dp.message.middleware(ThrottlingMiddleware(rate_limit=0.5))
+    settings = get_bot_settings()
+    dp.message.middleware(
+        ThrottlingMiddleware(
+            redis_client,
+            "message",
+            Limit(settings.THROTTLE_MESSAGE_RATE, settings.THROTTLE_MESSAGE_BURST),
+            feedback=settings.THROTTLE_FEEDBACK,
+        )
+    )
+    dp.callback_query.middleware(
+        ThrottlingMiddleware(
+            redis_client,
+            "callback",
+            Limit(settings.THROTTLE_CALLBACK_RATE, settings.THROTTLE_CALLBACK_BURST),
+            feedback=settings.THROTTLE_FEEDBACK,
+        )
+    )
     dp.message.middleware(AuthMiddleware())
     dp.callback_query.middleware(AuthMiddleware())
 
@@ -58,13 +74,84 @@ async def main():
     dp.include_router(addresses_router)
     dp.include_router(history_router)
     dp.include_router(operator_orders_router)
+    dp.include_router(bulk_router)
     dp.include_router(admin_router)
+    return dp
+
+
+async def run_polling(bot: Bot, dp: Dispatcher) -> None:
+    # Апдейты, пришедшие во время перезапуска, не теряются
+    await bot.delete_webhook(drop_pending_updates=False)
+    await dp.start_polling(bot)
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, redis_client: Redis) -> None:
+    """Принимать апдейты и складывать в очередь; обрабатывают их воркеры."""
+    settings = get_bot_settings()
+    app = create_webhook_app(
+        UpdateQueue(redis_client), settings.WEBHOOK_SECRET, settings.WEBHOOK_PATH
+    )
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT).start()
+
+    await bot.set_webhook(
+        settings.WEBHOOK_URL.rstrip("/") + settings.WEBHOOK_PATH,
+        secret_token=settings.WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=False,
+    )
+    logger.info(f"Webhook слушает {settings.WEBHOOK_HOST}:{settings.WEBHOOK_PORT}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def run_worker(bot: Bot, dp: Dispatcher, redis_client: Redis) -> None:
+    """Обрабатывать апдейты из очереди Redis (процессов может быть несколько)."""
+
+    async def handle(update: dict):
+        await dp.feed_raw_update(bot, update)
+
+    worker = UpdateWorker(UpdateQueue(redis_client), handle)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    await worker.run()
+
+
+async def main():
+    settings = get_bot_settings()
+
+    if not settings.BOT_TOKEN:
+        logger.error("BOT_TOKEN не указан! Укажите в .env")
+        return
+    if settings.BOT_MODE not in ("polling", "webhook", "worker"):
+        logger.error(f"Неизвестный BOT_MODE={settings.BOT_MODE}: polling, webhook или worker")
+        return
+    if settings.BOT_MODE == "webhook" and not (settings.WEBHOOK_URL and settings.WEBHOOK_SECRET):
+        logger.error("Для BOT_MODE=webhook укажите WEBHOOK_URL и WEBHOOK_SECRET")
+        return
+
+    bot = Bot(
+        token=settings.BOT_TOKEN,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+
+    redis_client = Redis.from_url(settings.redis_url)
+    user_cache.set_redis(redis_client)
+    dp = build_dispatcher(redis_client, isolated=settings.BOT_MODE == "worker")
 
-    logger.info("Бот запускается...")
+    logger.info(f"Бот запускается в режиме {settings.BOT_MODE}...")
 
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
-        await dp.start_polling(bot)
+        if settings.BOT_MODE == "webhook":
+            await run_webhook(bot, dp, redis_client)
+        elif settings.BOT_MODE == "worker":
+            await run_worker(bot, dp, redis_client)
+        else:
+            await run_polling(bot, dp)
     finally:
         await api_client.close()
         await redis_client.aclose()
@@ -6,6 +6,7 @@ from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 
 from app.services.api_client import api_client
+from app.services.user_cache import user_cache
 
 
 class AuthMiddleware(BaseMiddleware):
@@ -16,6 +17,6 @@ class AuthMiddleware(BaseMiddleware):
         data: dict[str, Any],
     ) -> Any:
         telegram_id = event.from_user.id
-        user = await api_client.get_user(telegram_id)
+        user = await user_cache.get(telegram_id, api_client.get_user)
         data["db_user"] = user
         return await handler(event, data)
@@ -1,30 +1,108 @@
-"""Rate-limit middleware."""
+"""
+Rate-limit middleware: token bucket в Redis, общий для всех процессов бота.
 
+Для каждого пользователя и типа события (сообщения, нажатия кнопок) в
+Redis хранится хэш bot:throttle:{kind}:{user_id} с числом токенов и
+временем последнего пополнения; проверка и списание — один Lua-скрипт,
+время берётся из Redis, поэтому часы воркеров не важны. Ключ живёт,
+пока ведро не наполнится снова, и потом удаляется сам.
+
+Отклонённое событие не передаётся дальше; пользователь один раз за серию
+получает подсказку «слишком часто» (THROTTLE_FEEDBACK). Нажатие кнопки
+всегда получает ответ, иначе у пользователя крутятся «часики».
+При недоступности Redis события пропускаются без ограничения.
+"""
+
+import logging
+from dataclasses import dataclass
 from typing import Callable, Any, Awaitable
 
 from aiogram import BaseMiddleware
-from aiogram.types import Message
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "bot:throttle:"
+SLOW_DOWN_TEXT = "⏳ Слишком часто. Подождите пару секунд и повторите."
+
+ALLOWED, REJECTED, REJECTED_NOTIFY = 1, 0, 2
 
-import time
+# KEYS[1] — ведро; ARGV: скорость (токенов/с), ёмкость
+# Возвращает 1 — пропустить, 2 — отклонить и предупредить, 0 — отклонить молча
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'warned')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate / 1000)
+
+local result
+if tokens >= 1 then
+    tokens = tokens - 1
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now, 'warned', 0)
+    result = 1
+else
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now, 'warned', 1)
+    if state[3] == '1' then result = 0 else result = 2 end
+end
+-- Ключ живёт, пока ведро не наполнится: дальше его состояние равно начальному
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) * 1000 / rate) + 1000)
+return result
+"""
+
+
+@dataclass(frozen=True)
+class Limit:
+    rate: float  # токенов в секунду
+    burst: int  # ёмкость ведра
 
 
 class ThrottlingMiddleware(BaseMiddleware):
-    def __init__(self, rate_limit: float = 0.5):
-        self.rate_limit = rate_limit
-        self._cache: dict[int, float] = {}
+    def __init__(self, redis: Redis, kind: str, limit: Limit, feedback: bool = True):
+        self.redis = redis
+        self.kind = kind
+        self.limit = limit
+        self.feedback = feedback
+        self._script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def check(self, user_id: int) -> int:
+        try:
+            return int(
+                await self._script(
+                    keys=[f"{KEY_PREFIX}{self.kind}:{user_id}"],
+                    args=[self.limit.rate, self.limit.burst],
+                )
+            )
+        except RedisError as e:
+            metrics.inc("throttle.redis_error")
+            logger.warning(f"Throttling без Redis: {e}")
+            return ALLOWED
 
     async def __call__(
         self,
-        handler: Callable[[Message, dict[str, Any]], Awaitable[Any]],
-        event: Message,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: Message | CallbackQuery,
         data: dict[str, Any],
     ) -> Any:
-        user_id = event.from_user.id
-        now = time.time()
-        last = self._cache.get(user_id, 0)
+        if event.from_user is None:
+            return await handler(event, data)
 
-        if now - last < self.rate_limit:
-            return  # Игнорируем слишком частые сообщения
+        result = await self.check(event.from_user.id)
+        if result == ALLOWED:
+            return await handler(event, data)
 
-        self._cache[user_id] = now
-        return await handler(event, data)
+        metrics.inc(f"throttle.{self.kind}.rejected")
+        notify = self.feedback and result == REJECTED_NOTIFY
+        if isinstance(event, CallbackQuery):
+            await event.answer(SLOW_DOWN_TEXT if notify else None)
+        elif notify:
+            await event.answer(SLOW_DOWN_TEXT)
+        return None
@@ -1,25 +1,70 @@
 """HTTP-клиент для взаимодействия с backend API."""
 
+import asyncio
+import copy
 import logging
+import random
+import re
+import time
 from typing import Any
 
 import aiohttp
 
 from app.config import get_bot_settings
+from app.services.user_cache import user_cache
+from app.utils import metrics
 
 logger = logging.getLogger(__name__)
 settings = get_bot_settings()
 
 BASE_URL = f"{settings.BACKEND_URL}/api/v1"
 
+# Повторяем только запросы, которые безопасно выполнить дважды
+IDEMPOTENT_METHODS = {"GET", "HEAD", "DELETE"}
+RETRY_STATUSES = {502, 503, 504}
+ID_SEGMENT = re.compile(r"/\d+")
+
+
+def _endpoint_name(method: str, path: str) -> str:
+    """Имя эндпоинта для метрик: числовые сегменты пути заменяются на {id}."""
+    return f"{method} {ID_SEGMENT.sub('/{id}', path)}"
+
+
+def _freeze(params: dict | None) -> tuple:
+    return tuple(sorted((params or {}).items()))
+
 
 class ApiClient:
+    """
+    Клиент backend API с пулом соединений.
+
+    - keep-alive пул TCPConnector с кэшем DNS (API_POOL_*);
+    - таймаут на запрос (API_TIMEOUT, можно переопределить в вызове);
+    - повторы с экспоненциальной задержкой и джиттером для идемпотентных
+      запросов при сетевых ошибках и 502/503/504;
+    - одинаковые параллельные GET объединяются в один запрос;
+    - гистограммы задержек по эндпоинтам в app.utils.metrics.
+    """
+
     def __init__(self):
         self._session: aiohttp.ClientSession | None = None
+        self._inflight: dict[tuple, asyncio.Future] = {}
 
     async def get_session(self) -> aiohttp.ClientSession:
         if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession()
+            connector = aiohttp.TCPConnector(
+                limit=settings.API_POOL_LIMIT,
+                limit_per_host=settings.API_POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=settings.API_DNS_CACHE_TTL,
+                keepalive_timeout=settings.API_KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=settings.API_TIMEOUT,
+                    connect=settings.API_CONNECT_TIMEOUT,
+                ),
+            )
         return self._session
 
     async def close(self):
@@ -27,22 +72,77 @@ class ApiClient:
             await self._session.close()
 
     async def _request(
-        self, method: str, path: str, **kwargs
+        self, method: str, path: str, timeout: float | None = None, **kwargs
+    ) -> dict | list | None:
+        if method != "GET":
+            return await self._send(method, path, timeout, **kwargs)
+
+        # Single-flight: повторный такой же GET ждёт уже идущий запрос
+        key = (path, _freeze(kwargs.get("params")))
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            metrics.inc("api.coalesced")
+            try:
+                return copy.deepcopy(await asyncio.shield(inflight))
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                return await self._send(method, path, timeout, **kwargs)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._send(method, path, timeout, **kwargs)
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.cancel()
+
+    async def _send(
+        self, method: str, path: str, timeout: float | None = None, **kwargs
     ) -> dict | list | None:
         session = await self.get_session()
         url = f"{BASE_URL}{path}"
-        try:
-            async with session.request(method, url, **kwargs) as resp:
-                if resp.status == 204:
-                    return None
-                data = await resp.json()
-                if resp.status >= 400:
-                    logger.error(f"API error {resp.status}: {data}")
-                    return {"error": data.get("detail", "Ошибка сервера")}
-                return data
-        except Exception as e:
-            logger.error(f"API request failed: {e}")
-            return {"error": str(e)}
+        endpoint = _endpoint_name(method, path)
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        attempts = 1 + (settings.API_RETRIES if method in IDEMPOTENT_METHODS else 0)
+
+        for attempt in range(attempts):
+            last_attempt = attempt + 1 == attempts
+            started = time.perf_counter()
+            try:
+                async with session.request(method, url, **kwargs) as resp:
+                    if resp.status in RETRY_STATUSES and not last_attempt:
+                        error = f"HTTP {resp.status}"
+                    elif resp.status == 204:
+                        return None
+                    else:
+                        data = await resp.json()
+                        if resp.status >= 400:
+                            logger.error(f"API error {resp.status}: {data}")
+                            return {"error": data.get("detail", "Ошибка сервера")}
+                        return data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+                if last_attempt:
+                    logger.error(f"API request failed: {error}")
+                    return {"error": error}
+            except Exception as e:
+                logger.error(f"API request failed: {e}")
+                return {"error": str(e)}
+            finally:
+                metrics.observe(endpoint, time.perf_counter() - started)
+
+            metrics.inc("api.retries")
+            delay = random.uniform(0, settings.API_RETRY_BACKOFF * 2 ** attempt)
+            logger.warning(
+                f"{endpoint}: {error}, повтор {attempt + 1}/{attempts - 1} "
+                f"через {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
 
     # === Пользователи ===
     async def get_user(self, telegram_id: int) -> dict | None:
@@ -52,16 +152,26 @@ class ApiClient:
         return result
 
     async def register_user(self, telegram_id: int, name: str, phone: str) -> dict:
-        return await self._request(
+        result = await self._request(
             "POST",
             "/users/",
             json={"telegram_id": telegram_id, "name": name, "phone": phone},
         )
+        await self._refresh_cached_user(telegram_id, result)
+        return result
 
     async def update_user(self, telegram_id: int, **kwargs) -> dict:
-        return await self._request(
+        result = await self._request(
             "PATCH", f"/users/tg/{telegram_id}", json=kwargs
         )
+        await self._refresh_cached_user(telegram_id, result)
+        return result
+
+    async def _refresh_cached_user(self, telegram_id: int, result) -> None:
+        if isinstance(result, dict) and "error" not in result:
+            await user_cache.set(telegram_id, result)
+        else:
+            await user_cache.invalidate(telegram_id)
 
     # === Адреса ===
     async def get_addresses(self, telegram_id: int) -> list:
@@ -98,12 +208,18 @@ class ApiClient:
         )
 
     async def get_orders(
-        self, telegram_id: int, limit: int = 20, offset: int = 0
+        self,
+        telegram_id: int,
+        limit: int = 20,
+        cursor: int | None = None,
+        with_total: bool = True,
     ) -> dict:
+        """Страница истории; cursor — next_cursor из предыдущего ответа."""
+        params = {"limit": limit, "with_total": str(with_total).lower()}
+        if cursor is not None:
+            params["cursor"] = cursor
         return await self._request(
-            "GET",
-            f"/orders/user/{telegram_id}",
-            params={"limit": limit, "offset": offset},
+            "GET", f"/orders/user/{telegram_id}", params=params
         )
 
     async def get_active_order(self, telegram_id: int) -> dict | None:
@@ -136,6 +252,18 @@ class ApiClient:
             return []
         return result or []
 
+    async def get_operator_feed(
+        self, limit: int = 10, cursor: int | None = None
+    ) -> dict | None:
+        """Страница ленты новых заказов; cursor — next_cursor из предыдущего ответа."""
+        params = {"limit": limit}
+        if cursor is not None:
+            params["cursor"] = cursor
+        result = await self._request("GET", "/operator/orders/feed", params=params)
+        if not result or "error" in result:
+            return None
+        return result
+
     async def confirm_order(self, order_id: int, operator_tg_id: int) -> dict:
         return await self._request(
             "POST",
@@ -173,13 +301,32 @@ class ApiClient:
             "POST", f"/operator/orders/{order_id}/deliver"
         )
 
+    async def bulk_action(self, action: str, operator_tg_id: int, **payload) -> dict:
+        """Массовое действие: order_ids или delivery_date (+district), dry_run — предпросмотр."""
+        return await self._request(
+            "POST",
+            f"/operator/orders/bulk/{action}",
+            json={"operator_telegram_id": operator_tg_id, **payload},
+        )
+
+    async def get_order_context(self, order_id: int, history_limit: int = 5) -> dict | None:
+        """Заказ, клиент, последние заказы и итоги по клиенту одним запросом."""
+        result = await self._request(
+            "GET",
+            f"/operator/orders/{order_id}/context",
+            params={"history_limit": history_limit},
+        )
+        if not result or "error" in result:
+            return None
+        return result
+
     async def get_client_history(self, user_id: int, limit: int = 5) -> list:
         result = await self._request(
             "GET", f"/operator/client/{user_id}/history", params={"limit": limit}
         )
-        if isinstance(result, dict) and "error" in result:
+        if not result or "error" in result:
             return []
-        return result or []
+        return result.get("orders", [])
 
     # === Районы ===
     async def get_districts(self) -> list:
@@ -0,0 +1,379 @@
+"""
+Очередь апдейтов Telegram в Redis для режима webhook.
+
+Webhook-процесс только проверяет секрет и кладёт апдейт в Redis Stream
+bot:updates:{p}, где p = chat_id % UPDATE_QUEUE_PARTITIONS: все апдейты
+одного чата попадают в одну партицию в порядке поступления. Повторная
+доставка того же update_id (Telegram повторяет запрос без ответа 200)
+отбрасывается там же, одним Lua-скриптом.
+
+Воркеры (BOT_MODE=worker) делят партиции между собой через аренду
+bot:updates:lease:{p}: партицию читает только её владелец, каждому живому
+воркеру достаётся поровну. Аренда продлевается отдельной задачей; апдейт
+обрабатывается и подтверждается (XACK) только пока она точно не истекла.
+Внутри воркера апдейты разных чатов обрабатываются параллельно, а одного
+чата — по очереди (asyncio.Lock на чат); в работе не больше
+UPDATE_WORKER_CONCURRENCY апдейтов, остальные ждут в потоке.
+Неподтверждённые апдейты упавшего воркера новый владелец забирает, когда
+они простоят дольше аренды, и только потом читает новые. Состояние FSM
+общее через RedisStorage.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import socket
+import time
+from typing import Any, Awaitable, Callable
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from app.config import get_bot_settings
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+settings = get_bot_settings()
+
+STREAM_KEY = "bot:updates:{}"
+LEASE_KEY = "bot:updates:lease:{}"
+SEEN_KEY = "bot:updates:seen:{}"
+WORKERS_KEY = "bot:updates:workers"
+GROUP = "bot-workers"
+
+# Telegram повторяет неподтверждённый апдейт в течение нескольких минут
+SEEN_TTL = 600
+LEASE_TTL_MS = 15000
+# Запас на задержку ответа Redis: аренду считаем потерянной чуть раньше
+LEASE_MARGIN = 2.0
+RENEW_INTERVAL = LEASE_TTL_MS / 3000
+REBALANCE_INTERVAL = 5.0
+READ_COUNT = 100
+READ_BLOCK_MS = 1000
+
+# Поля апдейта, в которых есть чат или отправитель
+_CHAT_FIELDS = (
+    "message",
+    "edited_message",
+    "channel_post",
+    "edited_channel_post",
+    "business_message",
+    "callback_query",
+    "my_chat_member",
+    "chat_member",
+    "chat_join_request",
+    "inline_query",
+    "pre_checkout_query",
+    "shipping_query",
+)
+
+# KEYS: seen, stream; ARGV: апдейт, ttl метки, maxlen потока
+PUSH_SCRIPT = """
+if redis.call('SET', KEYS[1], 1, 'NX', 'EX', ARGV[2]) then
+    return redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', 'u', ARGV[1])
+end
+return false
+"""
+
+# KEYS: lease; ARGV: воркер, ttl — занять свободную или продлить свою аренду
+ACQUIRE_SCRIPT = """
+local owner = redis.call('GET', KEYS[1])
+if owner == false or owner == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def chat_key(update: dict) -> int:
+    """Чат (или пользователь), к которому относится апдейт; 0 — не определён."""
+    for field in _CHAT_FIELDS:
+        event = update.get(field)
+        if not event:
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return int(chat["id"])
+        if event.get("from"):
+            return int(event["from"]["id"])
+    return 0
+
+
+def partition_of(chat_id: int, partitions: int) -> int:
+    return abs(chat_id) % partitions
+
+
+class UpdateQueue:
+    def __init__(
+        self,
+        redis: Redis,
+        partitions: int = settings.UPDATE_QUEUE_PARTITIONS,
+        maxlen: int = settings.UPDATE_QUEUE_MAXLEN,
+    ):
+        self.redis = redis
+        self.partitions = partitions
+        self.maxlen = maxlen
+        self._push = redis.register_script(PUSH_SCRIPT)
+
+    async def push(self, update: dict) -> bool:
+        """Поставить апдейт в очередь; False — такой update_id уже был."""
+        partition = partition_of(chat_key(update), self.partitions)
+        added = await self._push(
+            keys=[SEEN_KEY.format(update["update_id"]), STREAM_KEY.format(partition)],
+            args=[json.dumps(update, ensure_ascii=False), SEEN_TTL, self.maxlen],
+        )
+        metrics.inc("updates.queued" if added else "updates.duplicate")
+        return bool(added)
+
+    async def lag(self) -> int:
+        """Сколько апдейтов ещё не обработано (в очереди и в работе)."""
+        total = 0
+        for partition in range(self.partitions):
+            try:
+                groups = await self.redis.xinfo_groups(STREAM_KEY.format(partition))
+            except ResponseError:
+                continue  # поток ещё не создан
+            for group in groups:
+                if group["name"] in (GROUP, GROUP.encode()):
+                    total += (group.get("lag") or 0) + group["pending"]
+        return total
+
+
+class UpdateWorker:
+    """Читает свои партиции и передаёт апдейты в обработчик по порядку внутри чата."""
+
+    def __init__(
+        self,
+        queue: UpdateQueue,
+        handler: Callable[[dict], Awaitable[Any]],
+        concurrency: int = settings.UPDATE_WORKER_CONCURRENCY,
+        name: str | None = None,
+    ):
+        self.queue = queue
+        self.redis = queue.redis
+        self.handler = handler
+        self.concurrency = concurrency
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        # Партиции, которые читаются; аренда есть и у принимаемых/отдаваемых
+        self.owned: set[int] = set()
+        # партиция -> срок, до которого аренда точно наша (time.monotonic)
+        self._leases: dict[int, float] = {}
+        # чат -> [Lock, число апдейтов чата в работе]
+        self._chat_locks: dict[int, list] = {}
+        self._in_flight: dict[int, set[asyncio.Task]] = {}
+        self._entries: set[tuple[int, str]] = set()
+        self._room = asyncio.Event()
+        self._room.set()
+        self._acquire = self.redis.register_script(ACQUIRE_SCRIPT)
+        self._release = self.redis.register_script(RELEASE_SCRIPT)
+        self._stopping = False
+
+    @property
+    def busy(self) -> int:
+        return len(self._entries)
+
+    def holds(self, partition: int) -> bool:
+        """Аренда партиции у этого воркера и не могла истечь."""
+        return time.monotonic() < self._leases.get(partition, 0)
+
+    async def _ensure_group(self, partition: int) -> None:
+        try:
+            await self.redis.xgroup_create(
+                STREAM_KEY.format(partition), GROUP, id="0", mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _lease(self, partition: int) -> bool:
+        """Занять или продлить аренду; срок считается от момента запроса."""
+        started = time.monotonic()
+        if await self._acquire(
+            keys=[LEASE_KEY.format(partition)], args=[self.name, LEASE_TTL_MS]
+        ):
+            self._leases[partition] = started + LEASE_TTL_MS / 1000 - LEASE_MARGIN
+            return True
+        return False
+
+    async def renew(self) -> None:
+        """Продлить аренды и отметиться среди живых воркеров."""
+        await self.redis.zadd(WORKERS_KEY, {self.name: time.time()})
+        for partition in sorted(self._leases):
+            if not await self._lease(partition):
+                logger.warning(f"Аренда партиции {partition} потеряна")
+                self.owned.discard(partition)
+                self._leases.pop(partition, None)
+
+    async def _live_workers(self) -> int:
+        now = time.time()
+        await self.redis.zremrangebyscore(WORKERS_KEY, 0, now - LEASE_TTL_MS / 1000)
+        return max(await self.redis.zcard(WORKERS_KEY), 1)
+
+    async def rebalance(self) -> None:
+        """Занять свободные партиции до своей доли, лишние отдать, забрать зависшее."""
+        share = math.ceil(self.queue.partitions / await self._live_workers())
+
+        # Начинаем с разных партиций, чтобы воркеры не спорили за одни и те же
+        offset = hash(self.name) % self.queue.partitions
+        for i in range(self.queue.partitions):
+            if len(self._leases) >= share:
+                break
+            partition = (offset + i) % self.queue.partitions
+            if partition not in self._leases and await self._lease(partition):
+                await self._ensure_group(partition)
+
+        while len(self._leases) > share:
+            await self._give_up(max(self._leases))
+
+        for partition in sorted(self._leases):
+            await self._claim_pending(partition)
+            if partition not in self.owned and await self._ready(partition):
+                self.owned.add(partition)
+
+    async def _ready(self, partition: int) -> bool:
+        """
+        Новые апдейты партиции читаем только после недообработанных прежним
+        владельцем, иначе нарушится порядок внутри чата.
+        """
+        summary = await self.redis.xpending(STREAM_KEY.format(partition), GROUP)
+        # Свои записи в работе не мешают; прочие ждут _claim_pending
+        mine = sum(1 for p, _ in self._entries if p == partition)
+        return summary["pending"] <= mine
+
+    async def _give_up(self, partition: int) -> None:
+        # Аренда продлевается, пока начатое по партиции не завершится
+        self.owned.discard(partition)
+        tasks = self._in_flight.pop(partition, set())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._leases.pop(partition, None)
+        await self._release(keys=[LEASE_KEY.format(partition)], args=[self.name])
+
+    async def _claim_pending(self, partition: int) -> None:
+        """
+        Забрать апдейты партиции, зависшие у прежнего владельца. Берутся
+        только записи без движения дольше аренды: их владелец её уже потерял
+        и не начнёт обрабатывать (см. holds).
+        """
+        start = "0-0"
+        while self.busy < self.concurrency and self.holds(partition):
+            start, entries, *_ = await self.redis.xautoclaim(
+                STREAM_KEY.format(partition), GROUP, self.name,
+                min_idle_time=LEASE_TTL_MS, start_id=start,
+                count=min(READ_COUNT, self.concurrency - self.busy),
+            )
+            for entry_id, fields in entries:
+                if fields:
+                    self._spawn(partition, entry_id, fields)
+            if start in (b"0-0", "0-0"):
+                return
+
+    async def _read_owned(self) -> None:
+        if not self.owned:
+            await asyncio.sleep(READ_BLOCK_MS / 1000)
+            return
+        # Не читаем больше, чем можем обработать: непрочитанное остаётся в потоке
+        try:
+            await asyncio.wait_for(self._room.wait(), READ_BLOCK_MS / 1000)
+        except asyncio.TimeoutError:
+            return
+        response = await self.redis.xreadgroup(
+            GROUP,
+            self.name,
+            {STREAM_KEY.format(p): ">" for p in sorted(self.owned)},
+            count=min(READ_COUNT, self.concurrency - self.busy),
+            block=READ_BLOCK_MS,
+        )
+        for stream, entries in response or []:
+            stream = stream.decode() if isinstance(stream, bytes) else stream
+            partition = int(stream.rsplit(":", 1)[1])
+            if partition not in self.owned:
+                continue  # партицию отдали во время чтения — заберёт новый владелец
+            for entry_id, fields in entries:
+                self._spawn(partition, entry_id, fields)
+
+    def _spawn(self, partition: int, entry_id, fields: dict) -> None:
+        entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+        if (partition, entry_id) in self._entries:
+            return  # уже в работе у этого воркера
+        self._entries.add((partition, entry_id))
+        if self.busy >= self.concurrency:
+            self._room.clear()
+
+        update = json.loads(fields.get(b"u") or fields.get("u"))
+        chat_id = chat_key(update)
+        entry = self._chat_locks.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        task = asyncio.create_task(self._process(partition, entry_id, update, chat_id, entry[0]))
+        tasks = self._in_flight.setdefault(partition, set())
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def _process(self, partition, entry_id, update, chat_id, lock) -> None:
+        # Задачи создаются в порядке потока, а Lock пропускает ожидающих по очереди
+        try:
+            async with lock:
+                if not self.holds(partition):
+                    # Аренда ушла, пока апдейт ждал очереди: его заберёт новый владелец
+                    metrics.inc("updates.lease_lost")
+                    return
+                started = time.monotonic()
+                try:
+                    await self.handler(update)
+                    metrics.inc("updates.processed")
+                except Exception:
+                    metrics.inc("updates.failed")
+                    logger.exception(f"Ошибка обработки апдейта {update.get('update_id')}")
+                finally:
+                    metrics.observe("updates.handle", time.monotonic() - started)
+                if self.holds(partition):
+                    await self.redis.xack(STREAM_KEY.format(partition), GROUP, entry_id)
+                else:
+                    metrics.inc("updates.lease_lost")
+        finally:
+            entry = self._chat_locks[chat_id]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chat_locks[chat_id]
+            self._entries.discard((partition, entry_id))
+            self._room.set()
+
+    async def _every(self, interval: float, step: Callable[[], Awaitable[None]]) -> None:
+        while not self._stopping:
+            try:
+                await step()
+            except Exception:
+                logger.exception(f"Воркер апдейтов {self.name}: ошибка {step.__name__}")
+            await asyncio.sleep(interval)
+
+    async def run(self) -> None:
+        logger.info(f"Воркер апдейтов {self.name} запущен")
+        # Продление аренды не ждёт ни чтения, ни отдачи партиций
+        background = [
+            asyncio.create_task(self._every(RENEW_INTERVAL, self.renew)),
+            asyncio.create_task(self._every(REBALANCE_INTERVAL, self.rebalance)),
+        ]
+        try:
+            while not self._stopping:
+                await self._read_owned()
+        finally:
+            background[1].cancel()
+            await asyncio.gather(background[1], return_exceptions=True)
+            for partition in list(self._leases):
+                await self._give_up(partition)
+            background[0].cancel()
+            await asyncio.gather(background[0], return_exceptions=True)
+            await self.redis.zrem(WORKERS_KEY, self.name)
+
+    def stop(self) -> None:
+        self._stopping = True
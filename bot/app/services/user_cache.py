@@ -0,0 +1,106 @@
+"""
+Кэш профилей пользователей для AuthMiddleware.
+
+Первый уровень — LRU в памяти процесса с коротким TTL, второй — Redis,
+общий для всех процессов бота. Регистрация и изменение профиля через бота
+обновляют обе записи. Незарегистрированные пользователи не кэшируются:
+иначе только что зарегистрированный клиент мог бы получить устаревший отказ.
+"""
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from redis.asyncio import Redis
+
+from app.config import get_bot_settings
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+settings = get_bot_settings()
+
+KEY_PREFIX = "bot:user:"
+
+
+class UserCache:
+    def __init__(
+        self,
+        maxsize: int = settings.USER_CACHE_SIZE,
+        local_ttl: float = settings.USER_CACHE_LOCAL_TTL,
+        redis_ttl: int = settings.USER_CACHE_REDIS_TTL,
+    ):
+        self.maxsize = maxsize
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self._local: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+        self._redis: Redis | None = None
+
+    def set_redis(self, redis: Redis | None) -> None:
+        self._redis = redis
+
+    async def get(
+        self, telegram_id: int, loader: Callable[[int], Awaitable[dict | None]]
+    ) -> dict | None:
+        """Профиль из кэша или через loader (запрос к backend)."""
+        entry = self._local.get(telegram_id)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > time.monotonic():
+                self._local.move_to_end(telegram_id)
+                metrics.inc("user_cache.local_hit")
+                return user
+            del self._local[telegram_id]
+
+        user = await self._redis_get(telegram_id)
+        if user is not None:
+            metrics.inc("user_cache.redis_hit")
+            self._put_local(telegram_id, user)
+            return user
+
+        metrics.inc("user_cache.miss")
+        user = await loader(telegram_id)
+        if user is not None:
+            await self.set(telegram_id, user)
+        return user
+
+    async def set(self, telegram_id: int, user: dict) -> None:
+        self._put_local(telegram_id, user)
+        if self._redis is None:
+            return
+        try:
+            await self._redis.set(
+                f"{KEY_PREFIX}{telegram_id}", json.dumps(user), ex=self.redis_ttl
+            )
+        except Exception as e:
+            logger.warning(f"Не удалось записать профиль в Redis: {e}")
+
+    async def invalidate(self, telegram_id: int) -> None:
+        self._local.pop(telegram_id, None)
+        metrics.inc("user_cache.invalidate")
+        if self._redis is None:
+            return
+        try:
+            await self._redis.delete(f"{KEY_PREFIX}{telegram_id}")
+        except Exception as e:
+            logger.warning(f"Не удалось удалить профиль из Redis: {e}")
+
+    def _put_local(self, telegram_id: int, user: dict) -> None:
+        self._local[telegram_id] = (time.monotonic() + self.local_ttl, user)
+        self._local.move_to_end(telegram_id)
+        while len(self._local) > self.maxsize:
+            self._local.popitem(last=False)
+
+    async def _redis_get(self, telegram_id: int) -> dict | None:
+        if self._redis is None:
+            return None
+        try:
+            raw = await self._redis.get(f"{KEY_PREFIX}{telegram_id}")
+        except Exception as e:
+            logger.warning(f"Redis недоступен для кэша профилей: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+
+user_cache = UserCache()
@@ -60,6 +60,21 @@ def format_order_for_operator(order: dict, user: dict = None) -> str:
     return "\n".join(lines)
 
 
+def format_operator_feed(items: list, remaining: int) -> str:
+    """Страница ленты новых заказов: по строке на заказ."""
+    lines = [f"📋 <b>Новые заказы</b> (осталось: {remaining})", ""]
+    for item in items:
+        lines.append(
+            f"<b>№{item['id']}</b> · {item['client_name']} · "
+            f"{item.get('district') or 'без адреса'}\n"
+            f"   💧 {item['jv_qty']}/{item['lv_qty']} ({item['total_qty']} бут.) · "
+            f"📅 {item.get('delivery_date') or '—'} · 🕐 {item['created_at'][11:16]}"
+        )
+    lines.append("")
+    lines.append("Нажмите на номер заказа, чтобы открыть действия.")
+    return "\n".join(lines)
+
+
 def format_address(address: dict) -> str:
     """Форматирование адреса."""
     default = "⭐ " if address.get("is_default") else ""
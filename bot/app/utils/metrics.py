@@ -0,0 +1,65 @@
+"""Простые метрики процесса бота (смотреть командой /stats)."""
+
+import bisect
+from collections import defaultdict
+
+# Границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_counters: dict[str, int] = defaultdict(int)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя — «больше максимума»
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Верхняя граница корзины, в которую попадает квантиль q."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+_histograms: dict[str, Histogram] = defaultdict(Histogram)
+
+
+def inc(name: str, value: int = 1) -> None:
+    _counters[name] += value
+
+
+def get(name: str) -> int:
+    return _counters.get(name, 0)
+
+
+def observe(name: str, value: float) -> None:
+    _histograms[name].observe(value)
+
+
+def histogram(name: str) -> Histogram | None:
+    return _histograms.get(name)
+
+
+def render() -> str:
+    """Текстовый отчёт по всем метрикам."""
+    lines = [f"{name}: {value}" for name, value in sorted(_counters.items())]
+    for name, h in sorted(_histograms.items()):
+        avg_ms = h.sum / h.count * 1000 if h.count else 0
+        lines.append(
+            f"{name}: n={h.count} avg={avg_ms:.0f}ms "
+            f"p50≤{h.quantile(0.5) * 1000:.0f}ms p95≤{h.quantile(0.95) * 1000:.0f}ms"
+        )
+    return "\n".join(lines) or "Метрик пока нет"
@@ -0,0 +1,43 @@
+"""Приём апдейтов Telegram по webhook: проверка секрета и постановка в очередь."""
+
+import hmac
+import logging
+
+from aiohttp import web
+from redis.exceptions import RedisError
+
+from app.services.update_queue import UpdateQueue
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def create_webhook_app(queue: UpdateQueue, secret: str, path: str) -> web.Application:
+    async def receive(request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token.encode(), secret.encode()):
+            metrics.inc("webhook.unauthorized")
+            return web.Response(status=401)
+        try:
+            update = await request.json()
+            int(update["update_id"])
+        except (ValueError, KeyError, TypeError):
+            metrics.inc("webhook.bad_request")
+            return web.Response(status=400)
+        try:
+            await queue.push(update)
+        except RedisError as e:
+            # Не 200 — Telegram повторит доставку позже
+            logger.error(f"Очередь апдейтов недоступна: {e}")
+            return web.Response(status=503)
+        return web.Response()
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    app = web.Application()
+    app.router.add_post(path, receive)
+    app.router.add_get("/health", health)
+    return app
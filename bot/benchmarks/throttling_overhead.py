@@ -0,0 +1,123 @@
+"""
+Бенчмарк: накладные расходы ThrottlingMiddleware на один апдейт.
+
+Запуск из каталога bot (нужен Redis):
+    python -m benchmarks.throttling_overhead --updates 20000 --users 5000
+
+Сравнивает прохождение апдейта через пустой обработчик без middleware,
+с прежним словарём в памяти процесса и с token bucket в Redis — по
+очереди и с --concurrency одновременными апдейтами. Для Redis печатает
+также число ключей bot:throttle:* сразу после прогона: они истекают
+сами, как только ведро пользователя наполняется.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+from redis.asyncio import Redis
+
+from app.config import get_bot_settings
+from app.middlewares.throttling import KEY_PREFIX, Limit, ThrottlingMiddleware
+
+
+class DictThrottle:
+    """Прежняя реализация: время последнего сообщения в словаре без вытеснения."""
+
+    def __init__(self, rate_limit: float = 0.5):
+        self.rate_limit = rate_limit
+        self._cache: dict[int, float] = {}
+
+    async def __call__(self, handler, event, data):
+        now = time.time()
+        if now - self._cache.get(event.from_user.id, 0) < self.rate_limit:
+            return None
+        self._cache[event.from_user.id] = now
+        return await handler(event, data)
+
+
+async def _handler(event, data):
+    return True
+
+
+async def _answer(*args, **kwargs):
+    return None
+
+
+def _events(updates: int, users: int) -> list:
+    return [
+        SimpleNamespace(from_user=SimpleNamespace(id=random.randint(1, users)), answer=_answer)
+        for _ in range(updates)
+    ]
+
+
+async def _measure(middleware, events, concurrency: int) -> list[float]:
+    timings: list[float] = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(event):
+        async with slots:
+            started = time.perf_counter()
+            if middleware is None:
+                await _handler(event, {})
+            else:
+                await middleware(_handler, event, {})
+            timings.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(e) for e in events))
+    return timings
+
+
+def _report(name: str, timings: list[float], wall: float) -> None:
+    q = statistics.quantiles(timings, n=100)
+    print(
+        f"{name:>22}: avg={statistics.mean(timings) * 1e6:7.1f}µs "
+        f"p50={q[49] * 1e6:7.1f}µs p99={q[98] * 1e6:7.1f}µs "
+        f"throughput={len(timings) / wall:,.0f}/s"
+    )
+
+
+async def main():
+    settings = get_bot_settings()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis", default=settings.redis_url)
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    redis = Redis.from_url(args.redis)
+    throttle = ThrottlingMiddleware(
+        redis,
+        "bench",
+        Limit(settings.THROTTLE_MESSAGE_RATE, settings.THROTTLE_MESSAGE_BURST),
+    )
+    events = _events(args.updates, args.users)
+    variants = [
+        ("без middleware", None),
+        ("словарь в памяти", DictThrottle()),
+        ("redis token bucket", throttle),
+    ]
+
+    try:
+        await throttle.check(0)  # загрузить скрипт в Redis
+        for concurrency in (1, args.concurrency):
+            print(f"одновременно апдейтов: {concurrency}")
+            for name, middleware in variants:
+                started = time.perf_counter()
+                timings = await _measure(middleware, events, concurrency)
+                _report(name, timings, time.perf_counter() - started)
+
+        keys = [k async for k in redis.scan_iter(f"{KEY_PREFIX}bench:*", count=1000)]
+        print(f"ключей {KEY_PREFIX}bench:* после прогона: {len(keys)} (истекают сами)")
+        if keys:
+            await redis.delete(*keys)
+    finally:
+        await redis.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,180 @@
+"""
+Нагрузочный тест webhook: синтетические апдейты с постоянной частотой.
+
+Запуск из каталога bot (нужен Redis):
+    python -m benchmarks.webhook_load --rate 1000 --duration 10
+    python -m benchmarks.webhook_load --url https://bot.example.com/telegram/webhook \\
+        --secret ... --external
+
+По умолчанию webhook и --workers воркеров поднимаются в этом процессе, а
+обработчик апдейта только ждёт --handle-ms (вместо aiogram и backend) и
+проверяет, что апдейты каждого чата приходят по порядку. С --external
+апдейты отправляются на уже запущенный webhook, а разбор очереди
+отслеживается по Redis.
+
+Печатает фактическую частоту, задержку ответа webhook (p50/p95/p99),
+коды ответов и время, за которое воркеры разобрали очередь.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+import aiohttp
+from aiohttp import web
+from redis.asyncio import Redis
+
+from app.config import get_bot_settings
+from app.services.update_queue import (
+    REBALANCE_INTERVAL,
+    STREAM_KEY,
+    UpdateQueue,
+    UpdateWorker,
+    chat_key,
+)
+from app.webhook import SECRET_HEADER, create_webhook_app
+
+PATH = "/telegram/webhook"
+
+
+def synthetic_update(update_id: int, chat_id: int, seq: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": seq,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Нагрузка"},
+            "text": f"сообщение {seq}",
+        },
+    }
+
+
+class OrderCheck:
+    """Обработчик-заглушка: задержка и проверка порядка внутри чата."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.last: dict[int, int] = {}
+        self.handled = 0
+        self.out_of_order = 0
+
+    async def __call__(self, update: dict) -> None:
+        chat_id = chat_key(update)
+        seq = update["message"]["message_id"]
+        if seq <= self.last.get(chat_id, 0):
+            self.out_of_order += 1
+        self.last[chat_id] = seq
+        await asyncio.sleep(self.delay)
+        self.handled += 1
+
+
+async def replay(url: str, secret: str, rate: int, duration: float, chats: int):
+    total = int(rate * duration)
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    seq: Counter = Counter()
+    base_id = int(time.time() * 1000)
+
+    async def send(session, update):
+        started = time.perf_counter()
+        try:
+            async with session.post(url, json=update, headers={SECRET_HEADER: secret}) as r:
+                statuses[r.status] += 1
+        except aiohttp.ClientError as e:
+            statuses[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - started)
+
+    connector = aiohttp.TCPConnector(limit=500)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        tasks = []
+        started = time.perf_counter()
+        for i in range(total):
+            # Открытая модель нагрузки: отправка по расписанию, не дожидаясь ответов
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            chat_id = 100000 + i % chats
+            seq[chat_id] += 1
+            update = synthetic_update(base_id + i, chat_id, seq[chat_id])
+            tasks.append(asyncio.create_task(send(session, update)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    q = statistics.quantiles(latencies, n=100)
+    print(f"отправлено {total} за {elapsed:.2f}s ({total / elapsed:.0f}/s)")
+    print(
+        f"ответ webhook: p50={q[49] * 1000:.1f}ms p95={q[94] * 1000:.1f}ms "
+        f"p99={q[98] * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms"
+    )
+    print(f"коды ответов: {dict(statuses)}")
+    return total
+
+
+async def wait_drained(queue: UpdateQueue, timeout: float) -> float | None:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if await queue.lag() == 0:
+            return time.perf_counter() - started
+        await asyncio.sleep(0.1)
+    return None
+
+
+async def main():
+    settings = get_bot_settings()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=f"http://127.0.0.1:8089{PATH}")
+    parser.add_argument("--secret", default="load-test-secret")
+    parser.add_argument("--redis", default=settings.redis_url)
+    parser.add_argument("--rate", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--handle-ms", type=float, default=20)
+    parser.add_argument("--external", action="store_true")
+    args = parser.parse_args()
+
+    redis = Redis.from_url(args.redis)
+    queue = UpdateQueue(redis)
+    runner = None
+    workers, worker_tasks = [], []
+    check = OrderCheck(args.handle_ms / 1000)
+
+    if not args.external:
+        await redis.delete(*(STREAM_KEY.format(p) for p in range(queue.partitions)))
+        runner = web.AppRunner(create_webhook_app(queue, args.secret, PATH))
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 8089).start()
+        for i in range(args.workers):
+            worker = UpdateWorker(UpdateQueue(redis), check, name=f"load-{i}")
+            workers.append(worker)
+            worker_tasks.append(asyncio.create_task(worker.run()))
+        # Воркеры делят партиции: первый сначала занимает все, потом отдаёт лишние
+        await asyncio.sleep(REBALANCE_INTERVAL * 2 + 1)
+
+    try:
+        sent = await replay(args.url, args.secret, args.rate, args.duration, args.chats)
+        drained = await wait_drained(queue, timeout=60)
+        if drained is None:
+            print(f"очередь не разобрана за 60s, осталось {await queue.lag()}")
+        else:
+            print(f"очередь разобрана через {drained:.2f}s после последнего апдейта")
+        if not args.external:
+            print(
+                f"обработано {check.handled} из {sent}, "
+                f"нарушений порядка в чате: {check.out_of_order}"
+            )
+    finally:
+        for worker in workers:
+            worker.stop()
+        await asyncio.gather(*worker_tasks, return_exceptions=True)
+        if runner is not None:
+            await runner.cleanup()
+        await redis.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,23 @@
+import fakeredis
+import pytest
+import pytest_asyncio
+
+from app.services.user_cache import user_cache
+
+
+@pytest_asyncio.fixture
+async def redis():
+    """Redis в памяти процесса (со скриптами Lua)."""
+    client = fakeredis.FakeAsyncRedis()
+    yield client
+    await client.flushall()
+    await client.aclose()
+
+
+@pytest.fixture(autouse=True)
+def clean_user_cache():
+    user_cache._local.clear()
+    user_cache.set_redis(None)
+    yield
+    user_cache._local.clear()
+    user_cache.set_redis(None)
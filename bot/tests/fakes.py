@@ -0,0 +1,92 @@
+"""Заменители объектов aiogram для вызова обработчиков напрямую."""
+
+from types import SimpleNamespace
+
+
+class FakeMessage:
+    """Сообщение без Telegram: ответы и правки записываются в sent/edits."""
+
+    _next_id = 1000
+
+    def __init__(self, user_id: int = 1, text: str = "", html_text: str | None = None):
+        self.from_user = SimpleNamespace(id=user_id)
+        self.chat = SimpleNamespace(id=user_id)
+        self.message_id = FakeMessage._new_id()
+        self.text = text
+        self.html_text = html_text if html_text is not None else text
+        self.sent: list[dict] = []
+        self.edits: list[dict] = []
+
+    @classmethod
+    def _new_id(cls) -> int:
+        cls._next_id += 1
+        return cls._next_id
+
+    async def answer(self, text, **kwargs):
+        reply = FakeMessage(self.from_user.id, text, kwargs.get("html_text"))
+        self.sent.append({"text": text, "message": reply, **kwargs})
+        return reply
+
+    async def edit_text(self, text, **kwargs):
+        self.edits.append({"text": text, **kwargs})
+
+    async def edit_reply_markup(self, reply_markup=None):
+        self.edits.append({"reply_markup": reply_markup})
+
+
+class FakeCallback:
+    def __init__(self, message: FakeMessage, data: str, user_id: int = 1):
+        self.from_user = SimpleNamespace(id=user_id)
+        self.message = message
+        self.data = data
+        self.answers: list[tuple] = []
+
+    async def answer(self, text=None, **kwargs):
+        self.answers.append((text, kwargs))
+
+
+class PagedApi:
+    """
+    Постраничная выдача по курсору, как в backend: история — от новых
+    заказов к старым, лента — от старых к новым.
+    """
+
+    def __init__(self, ids: list[int]):
+        self.ids = ids
+        self.calls: list[dict] = []
+
+    def _page(self, limit, cursor, newest_first):
+        ordered = sorted(self.ids, reverse=newest_first)
+        rest = [
+            i for i in ordered
+            if cursor is None or (i < cursor if newest_first else i > cursor)
+        ]
+        page = rest[:limit]
+        return page, rest, page[-1] if len(rest) > limit else None
+
+    async def get_orders(self, telegram_id, limit=20, cursor=None, with_total=True):
+        self.calls.append({"cursor": cursor, "with_total": with_total})
+        page, _, next_cursor = self._page(limit, cursor, newest_first=True)
+        result = {
+            "orders": [
+                {"id": i, "status": "new", "jv_qty": 1, "lv_qty": 0, "delivery_date": None}
+                for i in page
+            ],
+            "next_cursor": next_cursor,
+        }
+        if with_total:
+            result["total"] = len(self.ids)
+        return result
+
+    async def get_operator_feed(self, limit=10, cursor=None):
+        self.calls.append({"cursor": cursor})
+        page, rest, next_cursor = self._page(limit, cursor, newest_first=False)
+        items = [
+            {
+                "id": i, "client_name": "Клиент", "district": "Торез", "jv_qty": 1,
+                "lv_qty": 0, "total_qty": 1, "delivery_date": None,
+                "created_at": "2026-10-18T09:30:00",
+            }
+            for i in page
+        ]
+        return {"items": items, "remaining": len(rest), "next_cursor": next_cursor}
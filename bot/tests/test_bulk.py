@@ -0,0 +1,109 @@
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from app.filters.roles import OperatorFilter
+from app.handlers.operator import bulk
+from app.services.user_cache import user_cache
+from tests.fakes import FakeCallback, FakeMessage
+
+OPERATOR_ID = 500
+
+
+class FakeApi:
+    """bulk_action backend: предпросмотр видит today, применение — переданные id."""
+
+    def __init__(self, today: list[int]):
+        self.today = today
+        self.calls: list[dict] = []
+
+    async def bulk_action(self, action, operator_tg_id, **payload):
+        self.calls.append({"action": action, **payload})
+        ids = payload.get("order_ids") or self.today
+        results = [{"id": i, "ok": True, "status": action, "error": None} for i in ids]
+        return {"updated": 0 if payload.get("dry_run") else len(ids), "results": results}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    fake = FakeApi(today=[1, 2, 3])
+    monkeypatch.setattr(bulk, "api_client", fake)
+    return fake
+
+
+@pytest.fixture
+def state():
+    key = StorageKey(bot_id=1, chat_id=OPERATOR_ID, user_id=OPERATOR_ID)
+    return FSMContext(storage=MemoryStorage(), key=key)
+
+
+async def _preview(api, state) -> FakeMessage:
+    message = FakeMessage(OPERATOR_ID)
+    await bulk._preview(message, state, "confirm", OPERATOR_ID)
+    assert api.calls[-1]["dry_run"] is True
+    return message.sent[-1]["message"]
+
+
+@pytest.mark.asyncio
+async def test_apply_uses_previewed_ids(api, state):
+    """Тест: «Применить» отправляет id из предпросмотра, а не фильтр по дате."""
+    preview = await _preview(api, state)
+    # После предпросмотра на сегодня появился ещё заказ
+    api.today.append(4)
+    preview.html_text = "Заказы клиента &lt;Иван&gt;"
+
+    callback = FakeCallback(preview, "bulk_apply", OPERATOR_ID)
+    await bulk.bulk_apply(callback, state)
+
+    applied = api.calls[-1]
+    assert applied["order_ids"] == [1, 2, 3]
+    assert "delivery_date" not in applied and "dry_run" not in applied
+    # Текст правки собран из html_text — разметка клиента не ломает HTML
+    assert preview.edits[-1]["text"].startswith("Заказы клиента &lt;Иван&gt;")
+    assert "подтверждено 3" in preview.edits[-1]["text"]
+
+    # Повторное нажатие не применяет действие второй раз
+    await bulk.bulk_apply(FakeCallback(preview, "bulk_apply", OPERATOR_ID), state)
+    assert len(api.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_apply_rejects_stale_preview(api, state, monkeypatch):
+    """Тест: старый или перекрытый новым предпросмотр не применяется."""
+    first = await _preview(api, state)
+    second = await _preview(api, state)
+
+    callback = FakeCallback(first, "bulk_apply", OPERATOR_ID)
+    await bulk.bulk_apply(callback, state)
+    assert callback.answers[-1][1] == {"show_alert": True}
+    assert first.edits == [{"reply_markup": None}]
+
+    monkeypatch.setattr(bulk, "BULK_PREVIEW_TTL", -1)
+    expired = await _preview(api, state)
+    await bulk.bulk_apply(FakeCallback(expired, "bulk_apply", OPERATOR_ID), state)
+    await bulk.bulk_apply(FakeCallback(second, "bulk_apply", OPERATOR_ID), state)
+    assert not any("order_ids" in call for call in api.calls)
+
+
+@pytest.mark.asyncio
+async def test_operator_filter_checks_roles(monkeypatch):
+    """Тест: фильтр пропускает операторов и админов, профиль берёт из кэша."""
+    loads = []
+
+    async def get_user(telegram_id):
+        loads.append(telegram_id)
+        roles = {1: ["client"], 2: ["client", "operator"], 3: ["admin"]}
+        if telegram_id not in roles:
+            return None
+        return {"telegram_id": telegram_id, "roles": roles[telegram_id]}
+
+    monkeypatch.setattr("app.filters.roles.api_client.get_user", get_user)
+    check = OperatorFilter()
+
+    assert [await check(FakeMessage(user_id)) for user_id in (1, 2, 3, 4)] == [
+        False, True, True, False
+    ]
+    assert await check(FakeMessage(2)) is True
+    assert loads == [1, 2, 3, 4]  # повторно профиль 2 взят из кэша
+    assert (await user_cache.get(2, get_user))["roles"] == ["client", "operator"]
@@ -0,0 +1,36 @@
+import pytest
+
+from app.handlers.client import history
+from tests.fakes import FakeCallback, FakeMessage, PagedApi
+
+
+def _buttons(markup) -> list[str]:
+    return [b.callback_data for row in markup.inline_keyboard for b in row]
+
+
+@pytest.mark.asyncio
+async def test_history_pages_by_cursor(monkeypatch):
+    """Тест: история листается курсором; итог считается только на первой странице."""
+    api = PagedApi(list(range(1, 46)))
+    monkeypatch.setattr(history, "api_client", api)
+    message = FakeMessage(user_id=9)
+
+    await history.order_history(message, db_user={"telegram_id": 9})
+    first = _buttons(message.sent[-1]["reply_markup"])
+    assert "(45 всего)" in message.sent[-1]["text"]
+    assert first[0] == "order_view_45" and first[-1] == "history_next_26"
+    assert "history_first" not in first
+
+    callback = FakeCallback(message, "history_next_26", user_id=9)
+    await history.history_page(callback)
+    second = _buttons(message.edits[-1]["reply_markup"])
+    assert second[0] == "order_view_25"
+    assert second[-2:] == ["history_first", "history_next_6"]
+    assert api.calls[-1] == {"cursor": 26, "with_total": False}
+
+    await history.history_page(FakeCallback(message, "history_next_6", user_id=9))
+    last = _buttons(message.edits[-1]["reply_markup"])
+    assert last[-1] == "history_first" and len(last) == 6
+
+    await history.history_page(FakeCallback(message, "history_first", user_id=9))
+    assert _buttons(message.edits[-1]["reply_markup"]) == first
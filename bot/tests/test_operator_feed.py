@@ -0,0 +1,36 @@
+import pytest
+
+from app.handlers.operator import orders
+from tests.fakes import FakeCallback, FakeMessage, PagedApi
+
+
+def _buttons(markup) -> list[str]:
+    return [b.callback_data for row in markup.inline_keyboard for b in row]
+
+
+@pytest.mark.asyncio
+async def test_operator_feed_edits_one_message(monkeypatch):
+    """Тест: лента новых заказов — одно сообщение, листание его редактирует."""
+    api = PagedApi(list(range(1, 16)))
+    monkeypatch.setattr(orders, "api_client", api)
+    message = FakeMessage(user_id=500)
+
+    await orders.list_new_orders(message)
+    assert len(message.sent) == 1
+    assert "(осталось: 15)" in message.sent[0]["text"]
+    page = _buttons(message.sent[0]["reply_markup"])
+    assert page[:2] == ["op_open_1", "op_open_2"] and page[-1] == "feed_next_10"
+
+    feed = message.sent[0]["message"]
+    callback = FakeCallback(feed, "feed_next_10", user_id=500)
+    await orders.feed_page(callback)
+    edit = feed.edits[-1]
+    assert "(осталось: 5)" in edit["text"]
+    assert "№11" in edit["text"] and "№10<" not in edit["text"]
+    assert _buttons(edit["reply_markup"])[-2:] == ["op_open_15", "feed_first"]
+
+    api.ids = []
+    empty = FakeCallback(feed, "feed_first", user_id=500)
+    await orders.feed_page(empty)
+    assert empty.answers == [("Больше новых заказов нет", {})]
+    assert len(feed.edits) == 1
@@ -0,0 +1,56 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.middlewares.throttling import (
+    ALLOWED,
+    REJECTED,
+    REJECTED_NOTIFY,
+    SLOW_DOWN_TEXT,
+    Limit,
+    ThrottlingMiddleware,
+)
+from tests.fakes import FakeMessage
+
+
+@pytest.mark.asyncio
+async def test_bucket_allows_burst_then_refills(redis):
+    """Тест: запас пропускается сразу, дальше — отказ, через время — снова можно."""
+    throttle = ThrottlingMiddleware(redis, "message", Limit(rate=20, burst=3))
+
+    results = [await throttle.check(1) for _ in range(5)]
+    assert results == [ALLOWED] * 3 + [REJECTED_NOTIFY, REJECTED]
+    # Ведро другого пользователя не тронуто
+    assert await throttle.check(2) == ALLOWED
+
+    await asyncio.sleep(0.12)  # 20 токенов/с — хватает на два
+    assert [await throttle.check(1) for _ in range(3)] == [ALLOWED, ALLOWED, REJECTED_NOTIFY]
+
+
+@pytest.mark.asyncio
+async def test_rejected_messages_get_one_hint(redis):
+    """Тест: отклонённые сообщения не доходят до обработчика, подсказка — одна."""
+    throttle = ThrottlingMiddleware(redis, "message", Limit(rate=0.01, burst=2))
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event)
+
+    message = FakeMessage(user_id=5)
+    for _ in range(5):
+        await throttle(handler, message, {})
+
+    assert len(handled) == 2
+    assert [m["text"] for m in message.sent] == [SLOW_DOWN_TEXT]
+
+
+@pytest.mark.asyncio
+async def test_events_pass_without_redis():
+    """Тест: при недоступном Redis события пропускаются без ограничения."""
+    server = fakeredis.FakeServer()
+    server.connected = False
+    throttle = ThrottlingMiddleware(
+        fakeredis.FakeAsyncRedis(server=server), "message", Limit(rate=0.01, burst=1)
+    )
+    assert [await throttle.check(1) for _ in range(3)] == [ALLOWED] * 3
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from app.services import update_queue
+from app.services.update_queue import (
+    GROUP,
+    LEASE_KEY,
+    STREAM_KEY,
+    UpdateQueue,
+    UpdateWorker,
+)
+
+
+def _update(update_id: int, chat_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {"message_id": update_id, "chat": {"id": chat_id}, "text": "hi"},
+    }
+
+
+@pytest.fixture
+def short_lease(monkeypatch):
+    """Аренда на доли секунды, чтобы дождаться её истечения в тесте."""
+    monkeypatch.setattr(update_queue, "LEASE_TTL_MS", 300)
+    monkeypatch.setattr(update_queue, "LEASE_MARGIN", 0.05)
+
+
+async def _drain(worker: UpdateWorker) -> None:
+    while worker._entries:
+        await asyncio.gather(*(t for ts in worker._in_flight.values() for t in ts))
+
+
+@pytest.mark.asyncio
+async def test_push_drops_repeated_update_id(redis):
+    """Тест: повторная доставка того же update_id в очередь не попадает."""
+    queue = UpdateQueue(redis, partitions=4)
+
+    assert await queue.push(_update(1, chat_id=42)) is True
+    assert await queue.push(_update(1, chat_id=42)) is False
+    assert await queue.push(_update(2, chat_id=42)) is True
+
+    assert await redis.xlen(STREAM_KEY.format(42 % 4)) == 2
+
+
+@pytest.mark.asyncio
+async def test_pending_updates_are_redelivered_after_lease_expiry(redis, short_lease):
+    """Тест: апдейт упавшего воркера забирает новый владелец, и раньше новых."""
+    queue = UpdateQueue(redis, partitions=1)
+    stream = STREAM_KEY.format(0)
+    await queue.push(_update(1, chat_id=7))
+
+    # Прежний владелец прочитал апдейт и упал, не подтвердив его
+    await redis.xgroup_create(stream, GROUP, id="0", mkstream=True)
+    await redis.xreadgroup(GROUP, "dead", {stream: ">"}, count=1)
+    await redis.set(LEASE_KEY.format(0), "dead", px=update_queue.LEASE_TTL_MS)
+    await queue.push(_update(2, chat_id=7))
+
+    handled = []
+
+    async def handler(update):
+        handled.append(update["update_id"])
+
+    worker = UpdateWorker(queue, handler, concurrency=10, name="alive")
+    await worker.rebalance()
+    assert worker.owned == set() and handled == []  # аренда ещё у прежнего
+
+    await asyncio.sleep(update_queue.LEASE_TTL_MS / 1000 + 0.1)
+    await worker.rebalance()
+    await _drain(worker)
+    assert handled == [1]
+
+    # Зависшее обработано — партиция читается дальше по порядку
+    await worker.rebalance()
+    assert worker.owned == {0}
+    await worker._read_owned()
+    await _drain(worker)
+    assert handled == [1, 2]
+    assert (await redis.xpending(stream, GROUP))["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_updates_of_one_chat_run_in_order(redis):
+    """Тест: апдейты одного чата — по очереди, разных чатов — параллельно."""
+    queue = UpdateQueue(redis, partitions=1)
+    for update_id, chat_id in [(1, 1), (2, 2), (3, 1), (4, 2), (5, 1)]:
+        await queue.push(_update(update_id, chat_id))
+
+    running: dict[int, int] = {}
+    peak = 0
+    log = []
+
+    async def handler(update):
+        nonlocal peak
+        chat_id = update["message"]["chat"]["id"]
+        running[chat_id] = running.get(chat_id, 0) + 1
+        assert running[chat_id] == 1, "два апдейта одного чата одновременно"
+        peak = max(peak, sum(running.values()))
+        await asyncio.sleep(0.01)
+        log.append((chat_id, update["update_id"]))
+        running[chat_id] -= 1
+
+    worker = UpdateWorker(queue, handler, concurrency=10, name="single")
+    await worker.rebalance()
+    await worker._read_owned()
+    await _drain(worker)
+
+    assert [u for c, u in log if c == 1] == [1, 3, 5]
+    assert [u for c, u in log if c == 2] == [2, 4]
+    assert peak == 2
+    assert (await redis.xpending(STREAM_KEY.format(0), GROUP))["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_update_is_not_acked_after_lease_loss(redis):
+    """Тест: без аренды апдейт не обрабатывается и не подтверждается."""
+    queue = UpdateQueue(redis, partitions=1)
+    await queue.push(_update(1, chat_id=3))
+    handled = []
+
+    async def handler(update):
+        handled.append(update["update_id"])
+
+    worker = UpdateWorker(queue, handler, concurrency=10, name="late")
+    await worker.rebalance()
+    worker._leases[0] = 0  # аренда истекла, пока апдейт читался
+    await worker._read_owned()
+    await _drain(worker)
+
+    assert handled == []
+    assert (await redis.xpending(STREAM_KEY.format(0), GROUP))["pending"] == 1
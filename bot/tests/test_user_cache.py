@@ -0,0 +1,65 @@
+import pytest
+
+from app.services.user_cache import KEY_PREFIX, UserCache
+
+
+class Loader:
+    """Профили backend; считает обращения."""
+
+    def __init__(self, users: dict[int, dict]):
+        self.users = users
+        self.calls: list[int] = []
+
+    async def __call__(self, telegram_id: int) -> dict | None:
+        self.calls.append(telegram_id)
+        return self.users.get(telegram_id)
+
+
+@pytest.mark.asyncio
+async def test_profile_is_loaded_once_per_process():
+    """Тест: повторный запрос профиля — из памяти; незарегистрированный не кэшируется."""
+    cache = UserCache(maxsize=10, local_ttl=60)
+    load = Loader({1: {"telegram_id": 1, "roles": ["client"]}})
+
+    assert await cache.get(1, load) == {"telegram_id": 1, "roles": ["client"]}
+    assert await cache.get(1, load) == {"telegram_id": 1, "roles": ["client"]}
+    assert await cache.get(2, load) is None
+    load.users[2] = {"telegram_id": 2, "roles": ["client"]}
+    # Только что зарегистрированный не получает устаревший отказ
+    assert await cache.get(2, load) == {"telegram_id": 2, "roles": ["client"]}
+    assert load.calls == [1, 2, 2]
+
+
+@pytest.mark.asyncio
+async def test_processes_share_profiles_through_redis(redis):
+    """Тест: второй процесс берёт профиль из Redis; сброс виден обоим уровням."""
+    first, second = UserCache(), UserCache()
+    first.set_redis(redis)
+    second.set_redis(redis)
+    load = Loader({1: {"telegram_id": 1, "name": "Иван"}})
+
+    await first.get(1, load)
+    assert await redis.ttl(f"{KEY_PREFIX}1") > 0
+    assert (await second.get(1, load))["name"] == "Иван"
+    assert load.calls == [1]
+
+    load.users[1] = {"telegram_id": 1, "name": "Пётр"}
+    await second.invalidate(1)
+    assert (await second.get(1, load))["name"] == "Пётр"
+    assert load.calls == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_local_entries_expire_and_are_bounded():
+    """Тест: локальная запись живёт local_ttl, в памяти не больше maxsize профилей."""
+    cache = UserCache(maxsize=2, local_ttl=0)
+    load = Loader({i: {"telegram_id": i} for i in range(1, 4)})
+
+    await cache.get(1, load)
+    await cache.get(1, load)
+    assert load.calls == [1, 1]  # TTL истёк сразу
+
+    cache.local_ttl = 60
+    for telegram_id in (1, 2, 3):
+        await cache.get(telegram_id, load)
+    assert list(cache._local) == [2, 3]